@@ -86,6 +86,17 @@ class LikedTrackRepository:
             list_liked_tracks=liked_track
         )
 
+    @staticmethod
+    def get_liked_track_ids_by_user(db: Session, user_id: UUID) -> List[UUID]:
+        """Get ids of liked tracks by user, most recent first."""
+        liked_tracks = (
+            db.query(LikedTrack.track_id)
+            .filter(LikedTrack.user_id == user_id)
+            .order_by(LikedTrack.created_at.desc())
+            .all()
+        )
+        return [liked_track.track_id for liked_track in liked_tracks]
+
     @staticmethod
     def delete_liked_track(db: Session, user_id: UUID, track_id: UUID) -> LikedTrack:
         """Delete liked track."""
@@ -9,9 +9,17 @@ from api.database.execute.artist import artist_execute
 from api.database.execute.genre import genre_execute
 from api.database.execute.liked_track import liked_track_execute
 from api.database.models import Album, Artist, Genre, Track, User
-from api.helpers.utils import get_recommendation, get_tags_keywords
+from api.helpers.taste_vector import taste_vector_cache
+from api.helpers.utils import (
+    get_recommendation,
+    get_recommendation_batch,
+    get_recommendation_by_profile,
+    get_recommendation_by_vector,
+    get_tags_keywords,
+)
 from api.schemas.track import ListTrackDisplay, TrackDisplay
 from core.config import GENRES_MAP
+from core.constant import RECOMMENDATION_PROFILE
 from sqlalchemy import func, or_, orm
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
@@ -385,36 +393,40 @@ class TrackRepository:
         if liked_tracks.total_entries == 0:
             return []
         track_ids = [liked_track.id for liked_track in liked_tracks.list_liked_tracks]
-        
+
+        # One batched recommendation call for every liked track, and one query for all results.
+        recommendations = await get_recommendation_batch(track_ids=track_ids)
+        recommend_ids = [UUID(recommend_id) for ids in recommendations.values() for recommend_id in ids]
+        tracks = (
+            db.query(
+                Track.id.label("id"),
+                Track.title.label("title"),
+                Album.name.label("album"),
+                Artist.name.label("artist"),
+                Genre.name.label("genre"),
+                Track.cover_art.label("cover_art"),
+                Track.mp3_url.label("mp3_url"),
+                Track.tags.label("tags"),
+                Album.release_date.label("release_date"),
+            )
+            .join(Album, Album.id == Track.album_id)
+            .join(Artist, Artist.id == Track.artist_id)
+            .join(Genre, Genre.id == Track.genre_id)
+            .filter(Track.id.in_(recommend_ids))
+            .all()
+        )
+        tracks_by_id = {track.id: track for track in tracks}
+
         results = []
         track_ids_set = set()  # Set to store unique track IDs
         track_titles_set = set()
 
+        # Walk the results liked track by liked track, as the per-track calls did.
         for track_id in track_ids:
-            track_ids = await get_recommendation(
-                track_id=track_id,
-                existed_ids=[],
-            )
-            track_ids = [UUID(track_id) for track_id in track_ids]
-            tracks = (
-                db.query(
-                    Track.id.label("id"),
-                    Track.title.label("title"),
-                    Album.name.label("album"),
-                    Artist.name.label("artist"),
-                    Genre.name.label("genre"),
-                    Track.cover_art.label("cover_art"),
-                    Track.mp3_url.label("mp3_url"),
-                    Track.tags.label("tags"),
-                    Album.release_date.label("release_date"),
-                )
-                .join(Album, Album.id == Track.album_id)
-                .join(Artist, Artist.id == Track.artist_id)
-                .join(Genre, Genre.id == Track.genre_id)
-                .filter(Track.id.in_(track_ids))
-                .all()
-            )
-            for track in tracks:
+            for recommend_id in recommendations.get(str(track_id), []):
+                track = tracks_by_id.get(UUID(recommend_id))
+                if track is None:
+                    continue
                 if track.id not in track_ids_set and track.title not in track_titles_set:  # Check if track ID is already in the set
                     results.append(track)
                     track_ids_set.add(track.id)  # Add track ID to the set
@@ -444,18 +456,85 @@ class TrackRepository:
         original_track = db.query(Track).filter(Track.id == track_id).first()
         original_tags = get_tags_keywords(original_track.tags)
 
-        # Get the recommended tracks
-        title_count = {}
-        duplicated_ids = []
-        detect_duplicated = True
+        # Tracks sharing a title are deduplicated by the recommendation engine when it has the title
+        # groups, the first track of every title is kept here too in case it has none.
+        track_ids = await get_recommendation(track_id=track_id, existed_ids=[])
+        track_ids = [UUID(track_id) for track_id in track_ids]
+        tracks = (
+            db.query(
+                Track.id.label("id"),
+                Track.title.label("title"),
+                Album.name.label("album"),
+                Artist.name.label("artist"),
+                Genre.name.label("genre"),
+                Track.cover_art.label("cover_art"),
+                Track.mp3_url.label("mp3_url"),
+                Track.tags.label("tags"),
+                Album.release_date.label("release_date"),
+            )
+            .join(Album, Album.id == Track.album_id)
+            .join(Artist, Artist.id == Track.artist_id)
+            .join(Genre, Genre.id == Track.genre_id)
+            .filter(Track.id.in_(track_ids))
+            .all()
+        )
+        ranks = {track_id: rank for rank, track_id in enumerate(track_ids)}
+        titles = set()
+        display_tracks = []
+        for track in sorted(tracks, key=lambda track: ranks[track.id]):
+            if track.title in titles:
+                continue
+            titles.add(track.title)
+            new_tags = get_tags_keywords(track.tags)
+            filtered_tags = list(set(new_tags) & set(original_tags))
 
-        while detect_duplicated:
-            detect_duplicated = False
-            track_ids = await get_recommendation(
-                track_id=track_id,
-                existed_ids=duplicated_ids,
+            display_tracks.append(
+                TrackDisplay(
+                    id=track.id,
+                    title=track.title,
+                    artist=track.artist,
+                    genre=track.genre,
+                    album=track.album,
+                    cover_art=track.cover_art,
+                    mp3_url=track.mp3_url,
+                    tags=filtered_tags,
+                    release_date=track.release_date,
+                )
             )
-            track_ids = [UUID(track_id) for track_id in track_ids]
+        return ListTrackDisplay(
+            total_entries=len(display_tracks),
+            list_tracks=display_tracks,
+        )
+
+    async def get_recommendation_by_user(self, db: Session, user_id: UUID, limit: int = 50):
+        """Get recommendations by user."""
+        # One ranking pass against the taste profile of every liked track. The mean
+        # profile is read from the cached taste vector, without scanning the likes.
+        # A vector the index rejects, as built from other embeddings, is dropped and the
+        # liked tracks are ranked by the service, as they are when Redis is down.
+        recommend_ids, liked_track_ids = None, None
+        if RECOMMENDATION_PROFILE == "mean":
+            taste_vector = await taste_vector_cache.get_or_build(db=db, user_id=user_id)
+            if taste_vector is not None and not taste_vector.count:
+                recommend_ids = []
+            elif taste_vector is not None:
+                recommend_ids = await get_recommendation_by_vector(
+                    vector=[value / taste_vector.count for value in taste_vector.vector_sum],
+                    existed_ids=taste_vector.liked_ids,
+                    top_k=limit,
+                    checksum=taste_vector.checksum,
+                )
+                if recommend_ids is None:
+                    taste_vector_cache.invalidate(user_id)
+                    liked_track_ids = taste_vector.liked_ids
+        if recommend_ids is None:
+            if liked_track_ids is None:
+                liked_track_ids = liked_track_execute.get_liked_track_ids_by_user(db=db, user_id=user_id)
+            recommend_ids = (
+                await get_recommendation_by_profile(track_ids=liked_track_ids, top_k=limit) if liked_track_ids else []
+            )
+        if recommend_ids:
+            recommend_ids = [UUID(recommend_id) for recommend_id in recommend_ids]
             tracks = (
                 db.query(
                     Track.id.label("id"),
@@ -471,28 +550,11 @@ class TrackRepository:
                 .join(Album, Album.id == Track.album_id)
                 .join(Artist, Artist.id == Track.artist_id)
                 .join(Genre, Genre.id == Track.genre_id)
-                .filter(Track.id.in_(track_ids))
+                .filter(Track.id.in_(recommend_ids))
                 .all()
             )
-            for track in tracks:
-                title = track.title
-                # Detect duplicates
-                if title in title_count:
-                    duplicated_ids.append(track.id)
-                    detect_duplicated = True
-                else:
-                    title_count[title] = 1
-
-            if detect_duplicated:
-                # Reset title count
-                title_count = {}
-                continue
-        display_tracks = []
-        for track in tracks:
-            new_tags = get_tags_keywords(track.tags)
-            filtered_tags = list(set(new_tags) & set(original_tags))
-
-            display_tracks.append(
+            tracks_by_id = {track.id: track for track in tracks}
+            display_tracks = [
                 TrackDisplay(
                     id=track.id,
                     title=track.title,
@@ -501,26 +563,18 @@ class TrackRepository:
                     album=track.album,
                     cover_art=track.cover_art,
                     mp3_url=track.mp3_url,
-                    tags=filtered_tags,
+                    tags=track.tags,
                     release_date=track.release_date,
                 )
-            )
-        return ListTrackDisplay(
-            total_entries=len(display_tracks),
-            list_tracks=display_tracks,
-        )
+                for track in (tracks_by_id.get(recommend_id) for recommend_id in recommend_ids)
+                if track is not None
+            ]
+            if display_tracks:
+                return ListTrackDisplay(
+                    total_entries=len(display_tracks),
+                    list_tracks=display_tracks,
+                )
 
-    async def get_recommendation_by_user(self, db: Session, user_id: UUID, limit: int = 50):
-        """Get recommendations by user."""
-        # Check if liked tracks by user exist
-        recommended_tracks_by_likes = await self.get_recommendation_by_likes(
-            db=db,
-            user_id=user_id,
-        )
-        
-        if recommended_tracks_by_likes:
-            return recommended_tracks_by_likes
-        
         # Get tracks by preferences
         tracks = await self.get_tracks_by_user_preferences(
             db=db,
@@ -0,0 +1,49 @@
+# pylint: disable=E0401
+"""HTTP client."""
+
+from typing import Optional
+
+import aiohttp
+from core.constant import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_TIMEOUT,
+)
+
+
+class HttpClient:
+    """Application-scoped HTTP client keeping pooled connections alive between requests."""
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        """Open the session."""
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        )
+        timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def close(self):
+        """Close the session and its connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Get the session, opening it when used outside the application lifespan."""
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
+
+
+http_client = HttpClient()
@@ -0,0 +1,159 @@
+# pylint: disable=E0401,C0413
+"""In-process recommendation engine."""
+
+import os
+import sys
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from core.constant import (
+    RECOMMENDATION_ANN_NUM_PROBE,
+    RECOMMENDATION_COLLABORATIVE_WEIGHT,
+    RECOMMENDATION_DATA_PATH,
+    RECOMMENDATION_DIVERSITY,
+    RECOMMENDATION_DIVERSITY_POOL_SIZE,
+    RECOMMENDATION_IMAGE_WEIGHT,
+    RECOMMENDATION_METADATA_WEIGHT,
+    RECOMMENDATION_PROFILE_NUM_CLUSTERS,
+    RECOMMENDATION_PROFILE_RECENCY_DECAY,
+    RECOMMENDATION_QUANTIZATION,
+    RECOMMENDATION_QUANTIZATION_RERANK_SIZE,
+    RECOMMENDATION_TOP_K,
+)
+
+# The engine is imported from the recommendation service package, both services share the repository root.
+code_root = os.path.abspath(os.path.join(__file__, "../../../.."))
+if code_root not in sys.path:
+    sys.path.append(code_root)
+
+from recommendation.api.helpers.engine import HybridWeights, SearchOptions
+from recommendation.api.helpers.profile import build_profile, normalize_queries
+from recommendation.api.helpers.snapshot import EngineSnapshot, SnapshotRegistry, SnapshotSettings
+
+
+class EmbeddedRecommender:
+    """Snapshots of the recommendation artifacts, loaded on first use.
+
+    The artifacts are loaded by the snapshot registry of the recommendation
+    service, so the ANN index, the quantised matrix, the filters and the delta
+    of added and removed tracks are used in embedded mode too. Every method
+    blocks, callers run them off the event loop.
+    """
+
+    def __init__(self, data_path: str = RECOMMENDATION_DATA_PATH):
+        self.settings = SnapshotSettings.from_data_path(
+            data_path,
+            image_weight=RECOMMENDATION_IMAGE_WEIGHT,
+            metadata_weight=RECOMMENDATION_METADATA_WEIGHT,
+            ann_num_probe=RECOMMENDATION_ANN_NUM_PROBE,
+            quantization=RECOMMENDATION_QUANTIZATION,
+            quantization_rerank_size=RECOMMENDATION_QUANTIZATION_RERANK_SIZE,
+            collaborative_weight=RECOMMENDATION_COLLABORATIVE_WEIGHT,
+            diversity=RECOMMENDATION_DIVERSITY,
+            diversity_pool_size=RECOMMENDATION_DIVERSITY_POOL_SIZE,
+        )
+        self._registry: Optional[SnapshotRegistry] = None
+        self._lock = threading.Lock()
+
+    @property
+    def registry(self) -> SnapshotRegistry:
+        """Snapshot registry, loaded once."""
+        if self._registry is None:
+            with self._lock:
+                if self._registry is None:
+                    self._registry = SnapshotRegistry(self.settings)
+        return self._registry
+
+    @property
+    def snapshot(self) -> EngineSnapshot:
+        """Current snapshot, read once per call."""
+        return self.registry.current
+
+    def get_recommendation(
+        self,
+        spotify_id: str,
+        existed_ids: List[str] = None,
+        weights: Dict[str, float] = None,
+    ) -> List[str]:
+        """Get the Spotify ids recommended for one Spotify id, weights missing from ``weights`` keep their default."""
+        snapshot = self.snapshot
+        engine = snapshot.engine
+        anchor_row = snapshot.get_row(spotify_id)
+        if anchor_row is None:
+            return []
+        excluded = engine.get_exclusion_mask([spotify_id, *(existed_ids or [])])
+        if weights:
+            weights = HybridWeights(
+                weights.get("image_weight", engine.default_weights.image),
+                weights.get("metadata_weight", engine.default_weights.metadata),
+                weights.get("collaborative_weight", engine.default_weights.collaborative),
+            )
+        return engine.search(anchor_row, RECOMMENDATION_TOP_K, excluded, SearchOptions(weights or None))
+
+    def get_recommendation_batch(self, spotify_ids: List[str], existed_ids: List[str] = None) -> Dict[str, List[str]]:
+        """Get the Spotify ids recommended for many Spotify ids, keyed by anchor."""
+        snapshot = self.snapshot
+        anchors = [(spotify_id, snapshot.get_row(spotify_id)) for spotify_id in spotify_ids]
+        anchors = [(spotify_id, row) for spotify_id, row in anchors if row is not None]
+        excluded = [snapshot.engine.get_exclusion_mask([spotify_id, *(existed_ids or [])]) for spotify_id, _ in anchors]
+        results = snapshot.engine.search_batch([row for _, row in anchors], RECOMMENDATION_TOP_K, excluded)
+        return {spotify_id: recommend_ids for (spotify_id, _), recommend_ids in zip(anchors, results)}
+
+    def get_recommendation_by_profile(
+        self,
+        spotify_ids: List[str],
+        existed_ids: List[str] = None,
+        profile: str = "recency",
+        top_k: int = None,
+    ) -> List[str]:
+        """Get the Spotify ids recommended for a taste profile of many Spotify ids, most recent first."""
+        snapshot = self.snapshot
+        anchor_rows = [snapshot.get_row(spotify_id) for spotify_id in spotify_ids]
+        anchor_rows = [row for row in anchor_rows if row is not None]
+        if not anchor_rows:
+            return []
+        queries = build_profile(
+            snapshot.engine,
+            anchor_rows,
+            mode=profile,
+            recency_decay=RECOMMENDATION_PROFILE_RECENCY_DECAY,
+            num_clusters=RECOMMENDATION_PROFILE_NUM_CLUSTERS,
+        )
+        excluded = snapshot.engine.get_exclusion_mask([*spotify_ids, *(existed_ids or [])])
+        return snapshot.engine.search_profile(queries, top_k or RECOMMENDATION_TOP_K, excluded)
+
+    def get_vectors(self, spotify_ids: List[str]) -> Tuple[Dict[str, List[float]], str]:
+        """Get the query vector of every known Spotify id and the checksum of the embeddings they come from."""
+        snapshot = self.snapshot
+        vectors = {}
+        for spotify_id in spotify_ids:
+            row = snapshot.get_row(spotify_id)
+            if row is not None:
+                vectors[spotify_id] = snapshot.engine.get_query(row).tolist()
+        return vectors, snapshot.engine.store.checksum
+
+    def get_recommendation_by_vector(
+        self,
+        vector: List[float],
+        existed_ids: List[str] = None,
+        top_k: int = None,
+        checksum: str = None,
+    ) -> Optional[List[str]]:
+        """Get the Spotify ids recommended for a taste vector, None when it was built from other embeddings."""
+        engine = self.snapshot.engine
+        if len(vector) != engine.store.embedding_matrix.shape[1] or checksum not in (None, engine.store.checksum):
+            return None
+        queries = normalize_queries(engine, [vector])
+        excluded = engine.get_exclusion_mask(existed_ids or [])
+        return engine.search_profile(queries, top_k or RECOMMENDATION_TOP_K, excluded)
+
+    def reload(self) -> int:
+        """Reload the artifacts from disk, return the new version."""
+        return self.registry.reload()
+
+    def remove_tracks(self, track_ids: List[str]) -> int:
+        """Remove tracks from the index and its delta on disk, return the new version."""
+        return self.registry.remove_tracks(track_ids)
+
+
+embedded_recommender = EmbeddedRecommender()
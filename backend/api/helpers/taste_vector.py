@@ -0,0 +1,196 @@
+# pylint: disable=E0401
+"""Per-user taste vectors cached in Redis."""
+
+import asyncio
+from typing import Dict, List, NamedTuple, Optional
+from uuid import UUID
+
+import aiohttp
+import redis
+from api.database.execute.liked_track import liked_track_execute
+from api.database.memory_redis import redis_database
+from api.helpers.utils import get_track_vectors
+from core.constant import TASTE_VECTOR_EXPIRE
+from logger.logger import custom_logger
+from sqlalchemy.orm import Session
+
+
+class TasteVector(NamedTuple):
+    """Sum and count of the vectors of the liked tracks, with the checksum of the embeddings they come from."""
+
+    vector_sum: List[float]
+    count: int
+    liked_ids: List[str]
+    checksum: str
+
+
+class TasteVectorCache:
+    """Running sum and count of the vectors of every liked track of a user.
+
+    The sum is a Redis hash with one field per dimension, and the liked track
+    ids are kept in a set, they are excluded from the recommendations. A track
+    is applied in a transaction watching both, so concurrent workers count it
+    once. Every like and unlike bumps a version, a rebuild is only saved when
+    the version did not change while the liked tracks were read.
+
+    The hash also keeps the checksum and the dimension of the embeddings the
+    vectors came from. Vectors of other embeddings are never added to it, it
+    is dropped and rebuilt instead.
+    """
+
+    def __init__(self):
+        self.redis_client = redis_database.redis_client
+
+    @staticmethod
+    def get_key(user_id: UUID) -> str:
+        """Get key of the taste vector hash."""
+        return f"taste_vector:{user_id}"
+
+    @staticmethod
+    def get_liked_key(user_id: UUID) -> str:
+        """Get key of the liked track ids set."""
+        return f"taste_vector:{user_id}:liked"
+
+    @staticmethod
+    def get_version_key(user_id: UUID) -> str:
+        """Get key of the version bumped by every like and unlike."""
+        return f"taste_vector:{user_id}:version"
+
+    @staticmethod
+    def summarize(vectors: Dict[str, List[float]], checksum: str) -> TasteVector:
+        """Get the taste vector of some track vectors."""
+        return TasteVector([sum(dims) for dims in zip(*vectors.values())], len(vectors), list(vectors), checksum)
+
+    def get(self, user_id: UUID) -> Optional[TasteVector]:
+        """Get the cached taste vector, None when the user is not cached or the hash is not a whole vector."""
+        fields = self.redis_client.hgetall(self.get_key(user_id))
+        if not fields or b"checksum" not in fields:
+            return None
+        count, checksum = int(fields.pop(b"count")), fields.pop(b"checksum").decode("utf-8")
+        dim = int(fields.pop(b"dim"))
+        if len(fields) != dim:
+            return None
+        vector_sum = [float(fields[str(idx).encode()]) for idx in range(dim)]
+        liked_ids = [track_id.decode("utf-8") for track_id in self.redis_client.smembers(self.get_liked_key(user_id))]
+        return TasteVector(vector_sum, count, liked_ids, checksum)
+
+    def get_version(self, user_id: UUID) -> int:
+        """Get the number of likes and unlikes applied to a user."""
+        return int(self.redis_client.get(self.get_version_key(user_id)) or 0)
+
+    def save(
+        self, user_id: UUID, vectors: Dict[str, List[float]], checksum: str, version: Optional[int] = None
+    ) -> bool:
+        """Replace the cached taste vector of a user, unless the version moved past ``version``.
+
+        Returns whether the vector was saved.
+        """
+        key, liked_key, version_key = self.get_key(user_id), self.get_liked_key(user_id), self.get_version_key(user_id)
+        taste_vector = self.summarize(vectors, checksum)
+
+        def replace(pipeline: redis.client.Pipeline) -> bool:
+            if version is not None and int(pipeline.get(version_key) or 0) != version:
+                return False
+            pipeline.multi()
+            pipeline.delete(key, liked_key)
+            pipeline.hset(
+                key,
+                mapping={
+                    "count": taste_vector.count,
+                    "checksum": checksum,
+                    "dim": len(taste_vector.vector_sum),
+                    **{str(idx): value for idx, value in enumerate(taste_vector.vector_sum)},
+                },
+            )
+            if vectors:
+                pipeline.sadd(liked_key, *vectors)
+            pipeline.expire(key, TASTE_VECTOR_EXPIRE)
+            pipeline.expire(liked_key, TASTE_VECTOR_EXPIRE)
+            return True
+
+        return self.redis_client.transaction(replace, version_key, value_from_callable=True)
+
+    def update(self, user_id: UUID, vectors: Dict[str, List[float]], sign: int, checksum: str):
+        """Add (sign 1) or subtract (sign -1) track vectors, users that are not cached are left to be rebuilt.
+
+        A cached vector of other embeddings than ``checksum`` is dropped instead.
+        """
+        key, liked_key = self.get_key(user_id), self.get_liked_key(user_id)
+        for track_id, vector in vectors.items():
+
+            def apply(pipeline: redis.client.Pipeline, track_id: str = track_id, vector: List[float] = vector):
+                cached_checksum = pipeline.hget(key, "checksum")
+                if cached_checksum is None:
+                    return
+                if cached_checksum.decode("utf-8") != checksum:
+                    pipeline.multi()
+                    pipeline.delete(key, liked_key)
+                    return
+                # A track is counted once, however many times it is liked or unliked.
+                if bool(pipeline.sismember(liked_key, track_id)) == (sign > 0):
+                    return
+                pipeline.multi()
+                for idx, value in enumerate(vector):
+                    pipeline.hincrbyfloat(key, str(idx), sign * value)
+                pipeline.hincrby(key, "count", sign)
+                if sign > 0:
+                    pipeline.sadd(liked_key, track_id)
+                else:
+                    pipeline.srem(liked_key, track_id)
+
+            self.redis_client.transaction(apply, key, liked_key)
+
+    def invalidate(self, user_id: UUID):
+        """Drop the cached taste vector of a user, failures are logged."""
+        try:
+            self.redis_client.delete(self.get_key(user_id), self.get_liked_key(user_id))
+        except redis.RedisError as e:
+            custom_logger.warning("Drop taste vector of user %s failed: %s", user_id, e)
+
+    async def get_or_build(self, db: Session, user_id: UUID) -> Optional[TasteVector]:
+        """Get the cached taste vector, building it from the liked tracks once when missing.
+
+        Returns None when Redis fails, callers then rank the liked tracks without the cache.
+        """
+        try:
+            cached = self.get(user_id)
+            if cached is not None:
+                return cached
+            # Read before the liked tracks, a like landing during the rebuild moves it and the rebuild is not saved.
+            version = self.get_version(user_id)
+            liked_track_ids = liked_track_execute.get_liked_track_ids_by_user(db=db, user_id=user_id)
+            vectors, checksum = await get_track_vectors(liked_track_ids)
+            if not self.save(user_id, vectors, checksum, version):
+                custom_logger.info("Taste vector of user %s changed during its rebuild, it is not cached", user_id)
+            return self.summarize(vectors, checksum)
+        except redis.RedisError as e:
+            custom_logger.warning("Get taste vector of user %s failed: %s", user_id, e)
+            return None
+
+    async def like(self, user_id: UUID, track_ids: List[UUID]):
+        """Add liked tracks to the taste vector, failures drop it so it is rebuilt."""
+        await self._apply(user_id, track_ids, sign=1)
+
+    async def unlike(self, user_id: UUID, track_ids: List[UUID]):
+        """Remove unliked tracks from the taste vector, failures drop it so it is rebuilt."""
+        await self._apply(user_id, track_ids, sign=-1)
+
+    async def _apply(self, user_id: UUID, track_ids: List[UUID], sign: int):
+        """Apply liked or unliked tracks to a cached taste vector."""
+        try:
+            version_key = self.get_version_key(user_id)
+            pipeline = self.redis_client.pipeline()
+            pipeline.incr(version_key)
+            pipeline.expire(version_key, TASTE_VECTOR_EXPIRE)
+            pipeline.execute()
+            if self.redis_client.exists(self.get_key(user_id)):
+                vectors, checksum = await get_track_vectors(track_ids)
+                self.update(user_id, vectors, sign, checksum)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            custom_logger.warning("Update taste vector of user %s failed: %r", user_id, e)
+            self.invalidate(user_id)
+        except redis.RedisError as e:
+            custom_logger.warning("Update taste vector of user %s failed: %s", user_id, e)
+
+
+taste_vector_cache = TasteVectorCache()
@@ -0,0 +1,44 @@
+# pylint: disable=E0401
+"""Track id map."""
+
+from __future__ import annotations
+
+import json
+from typing import Dict, Iterable, List, Optional
+
+
+class TrackIdMap:
+    """Bidirectional map between track ids (database UUIDs) and Spotify ids.
+
+    It reads the ``map_track_ids.json`` the recommendation service loads, so
+    both services agree on which Spotify id, and therefore which embedding
+    row, a track has.
+    """
+
+    def __init__(self, map_track_ids: Dict[str, str]):
+        self.track_to_spotify = dict(map_track_ids)
+        self.spotify_to_track = {spotify_id: track_id for track_id, spotify_id in self.track_to_spotify.items()}
+
+    @classmethod
+    def load(cls, path: str) -> TrackIdMap:
+        """Load the map from ``map_track_ids.json``."""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def __contains__(self, track_id: str) -> bool:
+        return track_id in self.track_to_spotify
+
+    def __getitem__(self, track_id: str) -> str:
+        return self.track_to_spotify[track_id]
+
+    def get_spotify_id(self, track_id: str) -> Optional[str]:
+        """Get Spotify id of a track id."""
+        return self.track_to_spotify.get(track_id)
+
+    def to_spotify_ids(self, track_ids: Iterable[str]) -> List[str]:
+        """Map track ids to Spotify ids, keeping order and skipping unknown ids."""
+        return [self.track_to_spotify[track_id] for track_id in track_ids if track_id in self.track_to_spotify]
+
+    def to_track_ids(self, spotify_ids: Iterable[str]) -> List[str]:
+        """Map Spotify ids to track ids, keeping order and skipping unknown ids."""
+        return [self.spotify_to_track[spotify_id] for spotify_id in spotify_ids if spotify_id in self.spotify_to_track]
@@ -1,16 +1,24 @@
 # pylint: disable=E0401
 """Utils."""
 
-from typing import List
+import asyncio
+import importlib
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 
 import aiohttp
+from api.helpers.http_client import http_client
 from api.schemas.auth import pwd_context
+from core.config import MAX_IDS_EXIST, track_id_map
+from core.constant import RECOMMENDATION_MODE, RECOMMENDATION_PROFILE, RECOMMENDATION_SERVICE_HOST
+from logger.logger import custom_logger
 
-from core.config import MAX_IDS_EXIST
-from core.constant import RECOMMENDATION_SERVICE_HOST
-if MAX_IDS_EXIST:
-    from core.config import map_track_ids
+# Only embedded mode loads the recommendation package.
+embedded_recommender = (
+    importlib.import_module("api.helpers.recommender").embedded_recommender
+    if RECOMMENDATION_MODE == "embedded"
+    else None
+)
 
 
 def get_password_hash(password: str) -> str:
@@ -23,12 +31,134 @@ def get_tags_keywords(tags: List[str]) -> List[str]:
     return [tag.strip() for tag in tags]
 
 
-async def get_recommendation(track_id: UUID, existed_ids: List[UUID]):
-    """Get recommendation."""
+async def get_recommendation(track_id: UUID, existed_ids: List[UUID], weights: Dict[str, float] = None):
+    """Get recommendation.
+
+    ``weights`` may hold ``image_weight``, ``metadata_weight`` and ``collaborative_weight``
+    to rank with another blend than the configured one.
+    """
+    if not MAX_IDS_EXIST:
+        return []
     url = f"{RECOMMENDATION_SERVICE_HOST}/api/recommend"
-    existed_ids = [str(existed_id) for existed_id in existed_ids]
-    body = {"track_id": str(track_id), "existed_ids": existed_ids}
-    async with aiohttp.ClientSession() as session:
+    # The recommendation service ranks Spotify ids, so existed ids are sent as Spotify ids too.
+    existed_ids = track_id_map.to_spotify_ids(str(existed_id) for existed_id in existed_ids)
+    if RECOMMENDATION_MODE == "embedded":
+        recommend_ids = await asyncio.to_thread(
+            embedded_recommender.get_recommendation, track_id_map[str(track_id)], existed_ids, weights
+        )
+        return track_id_map.to_track_ids(recommend_ids)
+    body = {"track_id": str(track_id), "existed_ids": existed_ids, **(weights or {})}
+    session = await http_client.get_session()
+    async with session.post(url, json=body) as response:
+        res = await response.json(content_type=None)
+        return track_id_map.to_track_ids(res["recommend_ids"])
+
+
+async def get_recommendation_batch(track_ids: List[UUID], existed_ids: List[UUID] = None) -> Dict[str, List[str]]:
+    """Get recommendation for many tracks in one request, keyed by track id."""
+    url = f"{RECOMMENDATION_SERVICE_HOST}/api/recommend/batch"
+    existed_ids = track_id_map.to_spotify_ids(str(existed_id) for existed_id in existed_ids or [])
+    # Tracks without embeddings cannot be anchors.
+    anchors = [str(track_id) for track_id in track_ids if str(track_id) in track_id_map]
+    if RECOMMENDATION_MODE == "embedded":
+        recommendations = await asyncio.to_thread(
+            embedded_recommender.get_recommendation_batch, track_id_map.to_spotify_ids(anchors), existed_ids
+        )
+        return {
+            anchor: track_id_map.to_track_ids(recommendations.get(track_id_map[anchor], []))
+            for anchor in anchors
+        }
+    body = {"anchors": [{"track_id": anchor, "existed_ids": existed_ids} for anchor in anchors]}
+    session = await http_client.get_session()
+    async with session.post(url, json=body) as response:
+        res = await response.json(content_type=None)
+        return {
+            anchor: track_id_map.to_track_ids(recommend_ids)
+            for anchor, recommend_ids in res["recommendations"].items()
+        }
+
+
+async def get_recommendation_by_profile(track_ids: List[UUID], existed_ids: List[UUID] = None, top_k: int = None):
+    """Get recommendation for a taste profile of many tracks, most recent first."""
+    url = f"{RECOMMENDATION_SERVICE_HOST}/api/recommend/user"
+    anchors = [str(track_id) for track_id in track_ids]
+    existed_ids = track_id_map.to_spotify_ids(str(existed_id) for existed_id in existed_ids or [])
+    if RECOMMENDATION_MODE == "embedded":
+        recommend_ids = await asyncio.to_thread(
+            embedded_recommender.get_recommendation_by_profile,
+            track_id_map.to_spotify_ids(anchors),
+            existed_ids,
+            RECOMMENDATION_PROFILE,
+            top_k,
+        )
+        return track_id_map.to_track_ids(recommend_ids)
+    body = {"track_ids": anchors, "existed_ids": existed_ids, "profile": RECOMMENDATION_PROFILE, "top_k": top_k}
+    session = await http_client.get_session()
+    async with session.post(url, json=body) as response:
+        res = await response.json(content_type=None)
+        return track_id_map.to_track_ids(res["recommend_ids"])
+
+
+async def get_track_vectors(track_ids: List[UUID]) -> Tuple[Dict[str, List[float]], str]:
+    """Get the recommendation vector of every track with embeddings, keyed by track id.
+
+    Also returns the checksum of the embeddings the vectors come from.
+    """
+    url = f"{RECOMMENDATION_SERVICE_HOST}/api/recommend/vectors"
+    anchors = [str(track_id) for track_id in track_ids if str(track_id) in track_id_map]
+    if RECOMMENDATION_MODE == "embedded":
+        vectors, checksum = await asyncio.to_thread(
+            embedded_recommender.get_vectors, track_id_map.to_spotify_ids(anchors)
+        )
+        vectors = {anchor: vectors[track_id_map[anchor]] for anchor in anchors if track_id_map[anchor] in vectors}
+        return vectors, checksum
+    session = await http_client.get_session()
+    async with session.post(url, json={"track_ids": anchors}) as response:
+        res = await response.json(content_type=None)
+        return res["vectors"], res["checksum"]
+
+
+async def get_recommendation_by_vector(
+    vector: List[float], existed_ids: List[UUID] = None, top_k: int = None, checksum: str = None
+) -> Optional[List[str]]:
+    """Get recommendation for a taste vector.
+
+    Returns None when the vector is rejected, because it was built from
+    embeddings of another checksum or dimension than the index.
+    """
+    url = f"{RECOMMENDATION_SERVICE_HOST}/api/recommend/vector"
+    existed_ids = track_id_map.to_spotify_ids(str(existed_id) for existed_id in existed_ids or [])
+    if RECOMMENDATION_MODE == "embedded":
+        recommend_ids = await asyncio.to_thread(
+            embedded_recommender.get_recommendation_by_vector, vector, existed_ids, top_k, checksum
+        )
+        return None if recommend_ids is None else track_id_map.to_track_ids(recommend_ids)
+    body = {"vector": vector, "existed_ids": existed_ids, "top_k": top_k, "checksum": checksum}
+    session = await http_client.get_session()
+    async with session.post(url, json=body) as response:
+        res = await response.json(content_type=None)
+        if "recommend_ids" not in res:
+            custom_logger.warning("Recommend for a taste vector failed: %s", res.get("message"))
+            return None
+        return track_id_map.to_track_ids(res["recommend_ids"])
+
+
+async def remove_recommendation_tracks(track_ids: List[UUID]):
+    """Remove tracks from the recommendation index, failures are logged and ignored."""
+    url = f"{RECOMMENDATION_SERVICE_HOST}/api/index/tracks/remove"
+    body = {"track_ids": [str(track_id) for track_id in track_ids]}
+    if RECOMMENDATION_MODE == "embedded":
+        # The tracks are already deleted, a failure here must not fail the request.
+        try:
+            version = await asyncio.to_thread(embedded_recommender.remove_tracks, body["track_ids"])
+            return {"version": version}
+        except Exception as e:
+            custom_logger.warning("Remove tracks from recommendation index failed: %r", e)
+            return None
+    try:
+        session = await http_client.get_session()
         async with session.post(url, json=body) as response:
-            res = await response.json(content_type=None)
-            return [key for key, value in map_track_ids.items() if value in res['recommend_ids']]
+            return await response.json(content_type=None)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        custom_logger.warning("Remove tracks from recommendation index failed: %r", e)
+        return None
@@ -25,7 +25,7 @@ async def create_liked_track(
 ):
     """Create a new liked track."""
     try:
-        return liketrack_service.create_liked_track(db, like_track_schema)
+        return await liketrack_service.create_liked_track(db, like_track_schema)
     except ValueError as e:
         error_object: BaseErrorMessage = e.args[0]
         return BaseResponse.error_response(
@@ -45,7 +45,7 @@ async def create_liked_tracks_bulk(
 ):
     """Bulk create liked tracks."""
     try:
-        return liketrack_service.create_liked_tracks_bulk(db, liked_track_schemas)
+        return await liketrack_service.create_liked_tracks_bulk(db, liked_track_schemas)
     except ValueError as e:
         error_object: BaseErrorMessage = e.args[0]
         return BaseResponse.error_response(
@@ -88,7 +88,7 @@ async def unliked_track(
 ):
     """Check liked track."""
     try:
-        return liketrack_service.delete_liked_track(db, liked_track_schema)
+        return await liketrack_service.delete_liked_track(db, liked_track_schema)
 
     except ValueError as e:
         error_object: BaseErrorMessage = e.args[0]
@@ -158,7 +158,7 @@ async def update_track(
 async def delete_track(track_id: UUID, db: Session = Depends(db_session)):
     """Delete track."""
     try:
-        return track_service.delete_track(db, track_id)
+        return await track_service.delete_track(db, track_id)
     except ValueError as e:
         error_object: BaseErrorMessage = e.args[0]
         return BaseResponse.error_response(
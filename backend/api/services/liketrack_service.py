@@ -5,6 +5,7 @@ from typing import List
 
 from api.database.execute.liked_track import liked_track_execute
 from api.database.models import LikedTrack
+from api.helpers.taste_vector import taste_vector_cache
 from api.schemas.liked_track import (
     LikedTrackCreateSchema,
     LikedTrackGetSchema,
@@ -19,17 +20,22 @@ class LikedTrackService:
         pass
 
     @staticmethod
-    def create_liked_track(db: Session, like_track_schema: LikedTrackCreateSchema) -> LikedTrack:
-        """Create new liked track."""
+    async def create_liked_track(db: Session, like_track_schema: LikedTrackCreateSchema) -> LikedTrack:
+        """Create new liked track, and add it to the taste vector of the user."""
         new_track = LikedTrack(
             user_id=like_track_schema.user_id,
             track_id=like_track_schema.track_id,
         )
-        return liked_track_execute.create_liked_track(db, liked_track=new_track)
+        liked_track = liked_track_execute.create_liked_track(db, liked_track=new_track)
+        await taste_vector_cache.like(like_track_schema.user_id, [like_track_schema.track_id])
+        return liked_track
 
     @staticmethod
-    def create_liked_tracks_bulk(db: Session, like_track_schemas: List[LikedTrackCreateSchema]) -> List[LikedTrack]:
-        """Bulk create liked tracks."""
+    async def create_liked_tracks_bulk(
+        db: Session,
+        like_track_schemas: List[LikedTrackCreateSchema],
+    ) -> List[LikedTrack]:
+        """Bulk create liked tracks, and add them to the taste vectors of their users."""
         new_tracks = [
             LikedTrack(
                 user_id=like_track_schema.user_id,
@@ -37,7 +43,13 @@ class LikedTrackService:
             )
             for like_track_schema in like_track_schemas
         ]
-        return liked_track_execute.create_liked_tracks_bulk(db, new_tracks)
+        liked_tracks = liked_track_execute.create_liked_tracks_bulk(db, new_tracks)
+        track_ids_by_user = {}
+        for like_track_schema in like_track_schemas:
+            track_ids_by_user.setdefault(like_track_schema.user_id, []).append(like_track_schema.track_id)
+        for user_id, track_ids in track_ids_by_user.items():
+            await taste_vector_cache.like(user_id, track_ids)
+        return liked_tracks
 
     @staticmethod
     def get_liked_track(db: Session, liked_track_schema: LikedTrackCreateSchema):
@@ -59,13 +71,16 @@ class LikedTrackService:
         )
 
     @staticmethod
-    def delete_liked_track(db: Session, liked_track_schema: LikedTrackCreateSchema):
-        """Delete liked track."""
-        return liked_track_execute.delete_liked_track(
+    async def delete_liked_track(db: Session, liked_track_schema: LikedTrackCreateSchema):
+        """Delete liked track, and remove it from the taste vector of the user."""
+        liked_track = liked_track_execute.delete_liked_track(
             db=db,
             user_id=liked_track_schema.user_id,
             track_id=liked_track_schema.track_id,
         )
+        if liked_track:
+            await taste_vector_cache.unlike(liked_track_schema.user_id, [liked_track_schema.track_id])
+        return liked_track
 
 
 liketrack_service = LikedTrackService()
@@ -6,6 +6,7 @@ from uuid import UUID
 
 from api.database.execute.track import track_execute
 from api.database.models import Track
+from api.helpers.utils import remove_recommendation_tracks
 from api.schemas.track import TrackCreateSchema, TrackUpdateSchema
 from sqlalchemy.orm import Session
 
@@ -56,9 +57,11 @@ class TrackService:
         return track_execute.update_track(db=db, track_id=track_id, track=track_data)
 
     @staticmethod
-    def delete_track(db: Session, track_id: int) -> Track:
-        """Delete track."""
-        return track_execute.delete_track(db, track_id)
+    async def delete_track(db: Session, track_id: int) -> Track:
+        """Delete track, and mask it out of the recommendation index."""
+        track = track_execute.delete_track(db, track_id)
+        await remove_recommendation_tracks([track_id])
+        return track
 
     @staticmethod
     def get_track_by_name(db: Session, track_name: str) -> List[Track]:
@@ -6,7 +6,7 @@ from __future__ import annotations
 import logging
 import sys
 import os
-import json
+from api.helpers.track_id_map import TrackIdMap
 from core.logging import InterceptHandler
 from dotenv import load_dotenv
 from loguru import logger
@@ -59,9 +59,11 @@ file_path = "./data/map_track_ids.json"
 
 # Check if the file exists
 if os.path.exists(file_path):
-    with open(file_path, "r", encoding="utf-8") as f:
-        map_track_ids = json.load(f)
+    # Built once, so recommendation ids map both ways with dictionary lookups.
+    track_id_map = TrackIdMap.load(file_path)
     MAX_IDS_EXIST = True
 else:
     print(f"File {file_path} does not exist.")
+    # Empty, so no track has a Spotify id and lookups find nothing.
+    track_id_map = TrackIdMap({})
     MAX_IDS_EXIST = False
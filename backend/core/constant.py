@@ -38,3 +38,36 @@ REDIS_HOST = os.getenv("REDIS_HOST")
 REDIS_PORT = os.getenv("REDIS_PORT")
 
 RECOMMENDATION_SERVICE_HOST = os.getenv("RECOMMENDATION_SERVICE_HOST")
+
+# Pooled HTTP client, timeouts in seconds
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "2"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+
+# Recommendation backend, "http" calls the recommendation service, "embedded" loads its engine in-process
+RECOMMENDATION_MODE = os.getenv("RECOMMENDATION_MODE", "http")
+RECOMMENDATION_DATA_PATH = os.getenv("RECOMMENDATION_DATA_PATH", "../recommendation/data")
+RECOMMENDATION_TOP_K = int(os.getenv("RECOMMENDATION_TOP_K", "5"))
+RECOMMENDATION_IMAGE_WEIGHT = float(os.getenv("RECOMMENDATION_IMAGE_WEIGHT", "0.6"))
+RECOMMENDATION_METADATA_WEIGHT = float(os.getenv("RECOMMENDATION_METADATA_WEIGHT", "0.4"))
+# Maximal marginal relevance re-ranking in embedded mode, 0 ranks by score only.
+RECOMMENDATION_DIVERSITY = float(os.getenv("RECOMMENDATION_DIVERSITY", "0"))
+RECOMMENDATION_DIVERSITY_POOL_SIZE = int(os.getenv("RECOMMENDATION_DIVERSITY_POOL_SIZE", "200"))
+# ANN probes and quantised first pass in embedded mode, as ANN_NUM_PROBE and QUANTIZATION of the recommendation service.
+RECOMMENDATION_ANN_NUM_PROBE = int(os.getenv("RECOMMENDATION_ANN_NUM_PROBE", "0"))
+RECOMMENDATION_QUANTIZATION = os.getenv("RECOMMENDATION_QUANTIZATION", "none")
+RECOMMENDATION_QUANTIZATION_RERANK_SIZE = int(os.getenv("RECOMMENDATION_QUANTIZATION_RERANK_SIZE", "256"))
+# User recommendations from a taste profile of the liked tracks: "mean", "recency" or "kmeans".
+# The mean profile is kept per user in Redis as a running sum, updated on like and unlike.
+RECOMMENDATION_PROFILE = os.getenv("RECOMMENDATION_PROFILE", "mean")
+RECOMMENDATION_PROFILE_RECENCY_DECAY = float(os.getenv("RECOMMENDATION_PROFILE_RECENCY_DECAY", "0.9"))
+RECOMMENDATION_PROFILE_NUM_CLUSTERS = int(os.getenv("RECOMMENDATION_PROFILE_NUM_CLUSTERS", "3"))
+TASTE_VECTOR_EXPIRE = int(os.getenv("TASTE_VECTOR_EXPIRE", str(7 * 24 * 3600)))
+# Item-item similarity built from liked tracks by ``data/build_item_similarity.py``, blended into
+# the content scores with RECOMMENDATION_COLLABORATIVE_WEIGHT in embedded mode.
+ITEM_SIMILARITY_SIZE = int(os.getenv("ITEM_SIMILARITY_SIZE", "50"))
+ITEM_SIMILARITY_CHUNK_SIZE = int(os.getenv("ITEM_SIMILARITY_CHUNK_SIZE", "100000"))
+RECOMMENDATION_COLLABORATIVE_WEIGHT = float(os.getenv("RECOMMENDATION_COLLABORATIVE_WEIGHT", "0"))
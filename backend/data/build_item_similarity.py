@@ -0,0 +1,64 @@
+# pylint: disable=E0401
+"""Build the item-item similarity of liked tracks."""
+
+import os
+import sys
+
+code_root = os.path.abspath(os.path.join(__file__, "../.."))
+print(f"sys_root = {code_root}")
+if code_root not in sys.path:
+    sys.path.append(code_root)
+# The similarity is built with the recommendation service helpers.
+repo_root = os.path.abspath(os.path.join(code_root, ".."))
+if repo_root not in sys.path:
+    sys.path.append(repo_root)
+
+import numpy as np
+from sqlalchemy import select
+
+from api.database.models import LikedTrack, db
+from core.config import track_id_map
+from core.constant import ITEM_SIMILARITY_CHUNK_SIZE, ITEM_SIMILARITY_SIZE, RECOMMENDATION_DATA_PATH
+from recommendation.api.helpers.collaborative import ItemSimilarity
+
+
+def build_item_similarity():
+    """Build item similarity."""
+    # Tracks are coded by their position among the sorted Spotify ids, so codes sort like labels.
+    spotify_labels = np.unique(list(track_id_map.track_to_spotify.values()))
+    user_codes = {}
+    user_chunks, item_chunks = [], []
+
+    session = db.SessionLocal()
+    try:
+        # Likes are streamed with a server-side cursor, one chunk in memory at a time.
+        query = select(LikedTrack.user_id, LikedTrack.track_id).execution_options(yield_per=ITEM_SIMILARITY_CHUNK_SIZE)
+        for rows in session.execute(query).partitions():
+            rows = [(user_id, track_id_map.get_spotify_id(str(track_id))) for user_id, track_id in rows]
+            rows = [(user_id, spotify_id) for user_id, spotify_id in rows if spotify_id is not None]
+            if not rows:
+                continue
+            user_chunks.append(
+                np.fromiter((user_codes.setdefault(user_id, len(user_codes)) for user_id, _ in rows), dtype=np.int32)
+            )
+            item_chunks.append(np.searchsorted(spotify_labels, [spotify_id for _, spotify_id in rows]).astype(np.int32))
+            print(f"Read {sum(map(len, user_chunks))} likes")
+    finally:
+        session.close()
+
+    if not user_chunks:
+        print("No likes of tracks with embeddings, nothing to build.")
+        return
+    item_similarity = ItemSimilarity.from_likes(
+        np.concatenate(user_chunks),
+        np.concatenate(item_chunks),
+        ITEM_SIMILARITY_SIZE,
+    )
+    item_similarity.labels = spotify_labels[item_similarity.labels]
+    path = os.path.join(RECOMMENDATION_DATA_PATH, "item_similarity.npz")
+    item_similarity.save(path)
+    print(f"Saved {len(item_similarity.indices)} similarities of {item_similarity.num_items} tracks to {path}")
+
+
+if __name__ == "__main__":
+    build_item_similarity()
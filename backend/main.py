@@ -7,6 +7,7 @@ import uvicorn
 from api.database.models import db
 from api.errors.http_error import http_error_handler
 from api.errors.validation_error import http422_error_handler
+from api.helpers.http_client import http_client
 from api.routes.api import app as api_router
 from api.services.user_service import UserService
 from core.config import API_PREFIX, DEBUG, PROJECT_NAME, VERSION
@@ -39,10 +40,12 @@ def get_application() -> FastAPI:
         redis_connection = redis.from_url(f"redis://{redis_host}:{redis_port}", encoding="utf8")  # For Ubuntu
         await FastAPILimiter.init(redis_connection)
         FastAPICache.init(InMemoryBackend())
+        await http_client.start()
 
         yield  # Signals that startup is complete
 
         custom_logger.info("Shutting down application...")
+        await http_client.close()
         await redis_connection.close()
 
     application = FastAPI(
@@ -0,0 +1,204 @@
+# pylint: disable=E0401
+"""Incremental updates of the cached taste vectors."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+import redis
+from api.helpers import taste_vector
+from api.helpers.taste_vector import TasteVectorCache
+
+VECTORS = {"a": [1.0, 2.0], "b": [3.0, 4.0], "c": [5.0, 6.0]}
+CHECKSUM = "checksum"
+
+
+class FakePipeline:
+    """Pipeline of ``FakeRedis``, commands run at once until ``multi`` and are queued after it."""
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.queued = None
+
+    def multi(self):
+        """Start queuing commands."""
+        self.queued = []
+
+    def execute(self):
+        """Run the queued commands."""
+        results = [command() for command in self.queued or []]
+        self.queued = None
+        return results
+
+    def __getattr__(self, name):
+        command = getattr(self.redis_client, name)
+
+        def call(*args, **kwargs):
+            if self.queued is None:
+                return command(*args, **kwargs)
+            self.queued.append(lambda: command(*args, **kwargs))
+            return self
+
+        return call
+
+
+class FakeRedis:
+    """In-memory Redis holding the commands used by the taste vector cache."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        """Get a string."""
+        value = self.data.get(key)
+        return None if value is None else str(value).encode()
+
+    def incr(self, key):
+        """Increment a counter."""
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    def expire(self, key, seconds):
+        """Expiry is not simulated."""
+        return key in self.data and seconds > 0
+
+    def exists(self, key):
+        """Whether a key exists."""
+        return int(key in self.data)
+
+    def delete(self, *keys):
+        """Delete keys."""
+        for key in keys:
+            self.data.pop(key, None)
+
+    def hget(self, key, field):
+        """Get a field of a hash."""
+        value = self.data.get(key, {}).get(field)
+        return None if value is None else str(value).encode()
+
+    def hgetall(self, key):
+        """Get every field of a hash."""
+        return {field.encode(): str(value).encode() for field, value in self.data.get(key, {}).items()}
+
+    def hset(self, key, mapping):
+        """Set fields of a hash."""
+        self.data.setdefault(key, {}).update(mapping)
+
+    def hincrbyfloat(self, key, field, amount):
+        """Increment a float field of a hash."""
+        fields = self.data.setdefault(key, {})
+        fields[field] = float(fields.get(field, 0)) + amount
+
+    def hincrby(self, key, field, amount):
+        """Increment an integer field of a hash."""
+        fields = self.data.setdefault(key, {})
+        fields[field] = int(fields.get(field, 0)) + amount
+
+    def smembers(self, key):
+        """Get the members of a set."""
+        return {member.encode() for member in self.data.get(key, set())}
+
+    def sismember(self, key, member):
+        """Whether a member is in a set."""
+        return member in self.data.get(key, set())
+
+    def sadd(self, key, *members):
+        """Add members to a set."""
+        self.data.setdefault(key, set()).update(members)
+
+    def srem(self, key, *members):
+        """Remove members from a set."""
+        self.data.get(key, set()).difference_update(members)
+
+    def pipeline(self):
+        """Get a pipeline queuing every command."""
+        pipeline = FakePipeline(self)
+        pipeline.multi()
+        return pipeline
+
+    def transaction(self, func, *watches, value_from_callable=False):
+        """Run ``func`` and its queued commands, nothing else runs meanwhile so watches never fire."""
+        assert watches
+        pipeline = FakePipeline(self)
+        value = func(pipeline)
+        pipeline.execute()
+        return value if value_from_callable else None
+
+
+@pytest.fixture(name="cache")
+def fixture_cache(monkeypatch):
+    """Taste vector cache over a fake Redis, track vectors come from ``VECTORS``."""
+
+    async def get_track_vectors(track_ids):
+        return {str(track_id): VECTORS[str(track_id)] for track_id in track_ids}, CHECKSUM
+
+    monkeypatch.setattr(taste_vector, "get_track_vectors", get_track_vectors)
+    cache = TasteVectorCache()
+    cache.redis_client = FakeRedis()
+    return cache
+
+
+def test_update_adds_and_subtracts_vectors(cache):
+    """Liked vectors are added to the sum and unliked ones subtracted, each track counted once."""
+    cache.save("user", {"a": VECTORS["a"]}, CHECKSUM)
+    cache.update("user", {"b": VECTORS["b"]}, sign=1, checksum=CHECKSUM)
+    cache.update("user", {"b": VECTORS["b"]}, sign=1, checksum=CHECKSUM)
+    vector_sum, count, liked_ids, _ = cache.get("user")
+    assert vector_sum == [4.0, 6.0] and count == 2 and sorted(liked_ids) == ["a", "b"]
+
+    cache.update("user", {"a": VECTORS["a"]}, sign=-1, checksum=CHECKSUM)
+    cache.update("user", {"a": VECTORS["a"]}, sign=-1, checksum=CHECKSUM)
+    vector_sum, count, liked_ids, _ = cache.get("user")
+    assert vector_sum == [3.0, 4.0] and count == 1 and liked_ids == ["b"]
+
+
+def test_update_skips_users_that_are_not_cached(cache):
+    """Users without a cached vector are left to be rebuilt from the database."""
+    cache.update("user", {"a": VECTORS["a"]}, sign=1, checksum=CHECKSUM)
+    assert cache.get("user") is None
+
+
+def test_like_bumps_the_version(cache):
+    """Every like and unlike moves the version, so a rebuild that raced it is not saved."""
+    cache.save("user", {"a": VECTORS["a"]}, CHECKSUM)
+    version = cache.get_version("user")
+    asyncio.run(cache.like("user", ["c"]))
+    assert cache.get_version("user") == version + 1
+    assert cache.get("user")[:2] == ([6.0, 8.0], 2)
+    assert not cache.save("user", {"a": VECTORS["a"]}, CHECKSUM, version)
+    assert cache.get("user")[:2] == ([6.0, 8.0], 2)
+
+
+def test_failed_update_drops_the_vector(cache, monkeypatch):
+    """A timeout fetching the liked vectors drops the cached vector instead of leaving it stale."""
+
+    async def get_track_vectors(track_ids):
+        raise asyncio.TimeoutError()
+
+    cache.save("user", {"a": VECTORS["a"]}, CHECKSUM)
+    monkeypatch.setattr(taste_vector, "get_track_vectors", get_track_vectors)
+    asyncio.run(cache.like("user", ["b"]))
+    assert cache.get("user") is None
+
+
+def test_vector_of_other_embeddings_is_rebuilt(cache, monkeypatch):
+    """A vector built from other embeddings is dropped by updates and rebuilt for the current ones."""
+    cache.save("user", {"a": [1.0, 2.0, 3.0], "b": [4.0, 5.0, 6.0]}, "old")
+    cache.update("user", {"c": VECTORS["c"]}, sign=1, checksum=CHECKSUM)
+    assert cache.get("user") is None
+
+    liked_track_execute = SimpleNamespace(get_liked_track_ids_by_user=lambda db, user_id: ["a", "b", "c"])
+    monkeypatch.setattr(taste_vector, "liked_track_execute", liked_track_execute)
+    vector = asyncio.run(cache.get_or_build(None, "user"))
+    assert vector == ([9.0, 12.0], 3, ["a", "b", "c"], CHECKSUM)
+    assert cache.get("user")[:2] == ([9.0, 12.0], 3)
+
+
+def test_redis_errors_are_not_raised(cache):
+    """A failing Redis makes ``get_or_build`` return None, callers then rank the liked tracks without it."""
+
+    def fail(*args, **kwargs):
+        raise redis.ConnectionError("down")
+
+    cache.redis_client.hgetall = fail
+    assert asyncio.run(cache.get_or_build(None, "user")) is None
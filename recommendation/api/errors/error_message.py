@@ -93,3 +93,67 @@ class VerifiedEmail(BaseErrorMessage):
     status_code = 404
     message_code = 10
     message = "Verified email."
+
+
+class EmbeddingDimensionError(BaseErrorMessage):
+    """Embedding dimension error."""
+
+    status_code = 400
+    message_code = 11
+    message = "Embedding dimension does not match the index."
+
+
+class ProfileModeError(BaseErrorMessage):
+    """Profile mode error."""
+
+    status_code = 400
+    message_code = 12
+    message = "Profile mode must be one of mean, recency or kmeans."
+
+
+class HybridWeightsError(BaseErrorMessage):
+    """Hybrid weights error."""
+
+    status_code = 400
+    message_code = 13
+    message = "Weights must not be negative and must not all be zero."
+
+
+class TrackFilterError(BaseErrorMessage):
+    """Track filter error."""
+
+    status_code = 400
+    message_code = 14
+    message = "Genre and tag filters are not available, the track catalog is not loaded."
+
+
+class DiversityError(BaseErrorMessage):
+    """Diversity error."""
+
+    status_code = 400
+    message_code = 15
+    message = "Diversity must be between 0 and 1."
+
+
+class ScoringBusyError(BaseErrorMessage):
+    """Scoring busy error."""
+
+    status_code = 503
+    message_code = 16
+    message = "Too many recommendation requests in progress, retry later."
+
+
+class TrackNotIndexedError(BaseErrorMessage):
+    """Track not indexed error."""
+
+    status_code = 404
+    message_code = 17
+    message = "Track is not in the recommendation index."
+
+
+class StaleTasteVectorError(BaseErrorMessage):
+    """Stale taste vector error."""
+
+    status_code = 409
+    message_code = 18
+    message = "Taste vector was built from other embeddings than the index, rebuild it."
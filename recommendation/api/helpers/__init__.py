@@ -0,0 +1 @@
+"""Contain general helper functions."""
@@ -0,0 +1,109 @@
+# pylint: disable=E0401
+"""Approximate nearest neighbour index."""
+
+from __future__ import annotations
+
+from typing import List, Optional
+
+import numpy as np
+
+from .engine import SimilarityEngine, l2_normalize
+
+
+class IVFIndex:
+    """Inverted file index with k-means coarse quantisation (IVF-Flat)."""
+
+    def __init__(self, centroids: np.ndarray, list_offsets: np.ndarray, list_rows: np.ndarray):
+        self.centroids = centroids
+        # Rows of list ``i`` are ``list_rows[list_offsets[i] : list_offsets[i + 1]]``.
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+
+    @property
+    def num_lists(self) -> int:
+        """Number of inverted lists."""
+        return len(self.centroids)
+
+    @property
+    def num_rows(self) -> int:
+        """Number of indexed rows."""
+        return len(self.list_rows)
+
+    @staticmethod
+    def assign(embedding_matrix: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """Assign every row to its most similar centroid."""
+        assignments = np.empty(len(embedding_matrix), dtype=np.int32)
+        for start in range(0, len(embedding_matrix), chunk_size):
+            chunk = embedding_matrix[start : start + chunk_size]
+            assignments[start : start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+        return assignments
+
+    @classmethod
+    def train(
+        cls,
+        embedding_matrix: np.ndarray,
+        num_lists: int,
+        num_iter: int = 20,
+        sample_size: int = 262144,
+        seed: int = 0,
+    ) -> IVFIndex:
+        """Train spherical k-means centroids on a sample and build the inverted lists."""
+        rng = np.random.default_rng(seed)
+        num_lists = min(num_lists, len(embedding_matrix))
+        sample_rows = rng.choice(len(embedding_matrix), min(sample_size, len(embedding_matrix)), replace=False)
+        sample = l2_normalize(embedding_matrix[np.sort(sample_rows)]).astype(np.float32)
+        centroids = sample[rng.choice(len(sample), num_lists, replace=False)]
+
+        for _ in range(num_iter):
+            assignments = cls.assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            # Empty lists keep their previous centroid.
+            empty = ~np.any(sums, axis=1)
+            sums[empty] = centroids[empty]
+            centroids = l2_normalize(sums).astype(np.float32)
+
+        return cls.from_centroids(embedding_matrix, centroids)
+
+    @classmethod
+    def from_centroids(cls, embedding_matrix: np.ndarray, centroids: np.ndarray) -> IVFIndex:
+        """Build the inverted lists of a matrix over trained centroids."""
+        assignments = cls.assign(embedding_matrix, centroids)
+        list_rows = np.argsort(assignments, kind="stable").astype(np.int32)
+        list_offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        list_offsets[1:] = np.cumsum(np.bincount(assignments, minlength=len(centroids)))
+        return cls(centroids, list_offsets, list_rows)
+
+    def get_candidates(self, query: np.ndarray, num_probe: int) -> np.ndarray:
+        """Get the rows of the ``num_probe`` lists closest to the query, in row order."""
+        num_probe = min(num_probe, self.num_lists)
+        probes = np.argpartition(-(self.centroids @ query), num_probe - 1)[:num_probe]
+        lists = [self.list_rows[self.list_offsets[probe] : self.list_offsets[probe + 1]] for probe in probes]
+        return np.sort(np.concatenate(lists))
+
+    def save(self, path: str):
+        """Save the index."""
+        np.savez(path, centroids=self.centroids, list_offsets=self.list_offsets, list_rows=self.list_rows)
+
+    @classmethod
+    def load(cls, path: str) -> IVFIndex:
+        """Load the index."""
+        with np.load(path) as data:
+            return cls(data["centroids"], data["list_offsets"], data["list_rows"])
+
+
+class AnnSearch:
+    """Answer queries by scoring the probed lists of an IVF index."""
+
+    def __init__(self, ann_index: IVFIndex, num_probe: int):
+        self.ann_index = ann_index
+        self.num_probe = num_probe
+
+    def search(
+        self, engine: SimilarityEngine, query: np.ndarray, k: int, excluded: np.ndarray, row: int = None
+    ) -> Optional[List[str]]:
+        """Get the k best labels among the probed rows and the appended ones, None when they give fewer."""
+        rows = self.ann_index.get_candidates(query, self.num_probe)
+        rows = np.concatenate([rows, np.arange(engine.num_base_rows, engine.num_rows)])
+        recommend_ids = engine.top_k(engine.get_vectors(rows) @ query, k, excluded[rows], rows)
+        return recommend_ids if len(recommend_ids) == k else None
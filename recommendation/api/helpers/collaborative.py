@@ -0,0 +1,118 @@
+# pylint: disable=E0401
+"""Item-item collaborative filtering."""
+
+from __future__ import annotations
+
+import numpy as np
+
+
+def get_offsets(groups: np.ndarray, num_groups: int) -> np.ndarray:
+    """Get CSR offsets of values sorted by group."""
+    offsets = np.zeros(num_groups + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(groups, minlength=num_groups))
+    return offsets
+
+
+def gather(values: np.ndarray, offsets: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """Concatenate the CSR slices of many groups."""
+    starts, counts = offsets[groups], offsets[groups + 1] - offsets[groups]
+    positions = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return values[np.repeat(starts, counts) + positions]
+
+
+class ItemSimilarity:
+    """Top-N cosine similarity between items liked by the same users, in CSR form.
+
+    The neighbours of item ``i`` are ``indices[indptr[i] : indptr[i + 1]]``,
+    best first, with their similarities in ``data``. Items are keyed by their
+    sorted labels, so the matrix survives changes of the embedding rows.
+    """
+
+    def __init__(self, labels: np.ndarray, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray):
+        self.labels = labels
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        # Embedding row of every item, -1 when the item has no embeddings.
+        self.item_rows = None
+
+    @property
+    def num_items(self) -> int:
+        """Number of items."""
+        return len(self.labels)
+
+    @classmethod
+    def from_likes(cls, user_ids: np.ndarray, item_labels: np.ndarray, num_neighbours: int) -> ItemSimilarity:
+        """Build the matrix from (user, item) likes.
+
+        ``cosine(i, j) = users(i, j) / sqrt(users(i) * users(j))``, computed one
+        item at a time from the users who liked it, so memory stays linear in
+        the number of likes.
+        """
+        labels, items = np.unique(item_labels, return_inverse=True)
+        user_labels, users = np.unique(user_ids, return_inverse=True)
+        num_items, num_users = len(labels), len(user_labels)
+        # A user liking an item twice counts once, pairs come out sorted by user then item.
+        pairs = np.unique(users.astype(np.int64) * num_items + items)
+        users, items = pairs // num_items, pairs % num_items
+        user_offsets = get_offsets(users, num_users)
+        item_order = np.argsort(items, kind="stable")
+        item_users, item_offsets = users[item_order], get_offsets(items, num_items)
+        item_counts = np.diff(item_offsets)
+
+        indptr = np.zeros(num_items + 1, dtype=np.int64)
+        indices, data = [], []
+        for item in range(num_items):
+            neighbours = gather(items, user_offsets, item_users[item_offsets[item] : item_offsets[item + 1]])
+            neighbours, co_counts = np.unique(neighbours, return_counts=True)
+            keep = neighbours != item
+            neighbours, co_counts = neighbours[keep], co_counts[keep]
+            similarities = co_counts / np.sqrt(item_counts[item] * item_counts[neighbours])
+
+            if len(neighbours) > num_neighbours:
+                # Neighbours tied with the last kept one compete on item order.
+                threshold = -np.partition(-similarities, num_neighbours - 1)[num_neighbours - 1]
+                best = similarities >= threshold
+                neighbours, similarities = neighbours[best], similarities[best]
+            order = np.lexsort((neighbours, -similarities))[:num_neighbours]
+            indices.append(neighbours[order])
+            data.append(similarities[order])
+            indptr[item + 1] = indptr[item] + len(order)
+
+        indices = np.concatenate(indices).astype(np.int32) if indices else np.empty(0, dtype=np.int32)
+        data = np.concatenate(data).astype(np.float32) if data else np.empty(0, dtype=np.float32)
+        return cls(labels, indptr, indices, data)
+
+    def align(self, sorted_labels: np.ndarray, sorted_rows: np.ndarray):
+        """Map every item to its embedding row through the sorted label table of the engine."""
+        positions = np.minimum(np.searchsorted(sorted_labels, self.labels), len(sorted_labels) - 1)
+        found = sorted_labels[positions] == self.labels
+        self.item_rows = np.where(found, sorted_rows[positions], -1)
+
+    def get_items(self, labels: np.ndarray) -> np.ndarray:
+        """Get the item of every label, -1 for labels nobody liked."""
+        positions = np.minimum(np.searchsorted(self.labels, labels), max(self.num_items - 1, 0))
+        found = self.labels[positions] == labels if self.num_items else np.zeros(len(labels), dtype=bool)
+        return np.where(found, positions, -1)
+
+    def score(self, label: str, num_rows: int) -> np.ndarray:
+        """Score every embedding row against the item of a label, rows without a similarity score 0."""
+        scores = np.zeros(num_rows, dtype=np.float32)
+        item = self.get_items(np.asarray([label]))[0]
+        if item < 0:
+            return scores
+        neighbours = self.indices[self.indptr[item] : self.indptr[item + 1]]
+        rows = self.item_rows[neighbours]
+        found = rows >= 0
+        scores[rows[found]] = self.data[self.indptr[item] : self.indptr[item + 1]][found]
+        return scores
+
+    def save(self, path: str):
+        """Save the matrix."""
+        np.savez(path, labels=self.labels, indptr=self.indptr, indices=self.indices, data=self.data)
+
+    @classmethod
+    def load(cls, path: str) -> ItemSimilarity:
+        """Load the matrix."""
+        with np.load(path) as data:
+            return cls(data["labels"], data["indptr"], data["indices"], data["data"])
@@ -0,0 +1,272 @@
+# pylint: disable=E0401
+"""Similarity engine."""
+
+from __future__ import annotations
+
+import copy
+from typing import TYPE_CHECKING, Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from .ranking import Ranker
+from .scoring import HybridScorer, HybridWeights
+
+if TYPE_CHECKING:
+    from .store import EmbeddingStore
+
+
+def l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    """Normalize every row of a matrix to unit length."""
+    matrix = np.asarray(matrix, dtype=np.float64)
+    norms = np.sqrt(np.sum(matrix**2, axis=1, keepdims=True))
+    return matrix / norms
+
+
+def build_fused_matrix(
+    embeded_images: np.ndarray,
+    metadata_matrix: np.ndarray,
+    image_weight: float,
+    metadata_weight: float,
+    dtype=np.float32,
+) -> np.ndarray:
+    """Concatenate both normalized modalities with their weights folded in.
+
+    A dot product between a fused row and an unweighted query row gives
+    ``cos_image * image_weight + cos_metadata * metadata_weight``.
+    """
+    return np.hstack(
+        [
+            l2_normalize(embeded_images) * image_weight,
+            l2_normalize(metadata_matrix) * metadata_weight,
+        ]
+    ).astype(dtype)
+
+
+class SearchOptions(NamedTuple):
+    """Options of one search, None keeps the configured weights and diversity."""
+
+    weights: Optional[HybridWeights] = None
+    diversity: Optional[float] = None
+    # Rows the results are picked from, every row when None.
+    candidates: Optional[np.ndarray] = None
+
+
+class SimilarityEngine:
+    """Weighted cosine similarity over the fused embedding matrix.
+
+    ``indexes`` answer fused searches first, in order, each one returning None
+    to fall through to the next one and finally to an exact scan. ``scorer``
+    scores other weights than the fused ones and ``ranker`` picks the results.
+    """
+
+    def __init__(
+        self,
+        store: EmbeddingStore,
+        indexes: Sequence = (),
+        scorer: HybridScorer = None,
+        ranker: Ranker = None,
+    ):
+        self.store = store
+        self.indexes = tuple(indexes)
+        self.scorer = scorer or HybridScorer()
+        self.ranker = ranker or Ranker()
+        # Rows appended since the matrix was built are scanned after it, removed
+        # rows stay in place and are masked out by their tombstone.
+        self.delta_matrix = np.empty((0, store.embedding_matrix.shape[1]), dtype=store.embedding_matrix.dtype)
+        self.delta_labels = np.empty(0, dtype=store.labels.dtype)
+        self.tombstones = np.zeros(self.num_rows, dtype=bool)
+
+    @property
+    def num_base_rows(self) -> int:
+        """Number of rows in the embedding matrix."""
+        return len(self.store.embedding_matrix)
+
+    @property
+    def num_rows(self) -> int:
+        """Number of rows including appended ones."""
+        return self.num_base_rows + len(self.delta_matrix)
+
+    @property
+    def default_weights(self) -> HybridWeights:
+        """Weights of the configured blend, see ``HybridScorer.get_default_weights``."""
+        return self.scorer.get_default_weights(self)
+
+    def get_index(self, index_type: type):
+        """Get the index of a type, None when it is not used."""
+        return next((index for index in self.indexes if isinstance(index, index_type)), None)
+
+    def get_vectors(self, rows) -> np.ndarray:
+        """Get the fused vectors of one or many rows."""
+        embedding_matrix = self.store.embedding_matrix
+        if len(self.delta_matrix) == 0:
+            return embedding_matrix[rows]
+        rows = np.asarray(rows)
+        vectors = np.empty(rows.shape + embedding_matrix.shape[1:], dtype=embedding_matrix.dtype)
+        base = rows < self.num_base_rows
+        vectors[base] = embedding_matrix[rows[base]]
+        vectors[~base] = self.delta_matrix[rows[~base] - self.num_base_rows]
+        return vectors
+
+    def get_labels(self, rows: np.ndarray) -> np.ndarray:
+        """Get the labels of many rows."""
+        if len(self.delta_labels) == 0:
+            return self.store.labels[rows]
+        labels = np.empty(len(rows), dtype=np.result_type(self.store.labels.dtype, self.delta_labels.dtype))
+        base = rows < self.num_base_rows
+        labels[base] = self.store.labels[rows[base]]
+        labels[~base] = self.delta_labels[rows[~base] - self.num_base_rows]
+        return labels
+
+    def get_rows(self, ids: Iterable[str]) -> np.ndarray:
+        """Get the rows of every given label, unknown labels are ignored."""
+        ids = np.asarray(list(ids), dtype=str)
+        sorted_labels = self.store.sorted_labels
+        left = np.searchsorted(sorted_labels, ids, side="left")
+        counts = np.searchsorted(sorted_labels, ids, side="right") - left
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        rows = self.store.sorted_rows[np.repeat(left, counts) + offsets]
+        if len(self.delta_labels):
+            delta_rows = np.flatnonzero(np.isin(self.delta_labels, ids)) + self.num_base_rows
+            rows = np.concatenate([rows, delta_rows])
+        return rows
+
+    def get_exclusion_mask(self, ids: Iterable[str]) -> np.ndarray:
+        """Get a boolean mask of the removed rows and the rows of the given labels."""
+        mask = self.tombstones.copy()
+        mask[self.get_rows(ids)] = True
+        return mask
+
+    def get_query(self, rows) -> np.ndarray:
+        """Undo the folded weights of one or many rows so they can be used as queries."""
+        image_dim = self.store.image_dim
+        query = np.array(self.get_vectors(rows), dtype=self.store.embedding_matrix.dtype)
+        query[..., :image_dim] /= self.store.image_weight
+        query[..., image_dim:] /= self.store.metadata_weight
+        return query
+
+    def scan(self, query: np.ndarray) -> np.ndarray:
+        """Score every row against one query, or a batch of queries with one matrix product."""
+        if query.ndim == 1:
+            scores = self.store.embedding_matrix @ query
+            delta_scores = self.delta_matrix @ query
+        else:
+            scores = query @ self.store.embedding_matrix.T
+            delta_scores = query @ self.delta_matrix.T
+        if len(self.delta_matrix):
+            scores = np.concatenate([scores, delta_scores], axis=-1)
+        return scores
+
+    def score_batch(self, rows: np.ndarray) -> np.ndarray:
+        """Score every row against many anchor rows with one matrix product."""
+        return self.scan(self.get_query(rows))
+
+    def top_k(self, scores: np.ndarray, k: int, excluded: np.ndarray, rows: np.ndarray = None) -> List[str]:
+        """Get the labels of the k best rows that are not excluded, see ``Ranker.top_rows``.
+
+        ``scores`` and ``excluded`` cover ``rows`` (every row by default).
+        """
+        return list(self.get_labels(self.ranker.top_rows(self, np.where(excluded, -np.inf, scores), k, rows)))
+
+    def search(self, row: int, k: int, excluded: np.ndarray, options: SearchOptions = None) -> List[str]:
+        """Get the k best labels for an anchor row, among the candidate rows of the options when given.
+
+        Other weights, blending in collaborative scores or diversity always
+        run an exact scan, fused searches go through the indexes first.
+        """
+        options = options or SearchOptions()
+        diversity = self.ranker.diversity if options.diversity is None else options.diversity
+        weights = options.weights or self.default_weights
+        if options.candidates is not None:
+            scores = self.scorer.score_candidates(self, row, options.candidates, weights)
+            scores = np.where(excluded[options.candidates], -np.inf, scores)
+            return self.ranker.rank(self, scores, k, options.candidates, diversity)
+        if diversity > 0 or not self.scorer.is_fused(self, options.weights):
+            scores = np.where(excluded, -np.inf, self.scorer.score(self, row, weights))
+            return self.ranker.rank(self, scores, k, diversity=diversity)
+        return self.search_query(self.get_query(row), k, excluded, row)
+
+    def search_query(self, query: np.ndarray, k: int, excluded: np.ndarray, row: int = None) -> List[str]:
+        """Get the k best labels for an unweighted query row, the query of ``row`` when given."""
+        recommend_ids = self._search_indexes(query, k, excluded, row)
+        if recommend_ids is not None:
+            return recommend_ids
+        return self.top_k(self.scan(query), k, excluded)
+
+    def search_profile(self, queries: np.ndarray, k: int, excluded: np.ndarray) -> List[str]:
+        """Get the k best labels for a profile of one or many query rows.
+
+        Every row is scored by its best match among the queries, so each taste
+        of a multi-centroid profile is served.
+        """
+        if len(queries) == 1:
+            return self.search_query(queries[0], k, excluded)
+        return self.top_k(self.scan(queries).max(axis=0), k, excluded)
+
+    def search_batch(
+        self,
+        rows: List[int],
+        k: int,
+        excluded: List[np.ndarray],
+        options: SearchOptions = None,
+    ) -> List[List[str]]:
+        """Get the k best labels for many anchor rows, candidates of the options are not supported.
+
+        Fused searches the indexes do not answer are scanned with one matrix product.
+        """
+        options = options or SearchOptions()
+        diversity = self.ranker.diversity if options.diversity is None else options.diversity
+        if diversity > 0 or not self.scorer.is_fused(self, options.weights):
+            scores = self.scorer.score(self, np.asarray(rows), options.weights or self.default_weights)
+            return [
+                self.ranker.rank(self, np.where(row_excluded, -np.inf, row_scores), k, diversity=diversity)
+                for row_scores, row_excluded in zip(scores, excluded)
+            ]
+
+        results = [
+            self._search_indexes(self.get_query(row), k, row_excluded, row) if self.indexes else None
+            for row, row_excluded in zip(rows, excluded)
+        ]
+        misses = [idx for idx, recommend_ids in enumerate(results) if recommend_ids is None]
+        if misses:
+            scores = self.score_batch([rows[idx] for idx in misses])
+            for idx, row_scores in zip(misses, scores):
+                results[idx] = self.top_k(row_scores, k, excluded[idx])
+        return results
+
+    def _search_indexes(self, query: np.ndarray, k: int, excluded: np.ndarray, row: int = None) -> Optional[List[str]]:
+        """Get the k best labels from the first index that answers, None when none does."""
+        for index in self.indexes:
+            recommend_ids = index.search(self, query, k, excluded, row)
+            if recommend_ids is not None:
+                return recommend_ids
+        return None
+
+    def append(self, embedding_rows: np.ndarray, labels: np.ndarray) -> SimilarityEngine:
+        """Get a copy with fused rows appended, replacing the rows of labels that already exist."""
+        tombstones = self.tombstones.copy()
+        tombstones[self.get_rows(labels)] = True
+        engine = copy.copy(self)
+        engine.delta_matrix = np.vstack([self.delta_matrix, embedding_rows.astype(self.delta_matrix.dtype)])
+        engine.delta_labels = np.concatenate([self.delta_labels, labels])
+        engine.tombstones = np.concatenate([tombstones, np.zeros(len(embedding_rows), dtype=bool)])
+        engine.ranker = self.ranker.append(labels)
+        return engine
+
+    def with_delta(
+        self, delta_matrix: np.ndarray, delta_labels: np.ndarray, tombstone_rows: np.ndarray
+    ) -> SimilarityEngine:
+        """Get a copy of the base rows with another delta of appended and removed rows."""
+        engine = copy.copy(self)
+        engine.delta_matrix = delta_matrix.astype(self.delta_matrix.dtype)
+        engine.delta_labels = delta_labels
+        engine.tombstones = np.zeros(engine.num_rows, dtype=bool)
+        engine.tombstones[tombstone_rows] = True
+        engine.ranker = self.ranker.truncate(self.num_base_rows).append(delta_labels)
+        return engine
+
+    def remove(self, labels: Iterable[str]) -> SimilarityEngine:
+        """Get a copy with the rows of the given labels tombstoned."""
+        engine = copy.copy(self)
+        engine.tombstones = self.tombstones.copy()
+        engine.tombstones[self.get_rows(labels)] = True
+        return engine
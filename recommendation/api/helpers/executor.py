@@ -0,0 +1,47 @@
+# pylint: disable=E0401
+"""Executor of CPU-bound scoring."""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from api.errors.error_message import ScoringBusyError
+from core.config import SCORING_QUEUE_SIZE, SCORING_WORKERS
+
+
+class ScoringExecutor:
+    """Run scoring in a dedicated thread pool, off the event loop.
+
+    NumPy releases the GIL in matrix products, so threads score in parallel
+    while the loop keeps serving other requests. Calls beyond the workers
+    wait in a queue of ``max_queue``, further calls are rejected with
+    ``ScoringBusyError`` instead of piling up.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scoring")
+        # Submitted calls not finished yet, only changed on the event loop.
+        self.pending = 0
+        self.rejected = 0
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Get the result of ``func(*args, **kwargs)`` computed in the pool."""
+        if self.pending >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise ValueError(ScoringBusyError)
+        self.pending += 1
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        # The slot is freed once the thread is done, a cancelled caller does not stop it.
+        future.add_done_callback(self._release)
+        return await asyncio.shield(future)
+
+    def _release(self, _: asyncio.Future):
+        """Free the slot of a finished call."""
+        self.pending -= 1
+
+
+scoring_executor = ScoringExecutor(SCORING_WORKERS, SCORING_QUEUE_SIZE)
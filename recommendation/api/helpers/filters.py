@@ -0,0 +1,69 @@
+# pylint: disable=E0401
+"""Genre and tag filters over the embedding rows."""
+
+from __future__ import annotations
+
+import csv
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+
+def extract_tags(tag_string: str) -> List[str]:
+    """Extract tags, ``"rock: 100, indie: 80"`` gives ``["rock", "indie"]``."""
+    if not tag_string:
+        return []
+    return [item.split(": ")[0].strip().lower() for item in tag_string.split(", ")]
+
+
+class TrackFilter:
+    """Rows of every genre, as sorted row partitions, and of every tag, as packed bitmaps."""
+
+    def __init__(self, genre_rows: Dict[str, np.ndarray], tag_bitmaps: Dict[str, np.ndarray], num_rows: int):
+        self.genre_rows = genre_rows
+        self.tag_bitmaps = tag_bitmaps
+        self.num_rows = num_rows
+
+    @classmethod
+    def from_catalog(cls, path: str, sorted_labels: np.ndarray, sorted_rows: np.ndarray) -> TrackFilter:
+        """Build the partitions and bitmaps from the track catalog, keyed by lower case names."""
+        with open(path, encoding="utf-8") as f:
+            tracks = list(csv.DictReader(f))
+        labels = np.asarray([track["id"] for track in tracks], dtype=sorted_labels.dtype)
+        positions = np.minimum(np.searchsorted(sorted_labels, labels), len(sorted_labels) - 1)
+        found = sorted_labels[positions] == labels
+        rows = sorted_rows[positions]
+
+        genre_rows, tag_rows = {}, {}
+        for track, row, has_row in zip(tracks, rows, found):
+            if not has_row:
+                continue
+            genre = (track.get("genre") or "").strip().lower()
+            if genre:
+                genre_rows.setdefault(genre, []).append(row)
+            for tag in extract_tags(track.get("tags") or ""):
+                tag_rows.setdefault(tag, []).append(row)
+
+        num_rows = len(sorted_rows)
+        tag_bitmaps = {}
+        for tag, rows_of_tag in tag_rows.items():
+            mask = np.zeros(num_rows, dtype=bool)
+            mask[rows_of_tag] = True
+            tag_bitmaps[tag] = np.packbits(mask)
+        genre_rows = {genre: np.unique(rows_of_genre) for genre, rows_of_genre in genre_rows.items()}
+        return cls(genre_rows, tag_bitmaps, num_rows)
+
+    def get_rows(self, genres: Iterable[str] = None, tags: Iterable[str] = None) -> np.ndarray:
+        """Get the sorted rows of any of the genres that have any of the tags, unknown names match nothing."""
+        if genres:
+            genres = {genre.strip().lower() for genre in genres}
+            partitions = [self.genre_rows[genre] for genre in genres if genre in self.genre_rows]
+            rows = np.sort(np.concatenate(partitions)) if partitions else np.empty(0, dtype=np.int64)
+        else:
+            rows = np.arange(self.num_rows)
+        if tags:
+            bitmap = np.zeros((self.num_rows + 7) // 8, dtype=np.uint8)
+            for tag in tags:
+                bitmap |= self.tag_bitmaps.get(tag.strip().lower(), 0)
+            rows = rows[np.unpackbits(bitmap, count=self.num_rows)[rows].astype(bool)]
+        return rows
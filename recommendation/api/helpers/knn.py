@@ -0,0 +1,130 @@
+# pylint: disable=E0401
+"""Precomputed k-nearest neighbour table."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, List, Optional
+
+import numpy as np
+from logger.logger import custom_logger
+
+from .engine import SimilarityEngine
+
+if TYPE_CHECKING:
+    from .store import EmbeddingStore
+
+
+def top_neighbours(scores: np.ndarray, candidates: np.ndarray, num_neighbours: int) -> np.ndarray:
+    """Get the ``num_neighbours`` best candidates of every row, best first, ties broken by row order."""
+    best = np.argpartition(-scores, num_neighbours - 1, axis=1)[:, :num_neighbours]
+    neighbours = np.take_along_axis(candidates, best, axis=1)
+    order = np.lexsort((neighbours, -np.take_along_axis(scores, best, axis=1)), axis=1)
+    return np.take_along_axis(neighbours, order, axis=1)
+
+
+def build_knn_rows(engine: SimilarityEngine, rows: np.ndarray, num_neighbours: int) -> np.ndarray:
+    """Get the ``num_neighbours`` best rows of some rows, scoring every row."""
+    scores = engine.score_batch(rows)
+    scores[np.arange(len(rows)), rows] = -np.inf
+    return top_neighbours(scores, np.broadcast_to(np.arange(scores.shape[1]), scores.shape), num_neighbours)
+
+
+def build_knn_table(store: EmbeddingStore, num_neighbours: int, batch_size: int = 256) -> np.ndarray:
+    """Get the ``num_neighbours`` best rows of every row of a store, best first, ties broken by row order.
+
+    Only the rows of the store are scored, rows appended to a running engine
+    are never part of the table.
+    """
+    engine = SimilarityEngine(store)
+    num_rows = engine.num_base_rows
+    num_neighbours = min(num_neighbours, num_rows - 1)
+    knn_table = np.empty((num_rows, num_neighbours), dtype=np.int32)
+    for start in range(0, num_rows, batch_size):
+        rows = np.arange(start, min(start + batch_size, num_rows))
+        knn_table[rows] = build_knn_rows(engine, rows, num_neighbours)
+    return knn_table
+
+
+def is_knn_table_of(knn_table: np.ndarray, num_rows: int) -> bool:
+    """Whether a table has one list of neighbours for each of ``num_rows`` rows, all among those rows."""
+    if knn_table.ndim != 2 or len(knn_table) != num_rows:
+        return False
+    return not knn_table.size or (0 <= np.min(knn_table) and np.max(knn_table) < num_rows)
+
+
+def update_knn_table(
+    store: EmbeddingStore,
+    knn_table: np.ndarray,
+    base_alive: np.ndarray,
+    batch_size: int = 256,
+) -> np.ndarray:
+    """Get the table of a compacted store from the table of the rows it was compacted from.
+
+    The compacted rows are the surviving rows of ``knn_table`` followed by the
+    appended ones. A surviving row that kept all its neighbours only has to
+    merge them with the appended rows, the others and the appended rows are
+    scored against every row. A table that does not match the rows it was
+    compacted from is rebuilt.
+    """
+    engine = SimilarityEngine(store)
+    num_rows, num_neighbours = engine.num_base_rows, knn_table.shape[-1]
+    if not is_knn_table_of(knn_table, len(base_alive)):
+        custom_logger.warning("KNN table does not match the rows it was compacted from, rebuilding it.")
+        return build_knn_table(store, num_neighbours, batch_size)
+    if num_neighbours > num_rows - 1:
+        return build_knn_table(store, num_neighbours, batch_size)
+    compacted_rows = np.where(base_alive, np.cumsum(base_alive) - 1, -1)
+    neighbours = compacted_rows[np.asarray(knn_table)[base_alive]]
+    appended = np.arange(len(neighbours), num_rows)
+    complete = np.all(neighbours >= 0, axis=1)
+
+    table = np.empty((num_rows, num_neighbours), dtype=np.int32)
+    merged = np.flatnonzero(complete)
+    if len(appended) == 0:
+        table[merged] = neighbours[merged]
+    appended_vectors = engine.get_vectors(appended)
+    for start in range(0, len(merged) if len(appended) else 0, batch_size):
+        rows = merged[start : start + batch_size]
+        queries = engine.get_query(rows)
+        scores = np.hstack(
+            [
+                np.einsum("bkd,bd->bk", engine.get_vectors(neighbours[rows]), queries),
+                queries @ appended_vectors.T,
+            ]
+        )
+        candidates = np.hstack([neighbours[rows], np.broadcast_to(appended, (len(rows), len(appended)))])
+        table[rows] = top_neighbours(scores, candidates, num_neighbours)
+
+    rescored = np.concatenate([np.flatnonzero(~complete), appended])
+    for start in range(0, len(rescored), batch_size):
+        rows = rescored[start : start + batch_size]
+        table[rows] = build_knn_rows(engine, rows, num_neighbours)
+    return table
+
+
+class KnnSearch:
+    """Answer anchor rows from the precomputed neighbour table."""
+
+    def __init__(self, knn_table: np.ndarray):
+        # Precomputed neighbours of every row, best first.
+        self.knn_table = knn_table
+
+    def search(
+        self, engine: SimilarityEngine, query: np.ndarray, k: int, excluded: np.ndarray, row: int = None
+    ) -> Optional[List[str]]:
+        """Get the k best labels from the neighbour table, None when exclusions exhaust it.
+
+        Appended rows are not in the table, so they are scored and merged with
+        the remaining neighbours. Queries that are not a base row are not answered.
+        """
+        if row is None or row >= engine.num_base_rows:
+            return None
+        neighbours = np.asarray(self.knn_table[row])
+        neighbours = neighbours[~excluded[neighbours]]
+        unique_rows = engine.ranker.get_unique_rows(engine, neighbours)
+        if len(unique_rows) < k:
+            return None
+        if len(engine.delta_matrix) == 0:
+            return list(engine.get_labels(unique_rows[:k]))
+        rows = np.concatenate([neighbours, np.arange(engine.num_base_rows, engine.num_rows)])
+        return engine.top_k(engine.get_vectors(rows) @ query, k, excluded[rows], rows)
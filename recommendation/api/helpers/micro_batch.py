@@ -0,0 +1,80 @@
+# pylint: disable=E0401
+"""Micro-batching of concurrent single requests."""
+
+import asyncio
+from collections import Counter
+from typing import Any, Awaitable, Callable, List
+
+
+class MicroBatcher:
+    """Merge items submitted concurrently into batches computed by one call.
+
+    A batch is flushed once it holds ``max_batch_size`` items or ``max_wait``
+    seconds after its first item, whichever comes first. ``func`` gets the
+    items of a batch and returns a result, or an exception, per item, it is
+    awaited through ``runner`` so it can run off the event loop.
+    """
+
+    def __init__(
+        self,
+        func: Callable[[List[Any]], List[Any]],
+        runner: Callable[..., Awaitable],
+        max_batch_size: int,
+        max_wait: float,
+    ):
+        self.func = func
+        self.runner = runner
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending = []
+        self._timer = None
+        # Number of batches flushed per batch size.
+        self.batch_sizes = Counter()
+
+    async def submit(self, item: Any) -> Any:
+        """Get the result of an item once its batch is computed."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        """Start computing the pending items as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self.batch_sizes[len(batch)] += 1
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: list):
+        """Compute a batch and hand every caller its result."""
+        try:
+            results = await self.runner(self.func, [item for item, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def get_stats(self) -> dict:
+        """Get the number of batches and requests and the achieved batch sizes."""
+        num_batches = sum(self.batch_sizes.values())
+        num_requests = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": num_batches,
+            "requests": num_requests,
+            "mean_batch_size": num_requests / num_batches if num_batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+        }
@@ -0,0 +1,63 @@
+# pylint: disable=E0401
+"""User taste profiles built from many anchor tracks."""
+
+from typing import List
+
+import numpy as np
+
+from .engine import SimilarityEngine
+
+PROFILE_MODES = ("mean", "recency", "kmeans")
+
+
+def normalize_queries(engine: SimilarityEngine, queries: np.ndarray) -> np.ndarray:
+    """Normalize both modalities of every query row to unit length, as anchor queries are."""
+    image_dim = engine.store.image_dim
+    queries = np.array(queries, dtype=engine.store.embedding_matrix.dtype)
+    for part in (np.s_[:, :image_dim], np.s_[:, image_dim:]):
+        norms = np.linalg.norm(queries[part], axis=1, keepdims=True)
+        queries[part] /= np.where(norms > 0, norms, 1)
+    return queries
+
+
+def get_anchor_weights(num_anchors: int, mode: str, recency_decay: float) -> np.ndarray:
+    """Get the weight of every anchor, anchors are ordered most recent first."""
+    if mode == "recency":
+        return recency_decay ** np.arange(num_anchors)
+    return np.ones(num_anchors)
+
+
+# Every profile mode has its own tuning, passed by keyword.
+def build_profile(  # pylint: disable=R0913
+    engine: SimilarityEngine,
+    rows: List[int],
+    mode: str = "mean",
+    *,
+    recency_decay: float = 0.9,
+    num_clusters: int = 3,
+    num_iter: int = 10,
+) -> np.ndarray:
+    """Get the query rows of a taste profile.
+
+    ``mean`` and ``recency`` give one weighted mean of the anchors, ``kmeans``
+    gives the centroids of up to ``num_clusters`` groups of anchors.
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode {mode}, expected one of {PROFILE_MODES}.")
+    queries = engine.get_query(np.asarray(rows))
+    weights = get_anchor_weights(len(queries), mode, recency_decay)
+    if mode != "kmeans" or len(queries) <= 1:
+        return normalize_queries(engine, (weights @ queries)[None, :])
+
+    # Spherical k-means over the anchors, seeded with evenly spaced anchors.
+    num_clusters = min(num_clusters, len(queries))
+    centroids = queries[np.linspace(0, len(queries) - 1, num_clusters).astype(int)]
+    for _ in range(num_iter):
+        assignments = np.argmax(queries @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, queries * weights[:, None])
+        # Empty clusters keep their previous centroid.
+        empty = ~np.any(sums, axis=1)
+        sums[empty] = centroids[empty]
+        centroids = normalize_queries(engine, sums)
+    return centroids
@@ -0,0 +1,72 @@
+# pylint: disable=E0401
+"""Scalar quantised embeddings."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, List, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .engine import SimilarityEngine
+
+QUANTIZATION_MODES = ("int8", "float16")
+
+
+class QuantizedMatrix:
+    """Scalar quantised copy of the fused embedding matrix for first-pass scoring."""
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray):
+        self.codes = codes
+        # Per-dimension scale, a stored value ``c`` of dimension ``j`` decodes to ``c * scales[j]``.
+        self.scales = scales
+
+    @classmethod
+    def from_matrix(cls, embedding_matrix: np.ndarray, mode: str, chunk_size: int = 65536) -> QuantizedMatrix:
+        """Quantise a matrix to ``int8`` (symmetric, per dimension) or ``float16``."""
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode {mode}, expected one of {QUANTIZATION_MODES}.")
+        if mode == "float16":
+            return cls(np.asarray(embedding_matrix, dtype=np.float16), np.ones(embedding_matrix.shape[1], np.float32))
+
+        scales = np.max(np.abs(embedding_matrix), axis=0).astype(np.float32) / 127
+        scales[scales == 0] = 1
+        codes = np.empty(embedding_matrix.shape, dtype=np.int8)
+        for start in range(0, len(embedding_matrix), chunk_size):
+            chunk = embedding_matrix[start : start + chunk_size] / scales
+            codes[start : start + chunk_size] = np.clip(np.rint(chunk), -127, 127)
+        return cls(codes, scales)
+
+    @property
+    def nbytes(self) -> int:
+        """Resident size of the codes."""
+        return self.codes.nbytes
+
+    def score(self, query: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """Approximate scores of every row against one query or a batch of queries."""
+        # Folding the scales into the query avoids decoding anything but the codes.
+        scaled_query = (query * self.scales).astype(np.float32)
+        scores = np.empty((len(self.codes),) + query.shape[:-1], dtype=np.float32)
+        for start in range(0, len(self.codes), chunk_size):
+            chunk = self.codes[start : start + chunk_size].astype(np.float32)
+            scores[start : start + chunk_size] = chunk @ scaled_query.T
+        return scores.T
+
+
+class QuantizedSearch:
+    """Answer queries with a quantised first pass, the best ``rerank_size`` rows are re-scored at full precision."""
+
+    def __init__(self, quantized_matrix: QuantizedMatrix, rerank_size: int = 256):
+        self.quantized_matrix = quantized_matrix
+        self.rerank_size = rerank_size
+
+    def search(
+        self, engine: SimilarityEngine, query: np.ndarray, k: int, excluded: np.ndarray, row: int = None
+    ) -> Optional[List[str]]:
+        """Get the k best labels of the re-scored rows, None when they give fewer."""
+        approx_scores = np.concatenate([self.quantized_matrix.score(query), engine.delta_matrix @ query])
+        approx_scores = np.where(excluded, -np.inf, approx_scores)
+        num_candidates = min(max(self.rerank_size, k), len(approx_scores))
+        rows = np.sort(np.argpartition(-approx_scores, num_candidates - 1)[:num_candidates])
+        recommend_ids = engine.top_k(engine.get_vectors(rows) @ query, k, excluded[rows], rows)
+        return recommend_ids if len(recommend_ids) == k else None
@@ -0,0 +1,147 @@
+# pylint: disable=E0401
+"""Ranking of scored rows."""
+
+from __future__ import annotations
+
+import copy
+import csv
+from typing import TYPE_CHECKING, Dict, Iterable, List
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .engine import SimilarityEngine
+
+
+def read_titles(tracks_path: str) -> Dict[str, str]:
+    """Read the title of every track of the catalog, keyed by label."""
+    with open(tracks_path, encoding="utf-8") as f:
+        return {row["id"]: row["title"] for row in csv.DictReader(f)}
+
+
+def group_titles(labels: np.ndarray, titles: Dict[str, str]) -> np.ndarray:
+    """Get the title group of every row, rows missing from the catalog get a group of their own."""
+    row_titles = [titles.get(label, f"\0{label}") for label in labels]
+    _, title_groups = np.unique(row_titles, return_inverse=True)
+    return title_groups.astype(np.int32)
+
+
+def map_label_groups(labels: np.ndarray, title_groups: np.ndarray, titles: Dict[str, str]) -> Dict[str, int]:
+    """Get the title group of every label of the catalog, titles no row has get new groups."""
+    title_ids = {}
+    for label, group in zip(labels, title_groups):
+        if label in titles:
+            title_ids.setdefault(titles[label], int(group))
+    next_group = int(title_groups.max()) + 1 if len(title_groups) else 0
+    for title in titles.values():
+        if title not in title_ids:
+            title_ids[title] = next_group
+            next_group += 1
+    return {label: title_ids[title] for label, title in titles.items()}
+
+
+class Ranker:
+    """Pick the best rows of scores, a label and a title group at most once.
+
+    Excluded rows score ``-inf``. With a diversity above 0, the best
+    ``diversity_pool_size`` rows are re-ranked by maximal marginal relevance.
+    """
+
+    def __init__(
+        self,
+        title_groups: np.ndarray = None,
+        label_groups: Dict[str, int] = None,
+        diversity: float = 0.0,
+        diversity_pool_size: int = 200,
+    ):
+        # Title group of every row, appended ones included, at most one row of a group is recommended.
+        self.title_groups = title_groups
+        # Title group of every label of the catalog, appended rows join the group of their title.
+        self.label_groups = label_groups or {}
+        self.diversity = diversity
+        self.diversity_pool_size = diversity_pool_size
+
+    def append(self, labels: Iterable[str]) -> Ranker:
+        """Get a copy with the title groups of appended rows, a row missing from the catalog is a group of its own."""
+        if self.title_groups is None:
+            return self
+        first_row = len(self.title_groups)
+        # Groups of their own are negative, so they never meet a group of the catalog.
+        groups = [self.label_groups.get(label, -1 - row) for row, label in enumerate(labels, first_row)]
+        ranker = copy.copy(self)
+        ranker.title_groups = np.concatenate([self.title_groups, np.asarray(groups, dtype=self.title_groups.dtype)])
+        return ranker
+
+    def truncate(self, num_rows: int) -> Ranker:
+        """Get a copy without the title groups of rows past ``num_rows``."""
+        if self.title_groups is None:
+            return self
+        ranker = copy.copy(self)
+        ranker.title_groups = self.title_groups[:num_rows]
+        return ranker
+
+    def get_unique_rows(self, engine: SimilarityEngine, rows: np.ndarray) -> np.ndarray:
+        """Get ranked rows, keeping the first row of every label and title group."""
+        if self.title_groups is not None and len(rows):
+            _, first = np.unique(self.title_groups[rows], return_index=True)
+            rows = rows[np.sort(first)]
+        _, first = np.unique(engine.get_labels(rows), return_index=True)
+        return rows[np.sort(first)]
+
+    def top_rows(self, engine: SimilarityEngine, scores: np.ndarray, k: int, rows: np.ndarray = None) -> np.ndarray:
+        """Get the k best rows, best first.
+
+        ``scores`` cover ``rows`` (every row by default). Rows are ranked by
+        score, ties broken by row order.
+        """
+        rows = np.arange(len(scores)) if rows is None else rows
+        num_candidates = min(k, len(scores))
+        while num_candidates > 0:
+            partition = np.argpartition(-scores, num_candidates - 1)[:num_candidates]
+            candidates = np.flatnonzero(scores >= scores[partition].min())
+            candidates = candidates[np.lexsort((rows[candidates], -scores[candidates]))]
+            candidates = candidates[np.isfinite(scores[candidates])]
+            top_rows = self.get_unique_rows(engine, rows[candidates])
+            if len(top_rows) >= k or num_candidates == len(scores):
+                return top_rows[:k]
+            num_candidates = min(num_candidates * 2, len(scores))
+        return np.empty(0, dtype=np.int64)
+
+    def rank(
+        self,
+        engine: SimilarityEngine,
+        scores: np.ndarray,
+        k: int,
+        rows: np.ndarray = None,
+        diversity: float = None,
+    ) -> List[str]:
+        """Get the labels of the k best rows, picked by maximal marginal relevance when diversity > 0.
+
+        Every pick from the best rows maximises ``(1 - diversity) * score -
+        diversity * similarity`` to the closest row already picked. The
+        similarities of the pool come from one Gram matrix, so each pick is a
+        vector update.
+        """
+        diversity = self.diversity if diversity is None else diversity
+        if diversity <= 0:
+            return list(engine.get_labels(self.top_rows(engine, scores, k, rows)))
+        pool = self.top_rows(engine, scores, max(self.diversity_pool_size, k), rows)
+        if len(pool) <= 1:
+            return list(engine.get_labels(pool))
+        if rows is None:
+            relevance = scores[pool]
+        else:
+            order = np.argsort(rows, kind="stable")
+            relevance = scores[order[np.searchsorted(rows, pool, sorter=order)]]
+        gram = engine.get_query(pool) @ engine.get_vectors(pool).T
+
+        picked = np.zeros(len(pool), dtype=bool)
+        closest = np.zeros(len(pool), dtype=gram.dtype)
+        picks = []
+        for _ in range(min(k, len(pool))):
+            marginal = np.where(picked, -np.inf, (1 - diversity) * relevance - diversity * closest)
+            best = int(np.argmax(marginal))
+            picks.append(best)
+            picked[best] = True
+            closest = np.maximum(closest, gram[best])
+        return list(engine.get_labels(pool[picks]))
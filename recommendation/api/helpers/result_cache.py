@@ -0,0 +1,129 @@
+# pylint: disable=E0401
+"""Recommendation result cache."""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Iterable, List, Optional
+
+from logger.logger import custom_logger
+
+try:
+    import redis
+except ImportError:
+    # The shared Redis tier is optional.
+    redis = None
+
+
+def hash_ids(ids: Optional[Iterable[str]]) -> str:
+    """Hash a set of ids, the order does not matter."""
+    return hashlib.sha1("\n".join(sorted(set(ids or []))).encode("utf-8")).hexdigest()
+
+
+# The hit and miss counters are reported by the cache stats route.
+class ResultCache:  # pylint: disable=R0902
+    """Bounded in-process LRU cache of recommendations, entries expire after ``ttl`` seconds.
+
+    Keys hold the fingerprint of the artifacts and the delta, so results of
+    other rows are never served after a reload or an index update. When
+    ``redis_url`` is given, local misses are looked up in Redis before being
+    computed, and every computed result is shared there with the same TTL.
+    Workers only share results while they serve the same rows.
+    """
+
+    def __init__(self, max_size: int, ttl: float, redis_url: str = ""):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.redis_hits = 0
+        self.redis_client = None
+        if redis_url:
+            if redis is None:
+                raise ImportError("RESULT_CACHE_REDIS_URL is set but the redis package is not installed.")
+            self.redis_client = redis.Redis.from_url(redis_url)
+
+    @property
+    def enabled(self) -> bool:
+        """Whether results are cached."""
+        return self.max_size > 0
+
+    @staticmethod
+    def get_redis_key(key: Hashable) -> str:
+        """Get the Redis key of a cache key."""
+        return f"recommend:{hashlib.sha1(repr(key).encode('utf-8')).hexdigest()}"
+
+    def get(self, key: Hashable) -> Optional[List[str]]:
+        """Get a cached result, None on a miss."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(entry[1])
+            if entry is not None:
+                del self._entries[key]
+
+        value = self._get_shared(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.redis_hits += 1
+            self._put(key, value)
+        return value
+
+    def set(self, key: Hashable, value: List[str]):
+        """Cache a computed result."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._put(key, value)
+        if self.redis_client is not None:
+            try:
+                self.redis_client.set(self.get_redis_key(key), json.dumps(value), ex=max(int(self.ttl), 1))
+            except redis.RedisError as e:
+                custom_logger.warning("Share recommendation in Redis failed: %s", e)
+
+    def clear(self):
+        """Drop every local entry, shared entries expire on their own."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """Get the hit and miss counters."""
+        with self._lock:
+            lookups = self.hits + self.redis_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.redis_hits) / lookups if lookups else 0.0,
+            }
+
+    def _put(self, key: Hashable, value: List[str]):
+        """Insert an entry and evict the least recently used ones, the lock is held."""
+        self._entries[key] = (time.monotonic() + self.ttl, list(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _get_shared(self, key: Hashable) -> Optional[List[str]]:
+        """Get a result shared in Redis, None when it is missing or Redis fails."""
+        if self.redis_client is None:
+            return None
+        try:
+            value = self.redis_client.get(self.get_redis_key(key))
+        except redis.RedisError as e:
+            custom_logger.warning("Read recommendation from Redis failed: %s", e)
+            return None
+        return json.loads(value) if value is not None else None
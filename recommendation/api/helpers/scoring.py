@@ -0,0 +1,80 @@
+# pylint: disable=E0401
+"""Hybrid scoring of content and collaborative similarity."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .collaborative import ItemSimilarity
+    from .engine import SimilarityEngine
+
+
+class HybridWeights(NamedTuple):
+    """Weights of the image, metadata and collaborative scores."""
+
+    image: float
+    metadata: float
+    collaborative: float = 0.0
+
+
+class HybridScorer:
+    """Score rows with other weights than the fused ones, blending in collaborative scores."""
+
+    def __init__(self, collaborative: ItemSimilarity = None, collaborative_weight: float = 0.0):
+        # Item-item similarity from likes, blended into the content scores with collaborative_weight.
+        self.collaborative = collaborative
+        self.collaborative_weight = collaborative_weight
+
+    def get_default_weights(self, engine: SimilarityEngine) -> HybridWeights:
+        """Weights of the configured blend, the collaborative weight scales the content weights down."""
+        collaborative_weight = self.collaborative_weight if self.collaborative is not None else 0.0
+        return HybridWeights(
+            (1 - collaborative_weight) * engine.store.image_weight,
+            (1 - collaborative_weight) * engine.store.metadata_weight,
+            collaborative_weight,
+        )
+
+    def is_fused(self, engine: SimilarityEngine, weights: Optional[HybridWeights]) -> bool:
+        """Whether the fused matrix, and the indexes built on it, rank with the given weights, None is the default."""
+        if self.get_default_weights(engine).collaborative > 0:
+            return False
+        return weights is None or weights == HybridWeights(engine.store.image_weight, engine.store.metadata_weight)
+
+    def get_weighted_query(self, engine: SimilarityEngine, rows, weights: HybridWeights) -> np.ndarray:
+        """Get queries of one or many rows that score with the given content weights."""
+        query = engine.get_query(rows)
+        query[..., : engine.store.image_dim] *= weights.image / engine.store.image_weight
+        query[..., engine.store.image_dim :] *= weights.metadata / engine.store.metadata_weight
+        return query
+
+    def score_collaborative(self, engine: SimilarityEngine, row: int) -> np.ndarray:
+        """Score every row by the similarity of its likes to the likes of the anchor row."""
+        return self.collaborative.score(engine.get_labels(np.asarray([row]))[0], engine.num_rows)
+
+    def score(self, engine: SimilarityEngine, rows, weights: HybridWeights) -> np.ndarray:
+        """Score every row against one or many anchor rows.
+
+        Rescaling both modalities of the query reweights the folded matrix, so
+        one scan gives the weighted content scores without rebuilding it.
+        """
+        scores = engine.scan(self.get_weighted_query(engine, rows, weights))
+        if self.collaborative is not None and weights.collaborative > 0:
+            collaborative_scores = [self.score_collaborative(engine, row) for row in np.atleast_1d(rows)]
+            scores += weights.collaborative * np.reshape(collaborative_scores, scores.shape)
+        return scores
+
+    def score_candidates(
+        self,
+        engine: SimilarityEngine,
+        row: int,
+        candidates: np.ndarray,
+        weights: HybridWeights,
+    ) -> np.ndarray:
+        """Score only the candidate rows against an anchor row."""
+        scores = engine.get_vectors(candidates) @ self.get_weighted_query(engine, row, weights)
+        if self.collaborative is not None and weights.collaborative > 0:
+            scores += weights.collaborative * self.score_collaborative(engine, row)[candidates]
+        return scores
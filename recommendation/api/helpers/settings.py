@@ -0,0 +1,53 @@
+# pylint: disable=E0401
+"""Snapshot settings of the recommendation service."""
+
+from api.helpers.snapshot import SnapshotSettings
+from core.config import (
+    ANN_INDEX_PATH,
+    ANN_NUM_PROBE,
+    BATCH_SIZE,
+    COLLABORATIVE_WEIGHT,
+    COMPACTION_THRESHOLD,
+    DELTA_PATH,
+    DIVERSITY,
+    DIVERSITY_POOL_SIZE,
+    EMBEDDING_STORE_PATH,
+    IMAGE_WEIGHT,
+    IMAGES_PATH,
+    ITEM_SIMILARITY_PATH,
+    KNN_TABLE_PATH,
+    LABELS_PATH,
+    MAP_TRACK_IDS_PATH,
+    METADATA_PATH,
+    METADATA_WEIGHT,
+    QUANTIZATION,
+    QUANTIZATION_RERANK_SIZE,
+    RELOAD_SIGNAL_PATH,
+    TITLE_GROUPS_PATH,
+    TRACKS_PATH,
+)
+
+snapshot_settings = SnapshotSettings(
+    embedding_store_path=EMBEDDING_STORE_PATH,
+    images_path=IMAGES_PATH,
+    labels_path=LABELS_PATH,
+    metadata_path=METADATA_PATH,
+    map_track_ids_path=MAP_TRACK_IDS_PATH,
+    ann_index_path=ANN_INDEX_PATH,
+    knn_table_path=KNN_TABLE_PATH,
+    tracks_path=TRACKS_PATH,
+    title_groups_path=TITLE_GROUPS_PATH,
+    item_similarity_path=ITEM_SIMILARITY_PATH,
+    delta_path=DELTA_PATH,
+    reload_signal_path=RELOAD_SIGNAL_PATH,
+    image_weight=IMAGE_WEIGHT,
+    metadata_weight=METADATA_WEIGHT,
+    ann_num_probe=ANN_NUM_PROBE,
+    quantization=QUANTIZATION,
+    quantization_rerank_size=QUANTIZATION_RERANK_SIZE,
+    collaborative_weight=COLLABORATIVE_WEIGHT,
+    diversity=DIVERSITY,
+    diversity_pool_size=DIVERSITY_POOL_SIZE,
+    compaction_threshold=COMPACTION_THRESHOLD,
+    batch_size=BATCH_SIZE,
+)
@@ -0,0 +1,34 @@
+# pylint: disable=E0401
+"""Coalescing of identical concurrent calls."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Run one call per key at a time, concurrent callers with the same key await its result.
+
+    The call is shielded from the cancellation of any single caller, errors
+    are raised to every caller.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        # Callers served by a call started by another caller.
+        self.shared = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calls running."""
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        """Get the result of ``await func(*args, **kwargs)``, joining the call running for ``key``."""
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[key] = future
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.shared += 1
+        return await asyncio.shield(future)
@@ -0,0 +1,570 @@
+# pylint: disable=E0401
+"""Versioned snapshots of the recommendation artifacts."""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, NamedTuple
+
+import numpy as np
+from logger.logger import custom_logger
+
+from .ann import AnnSearch, IVFIndex
+from .collaborative import ItemSimilarity
+from .engine import SimilarityEngine
+from .filters import TrackFilter
+from .knn import KnnSearch, is_knn_table_of, update_knn_table
+from .quantize import QuantizedMatrix, QuantizedSearch
+from .ranking import Ranker, group_titles, map_label_groups, read_titles
+from .scoring import HybridScorer
+from .store import ArtifactTransaction, DeltaStore, EmbeddingStore, hash_arrays
+from .track_id_map import TrackIdMap
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no flock, index updates are then only serialised within one worker.
+    fcntl = None
+
+
+class SnapshotSettings(NamedTuple):
+    """Paths of the artifacts and settings of the engines built from them.
+
+    Snapshots take their settings instead of reading the configuration, so the
+    backend loads the same artifacts in embedded mode.
+    """
+
+    embedding_store_path: str
+    images_path: str
+    labels_path: str
+    metadata_path: str
+    map_track_ids_path: str
+    ann_index_path: str
+    knn_table_path: str
+    tracks_path: str
+    title_groups_path: str
+    item_similarity_path: str
+    delta_path: str
+    reload_signal_path: str
+    image_weight: float = 0.6
+    metadata_weight: float = 0.4
+    ann_num_probe: int = 0
+    quantization: str = "none"
+    quantization_rerank_size: int = 256
+    collaborative_weight: float = 0.0
+    diversity: float = 0.0
+    diversity_pool_size: int = 200
+    compaction_threshold: float = 0.1
+    batch_size: int = 256
+
+    @classmethod
+    def from_data_path(cls, data_path: str, **kwargs) -> SnapshotSettings:
+        """Get the settings of artifacts kept under their default names in one folder."""
+        return cls(
+            embedding_store_path=os.path.join(data_path, "embeddings"),
+            images_path=os.path.join(data_path, "embeded_images.npy"),
+            labels_path=os.path.join(data_path, "labels.npy"),
+            metadata_path=os.path.join(data_path, "embedd_metadata.json"),
+            map_track_ids_path=os.path.join(data_path, "map_track_ids.json"),
+            ann_index_path=os.path.join(data_path, "ann_index.npz"),
+            knn_table_path=os.path.join(data_path, "knn_table.npy"),
+            tracks_path=os.path.join(data_path, "tracks_rows.csv"),
+            title_groups_path=os.path.join(data_path, "title_groups.npy"),
+            item_similarity_path=os.path.join(data_path, "item_similarity.npz"),
+            delta_path=os.path.join(data_path, "delta"),
+            reload_signal_path=os.path.join(data_path, "reload_signal"),
+            **kwargs,
+        )
+
+
+def load_embedding_store(settings: SnapshotSettings) -> EmbeddingStore:
+    """Open the binary embedding store, or build it from the raw artifacts."""
+    if os.path.exists(settings.embedding_store_path):
+        return EmbeddingStore.load(settings.embedding_store_path)
+    custom_logger.info("Folder %s does not exist, reading raw embeddings.", settings.embedding_store_path)
+    return EmbeddingStore.from_raw(
+        settings.images_path,
+        settings.labels_path,
+        settings.metadata_path,
+        settings.image_weight,
+        settings.metadata_weight,
+    )
+
+
+def load_ann_index(settings: SnapshotSettings, num_rows: int) -> IVFIndex | None:
+    """Load the ANN index when it is enabled and matches the embeddings."""
+    if settings.ann_num_probe <= 0:
+        return None
+    if not os.path.exists(settings.ann_index_path):
+        custom_logger.warning("File %s does not exist, using exact search.", settings.ann_index_path)
+        return None
+    ann_index = IVFIndex.load(settings.ann_index_path)
+    if ann_index.num_rows != num_rows:
+        custom_logger.warning(
+            "ANN index %s does not match the embeddings, using exact search.", settings.ann_index_path
+        )
+        return None
+    return ann_index
+
+
+def load_knn_table(settings: SnapshotSettings, num_rows: int) -> np.ndarray | None:
+    """Open the KNN table when it exists and matches the embeddings."""
+    if not os.path.exists(settings.knn_table_path):
+        return None
+    knn_table = np.load(settings.knn_table_path, mmap_mode="r")
+    if not is_knn_table_of(knn_table, num_rows):
+        custom_logger.warning(
+            "KNN table %s does not match the embeddings, using live scoring.", settings.knn_table_path
+        )
+        return None
+    return knn_table
+
+
+def load_title_groups(settings: SnapshotSettings, embedding_store: EmbeddingStore) -> np.ndarray | None:
+    """Load the title groups when they exist and match the embeddings, or build them from the track catalog."""
+    if os.path.exists(settings.title_groups_path):
+        title_groups = np.load(settings.title_groups_path)
+        if len(title_groups) == len(embedding_store.labels):
+            return title_groups
+        custom_logger.warning(
+            "Title groups %s do not match the embeddings, ignoring them.", settings.title_groups_path
+        )
+    if not os.path.exists(settings.tracks_path):
+        custom_logger.warning(
+            "Title groups %s and catalog %s do not exist, tracks sharing a title are all recommended.",
+            settings.title_groups_path,
+            settings.tracks_path,
+        )
+        return None
+    custom_logger.info("Building title groups from %s.", settings.tracks_path)
+    return group_titles(embedding_store.labels, read_titles(settings.tracks_path))
+
+
+def load_ranker(settings: SnapshotSettings, embedding_store: EmbeddingStore) -> Ranker:
+    """Get the ranker over the title groups, appended rows are grouped by their title in the catalog."""
+    title_groups = load_title_groups(settings, embedding_store)
+    label_groups = None
+    if title_groups is not None and os.path.exists(settings.tracks_path):
+        label_groups = map_label_groups(embedding_store.labels, title_groups, read_titles(settings.tracks_path))
+    return Ranker(title_groups, label_groups, settings.diversity, settings.diversity_pool_size)
+
+
+def load_item_similarity(settings: SnapshotSettings, embedding_store: EmbeddingStore) -> ItemSimilarity | None:
+    """Load the item-item similarity when it exists, aligned to the embedding rows."""
+    if not os.path.exists(settings.item_similarity_path):
+        return None
+    item_similarity = ItemSimilarity.load(settings.item_similarity_path)
+    item_similarity.align(embedding_store.sorted_labels, embedding_store.sorted_rows)
+    return item_similarity
+
+
+def load_track_filter(settings: SnapshotSettings, embedding_store: EmbeddingStore) -> TrackFilter | None:
+    """Build the genre and tag filters from the track catalog when it exists."""
+    if not os.path.exists(settings.tracks_path):
+        return None
+    return TrackFilter.from_catalog(settings.tracks_path, embedding_store.sorted_labels, embedding_store.sorted_rows)
+
+
+def hash_artifacts(settings: SnapshotSettings, embedding_store: EmbeddingStore) -> str:
+    """Hash the artifacts and settings a snapshot is built from, equal on every worker loading the same files."""
+    digest = hashlib.sha1(embedding_store.checksum.encode("utf-8"))
+    digest.update(repr(settings).encode("utf-8"))
+    paths = (
+        settings.ann_index_path,
+        settings.knn_table_path,
+        settings.title_groups_path,
+        settings.item_similarity_path,
+        settings.tracks_path,
+        settings.map_track_ids_path,
+    )
+    for path in paths:
+        digest.update(path.encode("utf-8"))
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_indexes(settings: SnapshotSettings, embedding_store: EmbeddingStore) -> list:
+    """Get the enabled indexes, the KNN table first, then the ANN index or the quantised matrix."""
+    num_rows = len(embedding_store.labels)
+    indexes = []
+    knn_table = load_knn_table(settings, num_rows)
+    if knn_table is not None:
+        indexes.append(KnnSearch(knn_table))
+    ann_index = load_ann_index(settings, num_rows)
+    if ann_index is not None:
+        indexes.append(AnnSearch(ann_index, settings.ann_num_probe))
+    elif settings.quantization != "none":
+        quantized_matrix = QuantizedMatrix.from_matrix(embedding_store.embedding_matrix, settings.quantization)
+        indexes.append(QuantizedSearch(quantized_matrix, settings.quantization_rerank_size))
+    return indexes
+
+
+def load_delta(settings: SnapshotSettings, engine: SimilarityEngine) -> DeltaStore | None:
+    """Load the delta when it exists and was taken against the current embeddings."""
+    if not os.path.exists(settings.delta_path):
+        return None
+    delta = DeltaStore.load(settings.delta_path)
+    if delta.num_base_rows != engine.num_base_rows:
+        custom_logger.warning("Delta %s does not match the embeddings, ignoring it.", settings.delta_path)
+        return None
+    return delta
+
+
+def read_store_checksum(settings: SnapshotSettings) -> str | None:
+    """Read the checksum of the saved embedding store, None when the store was never saved."""
+    manifest_path = os.path.join(settings.embedding_store_path, EmbeddingStore.MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("checksum")
+
+
+def read_generation(settings: SnapshotSettings) -> int:
+    """Read the number of reloads signalled to every worker."""
+    if not os.path.exists(settings.reload_signal_path):
+        return 0
+    with open(settings.reload_signal_path, "r", encoding="utf-8") as f:
+        return int(f.read() or 0)
+
+
+def write_generation(settings: SnapshotSettings, generation: int):
+    """Signal a reload to every worker."""
+    with open(f"{settings.reload_signal_path}.tmp", "w", encoding="utf-8") as f:
+        f.write(str(generation))
+    os.replace(f"{settings.reload_signal_path}.tmp", settings.reload_signal_path)
+
+
+def read_stamp(settings: SnapshotSettings) -> tuple:
+    """Get the reload generation, the store checksum and the file identity of the delta manifest.
+
+    Workers compare stamps to notice reloads, compactions and index updates
+    made by other workers without reading the artifacts.
+    """
+    manifest_path = os.path.join(settings.delta_path, EmbeddingStore.MANIFEST)
+    delta_stat = os.stat(manifest_path) if os.path.exists(manifest_path) else None
+    return (
+        read_generation(settings),
+        read_store_checksum(settings),
+        delta_stat and (delta_stat.st_ino, delta_stat.st_mtime_ns),
+    )
+
+
+@contextlib.contextmanager
+def lock_delta(settings: SnapshotSettings):
+    """Hold the lock of the delta, shared by every worker writing it."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{settings.delta_path}.lock", "a", encoding="utf-8") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class SnapshotArtifacts(NamedTuple):
+    """Settings, checksum and filters of the artifacts a snapshot loaded, kept through index updates."""
+
+    settings: SnapshotSettings
+    checksum: str
+    track_filter: TrackFilter | None = None
+
+
+class EngineSnapshot:
+    """Engine and track id map loaded from one version of the artifacts.
+
+    The version counts the snapshots of this process. The fingerprint hashes
+    the artifacts and the delta, so it is equal on every worker serving the
+    same rows and keys results shared between workers.
+    """
+
+    def __init__(
+        self,
+        artifacts: SnapshotArtifacts,
+        version: int,
+        engine: SimilarityEngine,
+        track_id_map: TrackIdMap,
+        added_track_ids: dict = None,
+    ):
+        self.artifacts = artifacts
+        self.version = version
+        self.engine = engine
+        self.track_id_map = track_id_map
+        # Track ids added through the index API since the last compaction.
+        self.added_track_ids = added_track_ids or {}
+        digest = hashlib.sha1(artifacts.checksum.encode("utf-8"))
+        delta_checksum = hash_arrays(engine.delta_matrix, engine.delta_labels, np.flatnonzero(engine.tombstones))
+        digest.update(delta_checksum.encode("utf-8"))
+        digest.update(json.dumps(self.added_track_ids, sort_keys=True).encode("utf-8"))
+        self.fingerprint = digest.hexdigest()
+
+    @classmethod
+    def load(cls, settings: SnapshotSettings, version: int) -> EngineSnapshot:
+        """Load every artifact and build the engine."""
+        embedding_store = load_embedding_store(settings)
+        # Hashed before the other artifacts are read, a file replaced meanwhile only misses the shared results.
+        artifacts = SnapshotArtifacts(
+            settings,
+            hash_artifacts(settings, embedding_store),
+            load_track_filter(settings, embedding_store),
+        )
+        engine = SimilarityEngine(
+            embedding_store,
+            load_indexes(settings, embedding_store),
+            HybridScorer(load_item_similarity(settings, embedding_store), settings.collaborative_weight),
+            load_ranker(settings, embedding_store),
+        )
+        track_id_map = TrackIdMap.load(settings.map_track_ids_path)
+        return cls(artifacts, version, engine, track_id_map).with_delta(load_delta(settings, engine), version)
+
+    def with_delta(self, delta: DeltaStore | None, version: int) -> EngineSnapshot:
+        """Get a snapshot of the same store with another delta, an empty one when ``delta`` is None."""
+        engine = self.engine
+        if delta is None:
+            return EngineSnapshot(
+                self.artifacts,
+                version,
+                engine.with_delta(engine.delta_matrix[:0], engine.delta_labels[:0], np.empty(0, dtype=np.int64)),
+                self.track_id_map,
+            )
+        return EngineSnapshot(
+            self.artifacts,
+            version,
+            engine.with_delta(delta.delta_matrix, delta.delta_labels, delta.tombstone_rows),
+            self.track_id_map.update(delta.map_track_ids),
+            delta.map_track_ids,
+        )
+
+    def get_row(self, label: str) -> int | None:
+        """Get the current row of a label, None when it is not in the index or was removed."""
+        # The last row of a label is its current one, replaced rows are tombstoned.
+        rows = self.engine.get_rows([label])
+        if len(rows) == 0 or self.engine.tombstones[rows[-1]]:
+            return None
+        return int(rows[-1])
+
+    @property
+    def needs_compaction(self) -> bool:
+        """Whether tombstoned or appended rows passed the compaction threshold."""
+        engine = self.engine
+        pending = max(int(engine.tombstones.sum()), len(engine.delta_matrix))
+        return pending > self.artifacts.settings.compaction_threshold * engine.num_base_rows
+
+    def save_delta(self):
+        """Persist the appended and removed rows."""
+        DeltaStore(
+            self.engine.num_base_rows,
+            self.engine.delta_matrix,
+            self.engine.delta_labels,
+            np.flatnonzero(self.engine.tombstones),
+            self.added_track_ids,
+        ).save(self.artifacts.settings.delta_path)
+
+
+class SnapshotRegistry:
+    """Hold the current snapshot and swap in new ones.
+
+    Callers read ``current`` once per request, so a request in progress keeps
+    using its snapshot while a reload, an index update or a compaction builds
+    the next one. Those writers are serialised by one lock, and by the file
+    lock of the delta between the workers sharing it.
+    """
+
+    def __init__(self, settings: SnapshotSettings):
+        self.settings = settings
+        self._write_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._reloading = False
+        self._compacting = False
+        with lock_delta(settings):
+            self._snapshot = EngineSnapshot.load(settings, version=1)
+            # Stamp of the artifacts on disk the current snapshot was built from.
+            self._stamp = read_stamp(settings)
+
+    @property
+    def current(self) -> EngineSnapshot:
+        """Current snapshot."""
+        return self._snapshot
+
+    @property
+    def reloading(self) -> bool:
+        """Whether a reload is in progress."""
+        return self._reloading
+
+    def _swap(self, snapshot: EngineSnapshot):
+        """Make a snapshot of the artifacts on disk current, called with the delta lock held."""
+        # Rebinding the attribute is atomic, readers see either snapshot whole.
+        self._snapshot = snapshot
+        self._stamp = read_stamp(self.settings)
+
+    def reload(self) -> int:
+        """Build a new snapshot from the artifacts on disk and swap it in, return its version.
+
+        The reload is signalled to the other workers, ``sync`` swaps it in there.
+        """
+        with self._write_lock, lock_delta(self.settings):
+            self._reloading = True
+            try:
+                snapshot = EngineSnapshot.load(self.settings, version=self._snapshot.version + 1)
+                write_generation(self.settings, read_generation(self.settings) + 1)
+                self._swap(snapshot)
+            finally:
+                self._reloading = False
+            custom_logger.info("[recommendation] Reloaded artifacts, version = %s", self._snapshot.version)
+            return self._snapshot.version
+
+    def sync(self) -> bool:
+        """Swap in the artifacts other workers reloaded, compacted or updated, return whether they changed.
+
+        Only the stamp of the artifacts is read while nothing changed, so
+        every worker can poll it.
+        """
+        if read_stamp(self.settings) == self._stamp:
+            return False
+        with self._write_lock, lock_delta(self.settings):
+            stamp = read_stamp(self.settings)
+            if stamp == self._stamp:
+                return False
+            version = self._snapshot.version + 1
+            if stamp[:2] != self._stamp[:2]:
+                self._swap(EngineSnapshot.load(self.settings, version))
+            else:
+                self._swap(self._read_delta(version))
+            custom_logger.info("[recommendation] Synced artifacts of other workers, version = %s", version)
+            return True
+
+    def _read_delta(self, version: int) -> EngineSnapshot:
+        """Get the current snapshot with the delta on disk, other workers may have updated or compacted it.
+
+        Called with the delta lock held.
+        """
+        current = self._snapshot
+        if read_store_checksum(self.settings) not in (None, current.engine.store.checksum):
+            custom_logger.info("[recommendation] Embedding store was compacted by another worker, reloading it.")
+            return EngineSnapshot.load(self.settings, version)
+        return current.with_delta(load_delta(self.settings, current.engine), version)
+
+    def _update(self, update: Callable[[EngineSnapshot], EngineSnapshot]) -> int:
+        """Apply an index update on top of the delta on disk, save it and swap it in, return the new version.
+
+        Every worker saves its updates to the same delta, so an update starts
+        from the rows the other workers added and removed since this worker
+        last read it instead of overwriting them.
+        """
+        with self._write_lock, lock_delta(self.settings):
+            snapshot = update(self._read_delta(self._snapshot.version + 1))
+            snapshot.save_delta()
+            self._swap(snapshot)
+        self.compact_if_needed()
+        return snapshot.version
+
+    def add_tracks(self, track_ids: list[str], labels: list[str], embedding_rows: np.ndarray) -> int:
+        """Append fused rows for new tracks, return the new version."""
+
+        def update(current: EngineSnapshot) -> EngineSnapshot:
+            added_track_ids = {**current.added_track_ids, **dict(zip(track_ids, labels))}
+            return EngineSnapshot(
+                current.artifacts,
+                current.version,
+                current.engine.append(embedding_rows, np.asarray(labels, dtype=str)),
+                current.track_id_map.update(added_track_ids),
+                added_track_ids,
+            )
+
+        return self._update(update)
+
+    def remove_tracks(self, track_ids: list[str]) -> int:
+        """Tombstone the rows of removed tracks, return the new version."""
+
+        def update(current: EngineSnapshot) -> EngineSnapshot:
+            return EngineSnapshot(
+                current.artifacts,
+                current.version,
+                current.engine.remove(current.track_id_map.to_spotify_ids(track_ids)),
+                current.track_id_map,
+                current.added_track_ids,
+            )
+
+        return self._update(update)
+
+    def compact_if_needed(self):
+        """Start a background compaction once the delta passed the threshold."""
+        with self._compact_lock:
+            if self._compacting or not self._snapshot.needs_compaction:
+                return
+            self._compacting = True
+        threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self):
+        """Fold the delta into a new embedding store and swap in a snapshot of it.
+
+        Every artifact is staged first and they are replaced together with the
+        removal of the delta, so a failure at any step leaves the previous
+        store and delta in place.
+        """
+        try:
+            with self._write_lock, lock_delta(self.settings):
+                settings, current = self.settings, self._read_delta(self._snapshot.version + 1)
+                if current.engine.num_rows == current.engine.num_base_rows and not current.engine.tombstones.any():
+                    # Another worker compacted the delta first.
+                    self._swap(current)
+                    return
+                transaction = ArtifactTransaction()
+                try:
+                    self._stage_compaction(current, transaction)
+                    transaction.remove(settings.delta_path)
+                    transaction.commit()
+                    snapshot = EngineSnapshot.load(settings, version=current.version)
+                except Exception:
+                    transaction.rollback()
+                    raise
+                transaction.finish()
+                self._swap(snapshot)
+                custom_logger.info("[recommendation] Compacted index, version = %s", self._snapshot.version)
+        except Exception as e:
+            custom_logger.exception(e)
+        finally:
+            with self._compact_lock:
+                self._compacting = False
+
+    def _stage_compaction(self, current: EngineSnapshot, transaction: ArtifactTransaction):
+        """Write the artifacts of the compacted rows of a snapshot to the staging paths of a transaction."""
+        settings = self.settings
+        engine, store = current.engine, current.engine.store
+        alive = ~engine.tombstones
+        base_alive, delta_alive = alive[: engine.num_base_rows], alive[engine.num_base_rows :]
+        embedding_store = EmbeddingStore(
+            np.vstack([store.embedding_matrix[base_alive], engine.delta_matrix[delta_alive]]),
+            np.concatenate([store.labels[base_alive], engine.delta_labels[delta_alive]]),
+            store.image_dim,
+            store.image_weight,
+            store.metadata_weight,
+        )
+        embedding_store.save(transaction.stage(settings.embedding_store_path))
+        with open(transaction.stage(settings.map_track_ids_path), "w", encoding="utf-8") as f:
+            json.dump(current.track_id_map.track_to_spotify, f)
+
+        # Row numbers changed: the ANN index keeps its centroids, the KNN table is remapped.
+        if os.path.exists(settings.ann_index_path):
+            centroids = IVFIndex.load(settings.ann_index_path).centroids
+            IVFIndex.from_centroids(embedding_store.embedding_matrix, centroids).save(
+                transaction.stage(settings.ann_index_path)
+            )
+        if engine.ranker.title_groups is not None:
+            np.save(transaction.stage(settings.title_groups_path), engine.ranker.title_groups[alive].astype(np.int32))
+        knn_search = engine.get_index(KnnSearch)
+        if knn_search is not None:
+            knn_table = update_knn_table(embedding_store, knn_search.knn_table, base_alive, settings.batch_size)
+            np.save(transaction.stage(settings.knn_table_path), knn_table)
+        elif os.path.exists(settings.knn_table_path):
+            transaction.remove(settings.knn_table_path)
+            custom_logger.warning("Removing stale KNN table %s, rebuild it offline.", settings.knn_table_path)
@@ -0,0 +1,238 @@
+# pylint: disable=E0401
+"""Binary embedding store."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from .engine import build_fused_matrix
+
+
+def save_array(path: str, array: np.ndarray):
+    """Save an array through a temporary file.
+
+    Replacing the file keeps the old inode alive, so snapshots that still
+    memory-map the previous version are never truncated under them.
+    """
+    with open(f"{path}.tmp", "wb") as f:
+        np.save(f, array)
+    os.replace(f"{path}.tmp", path)
+
+
+def hash_arrays(*arrays: np.ndarray) -> str:
+    """Hash the types, shapes and contents of some arrays."""
+    digest = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode("utf-8"))
+        digest.update(array.data)
+    return digest.hexdigest()
+
+
+def remove_path(path: str):
+    """Remove a file or a folder."""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+class ArtifactTransaction:
+    """Replace several artifacts together, or none of them.
+
+    Every new artifact is written to the path ``stage`` returns. ``commit``
+    moves the current artifacts aside and the staged ones into place, in
+    staging order, and moves everything back when a step fails. Until
+    ``finish`` drops the old artifacts, ``rollback`` restores them.
+    """
+
+    def __init__(self):
+        # Pairs of staged path and target path, the target is removed when the staged path is None.
+        self.staged = []
+        # Pairs of target path and the path its previous artifact was moved to, None when there was none.
+        self.replaced = []
+
+    @staticmethod
+    def get_sibling_path(path: str, suffix: str) -> str:
+        """Get a path next to an artifact, keeping its extension so numpy does not append one."""
+        root, ext = os.path.splitext(path.rstrip(os.sep))
+        return f"{root}.{suffix}{ext}"
+
+    def stage(self, path: str) -> str:
+        """Get the temporary path the new artifact of ``path`` is written to."""
+        staged_path = self.get_sibling_path(path, "staged")
+        if os.path.exists(staged_path):
+            remove_path(staged_path)
+        self.staged.append((staged_path, path))
+        return staged_path
+
+    def remove(self, path: str):
+        """Remove an artifact on commit."""
+        self.staged.append((None, path))
+
+    def commit(self):
+        """Move every staged artifact into place."""
+        try:
+            for staged_path, path in self.staged:
+                backup_path = None
+                if os.path.exists(path):
+                    backup_path = self.get_sibling_path(path, "backup")
+                    if os.path.exists(backup_path):
+                        remove_path(backup_path)
+                    os.replace(path, backup_path)
+                self.replaced.append((path, backup_path))
+                if staged_path is not None:
+                    os.replace(staged_path, path)
+        except Exception:
+            self.rollback()
+            raise
+
+    def rollback(self):
+        """Restore the artifacts replaced so far and drop the staged ones."""
+        for path, backup_path in reversed(self.replaced):
+            if os.path.exists(path):
+                remove_path(path)
+            if backup_path is not None:
+                os.replace(backup_path, path)
+        self.replaced = []
+        for staged_path, _ in self.staged:
+            if staged_path is not None and os.path.exists(staged_path):
+                remove_path(staged_path)
+
+    def finish(self):
+        """Drop the previous artifacts once the new ones are in use."""
+        for _, backup_path in self.replaced:
+            if backup_path is not None:
+                remove_path(backup_path)
+        self.replaced = []
+
+
+# The arrays of the store and the fields of its manifest, loaded by keyword.
+class EmbeddingStore:  # pylint: disable=R0902
+    """Fused embedding matrix with its label tables.
+
+    On disk the store is a directory of ``.npy`` files plus a manifest, opened
+    with ``mmap_mode="r"`` so every worker shares the same page cache. The
+    manifest holds a checksum of the arrays, equal stores have equal checksums.
+    """
+
+    MANIFEST = "manifest.json"
+    ARRAYS = ("embedding_matrix", "labels", "sorted_labels", "sorted_rows")
+
+    def __init__(  # pylint: disable=R0913
+        self,
+        embedding_matrix: np.ndarray,
+        labels: np.ndarray,
+        image_dim: int,
+        image_weight: float,
+        metadata_weight: float,
+        *,
+        sorted_labels: np.ndarray = None,
+        sorted_rows: np.ndarray = None,
+        checksum: str = None,
+    ):
+        self.embedding_matrix = embedding_matrix
+        self.labels = labels
+        self.image_dim = image_dim
+        self.image_weight = image_weight
+        self.metadata_weight = metadata_weight
+        if sorted_rows is None:
+            sorted_rows = np.argsort(labels, kind="stable").astype(np.int32)
+            sorted_labels = labels[sorted_rows]
+        self.sorted_labels = sorted_labels
+        self.sorted_rows = sorted_rows
+        # Stores saved before the checksum was kept are hashed when loaded.
+        self.checksum = checksum or hash_arrays(*(getattr(self, name) for name in self.ARRAYS))
+
+    @classmethod
+    def from_raw(
+        cls,
+        images_path: str,
+        labels_path: str,
+        metadata_path: str,
+        image_weight: float,
+        metadata_weight: float,
+    ) -> EmbeddingStore:
+        """Build the store from ``embeded_images.npy``, ``labels.npy`` and ``embedd_metadata.json``."""
+        embeded_images = np.load(images_path)
+        labels = np.load(labels_path)
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            embedd_metadata = json.load(f)
+
+        # Normalize both modalities once and fold the weights into one matrix,
+        # so a query is a single dot product with no per-request norm computation.
+        embedding_matrix = build_fused_matrix(
+            embeded_images,
+            np.array([embedd_metadata[label] for label in labels]),
+            image_weight,
+            metadata_weight,
+        )
+        return cls(embedding_matrix, labels, embeded_images.shape[1], image_weight, metadata_weight)
+
+    def save(self, path: str):
+        """Save the store as contiguous ``.npy`` files."""
+        os.makedirs(path, exist_ok=True)
+        for name in self.ARRAYS:
+            save_array(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(path, f"{self.MANIFEST}.tmp"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "image_dim": self.image_dim,
+                    "image_weight": self.image_weight,
+                    "metadata_weight": self.metadata_weight,
+                    "checksum": self.checksum,
+                },
+                f,
+            )
+        os.replace(os.path.join(path, f"{self.MANIFEST}.tmp"), os.path.join(path, self.MANIFEST))
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str = "r") -> EmbeddingStore:
+        """Open a saved store, memory-mapped by default."""
+        with open(os.path.join(path, cls.MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in cls.ARRAYS}
+        return cls(**arrays, **manifest)
+
+
+class DeltaStore:
+    """Rows appended and removed since the embedding store was built."""
+
+    ARRAYS = ("delta_matrix", "delta_labels", "tombstone_rows")
+
+    def __init__(
+        self,
+        num_base_rows: int,
+        delta_matrix: np.ndarray,
+        delta_labels: np.ndarray,
+        tombstone_rows: np.ndarray,
+        map_track_ids: dict,
+    ):
+        self.num_base_rows = num_base_rows
+        self.delta_matrix = delta_matrix
+        self.delta_labels = delta_labels
+        self.tombstone_rows = tombstone_rows
+        # Track ids of the appended rows.
+        self.map_track_ids = map_track_ids
+
+    def save(self, path: str):
+        """Save the delta."""
+        os.makedirs(path, exist_ok=True)
+        for name in self.ARRAYS:
+            save_array(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, f"{EmbeddingStore.MANIFEST}.tmp"), "w", encoding="utf-8") as f:
+            json.dump({"num_base_rows": self.num_base_rows, "map_track_ids": self.map_track_ids}, f)
+        os.replace(os.path.join(path, f"{EmbeddingStore.MANIFEST}.tmp"), os.path.join(path, EmbeddingStore.MANIFEST))
+
+    @classmethod
+    def load(cls, path: str) -> DeltaStore:
+        """Load a saved delta."""
+        with open(os.path.join(path, EmbeddingStore.MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy")) for name in cls.ARRAYS}
+        return cls(**arrays, **manifest)
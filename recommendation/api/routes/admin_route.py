@@ -0,0 +1,67 @@
+# pylint: disable=E0401
+"""Admin route."""
+
+import asyncio
+
+from api.responses.base import BaseResponse
+from api.routes.recommend_route import micro_batcher
+from api.services.recommend import recommendation_service
+from fastapi import APIRouter, BackgroundTasks
+from logger.logger import custom_logger
+from starlette import status
+
+router = APIRouter()
+
+
+def reload_artifacts():
+    """Reload artifacts, logging failures since nobody awaits the task."""
+    try:
+        recommendation_service.reload()
+    except Exception as e:
+        custom_logger.exception(e)
+
+
+async def watch_artifacts(interval: float):
+    """Swap in the artifacts reloaded, compacted or updated by the other workers, checked every ``interval`` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(recommendation_service.registry.sync)
+        except Exception as e:
+            custom_logger.exception(e)
+
+
+@router.post("/reload", include_in_schema=True)
+async def reload(background_tasks: BackgroundTasks):
+    """Reload artifacts in the background, requests keep using the current version meanwhile.
+
+    The other workers swap the reloaded artifacts in within ``RELOAD_POLL_INTERVAL`` seconds.
+    """
+    if recommendation_service.registry.reloading:
+        return BaseResponse.error_response(message="Reload already in progress", status_code=status.HTTP_409_CONFLICT)
+
+    background_tasks.add_task(reload_artifacts)
+    custom_logger.info("[recommendation] Reload artifacts scheduled")
+    return {"version": recommendation_service.get_version(), "reloading": True}
+
+
+@router.get("/cache", include_in_schema=True)
+async def cache():
+    """Get the hit and miss counters of the result cache."""
+    return recommendation_service.result_cache.get_stats()
+
+
+@router.get("/batching", include_in_schema=True)
+async def batching():
+    """Get the batch sizes achieved by micro-batching."""
+    return micro_batcher.get_stats()
+
+
+@router.get("/version", include_in_schema=True)
+async def version():
+    """Get version of the artifacts in use, workers serving the same artifacts share the fingerprint."""
+    return {
+        "version": recommendation_service.get_version(),
+        "fingerprint": recommendation_service.registry.current.fingerprint,
+        "reloading": recommendation_service.registry.reloading,
+    }
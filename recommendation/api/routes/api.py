@@ -1,9 +1,11 @@
 # pylint: disable=E0401
 """Define API."""
 
-from api.routes import recommend_route
+from api.routes import admin_route, index_route, recommend_route
 from fastapi import APIRouter
 
 app = APIRouter()
 
 app.include_router(recommend_route.router, tags=["Recommendation"], prefix="/recommend")
+app.include_router(admin_route.router, tags=["Admin"], prefix="/admin")
+app.include_router(index_route.router, tags=["Index"], prefix="/index")
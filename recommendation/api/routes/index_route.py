@@ -0,0 +1,54 @@
+# pylint: disable=E0401
+"""Index route."""
+
+import asyncio
+
+from api.errors.error_message import BaseErrorMessage
+from api.responses.base import BaseResponse
+from api.schemas.recommend import IndexAddInputSchema, IndexRemoveInputSchema
+from api.services.recommend import recommendation_service
+from fastapi import APIRouter
+from logger.logger import custom_logger
+
+router = APIRouter()
+
+
+@router.post("/tracks", include_in_schema=True)
+async def add_tracks(index_input: IndexAddInputSchema):
+    """Add tracks to the index without a full rebuild."""
+    try:
+        # Index updates wait for the snapshot lock and rewrite the delta, keep them off the event loop.
+        version = await asyncio.to_thread(recommendation_service.add_tracks, tracks=index_input.tracks)
+        custom_logger.info("[recommendation] Added %s tracks to the index", len(index_input.tracks))
+        return {"version": version}
+
+    except ValueError as e:
+        error_object: BaseErrorMessage = e.args[0]
+        return BaseResponse.error_response(
+            message_code=error_object.message_code,
+            message=error_object.message,
+            status_code=error_object.status_code,
+        )
+    except Exception as e:
+        custom_logger.exception(e)
+        return BaseResponse.error_response(message=f"An error occurred: {e}")
+
+
+@router.post("/tracks/remove", include_in_schema=True)
+async def remove_tracks(index_input: IndexRemoveInputSchema):
+    """Remove tracks from the index, their rows are tombstoned until compaction."""
+    try:
+        version = await asyncio.to_thread(recommendation_service.remove_tracks, track_ids=index_input.track_ids)
+        custom_logger.info("[recommendation] Removed %s tracks from the index", len(index_input.track_ids))
+        return {"version": version}
+
+    except ValueError as e:
+        error_object: BaseErrorMessage = e.args[0]
+        return BaseResponse.error_response(
+            message_code=error_object.message_code,
+            message=error_object.message,
+            status_code=error_object.status_code,
+        )
+    except Exception as e:
+        custom_logger.exception(e)
+        return BaseResponse.error_response(message=f"An error occurred: {e}")
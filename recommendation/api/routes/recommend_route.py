@@ -1,23 +1,77 @@
 # pylint: disable=E0401
 """Recommendation route."""
 
+from typing import List, Optional
+
 from api.errors.error_message import BaseErrorMessage
+from api.helpers.engine import HybridWeights
+from api.helpers.executor import scoring_executor
+from api.helpers.micro_batch import MicroBatcher
+from api.helpers.single_flight import SingleFlight
 from api.responses.base import BaseResponse
-from api.schemas.recommend import RecommendInputSchema
+from api.schemas.recommend import (
+    RecommendBatchInputSchema,
+    RecommendInputSchema,
+    RecommendUserInputSchema,
+    RecommendVectorInputSchema,
+    RecommendVectorsInputSchema,
+)
 from api.services.recommend import recommendation_service
+from core.config import MICRO_BATCH_SIZE, MICRO_BATCH_WAIT_MS, MICRO_BATCHING
 from fastapi import APIRouter
 from logger.logger import custom_logger
 
 router = APIRouter()
+# Identical concurrent recommendation requests share one computation.
+single_flight = SingleFlight()
+# Concurrent single recommendation requests scored by one matrix product.
+micro_batcher = MicroBatcher(
+    recommendation_service.get_recommendation_each,
+    scoring_executor.run,
+    MICRO_BATCH_SIZE,
+    MICRO_BATCH_WAIT_MS / 1000,
+)
+
+
+async def compute_recommendation(
+    recommend_input: RecommendInputSchema,
+    weights: Optional[HybridWeights],
+    diversity: Optional[float],
+) -> List[str]:
+    """Score one anchor, with concurrent ones when micro-batching is enabled."""
+    if MICRO_BATCHING:
+        return await micro_batcher.submit(recommend_input)
+    return await scoring_executor.run(
+        recommendation_service.get_recommendation,
+        track_id=recommend_input.track_id,
+        existed_ids=recommend_input.existed_ids,
+        weights=weights,
+        genres=recommend_input.genres,
+        tags=recommend_input.tags,
+        diversity=diversity,
+    )
 
 
 @router.post("", include_in_schema=True)
 async def recommend(recommend_input: RecommendInputSchema):
     """Recommend."""
     try:
-        recommend_res = recommendation_service.get_recommendation(
-            track_id=recommend_input.track_id,
-            existed_ids=recommend_input.existed_ids,
+        weights = recommendation_service.get_weights(recommend_input)
+        diversity = recommendation_service.get_diversity(recommend_input)
+        recommend_res = await single_flight.do(
+            recommendation_service.get_cache_key(
+                recommendation_service.get_version(),
+                recommend_input.track_id,
+                recommend_input.existed_ids,
+                weights,
+                diversity,
+                recommend_input.genres,
+                recommend_input.tags,
+            ),
+            compute_recommendation,
+            recommend_input,
+            weights,
+            diversity,
         )
         custom_logger.info("[recommendation] Recommend music succesful with track_ids = %s", recommend_input.track_id)
         return {'recommend_ids': recommend_res}
@@ -32,3 +86,99 @@ async def recommend(recommend_input: RecommendInputSchema):
     except Exception as e:
         custom_logger.exception(e)
         return BaseResponse.error_response(message=f"An error occurred: {e}")
+
+
+@router.post("/batch", include_in_schema=True)
+async def recommend_batch(recommend_input: RecommendBatchInputSchema):
+    """Recommend for many anchors."""
+    try:
+        recommend_res = await scoring_executor.run(
+            recommendation_service.get_recommendation_batch,
+            anchors=recommend_input.anchors,
+        )
+        custom_logger.info("[recommendation] Recommend music succesful with %s anchors", len(recommend_input.anchors))
+        return {"recommendations": recommend_res}
+
+    except ValueError as e:
+        error_object: BaseErrorMessage = e.args[0]
+        return BaseResponse.error_response(
+            message_code=error_object.message_code,
+            message=error_object.message,
+            status_code=error_object.status_code,
+        )
+    except Exception as e:
+        custom_logger.exception(e)
+        return BaseResponse.error_response(message=f"An error occurred: {e}")
+
+
+@router.post("/user", include_in_schema=True)
+async def recommend_user(recommend_input: RecommendUserInputSchema):
+    """Recommend for a taste profile of many liked tracks."""
+    try:
+        recommend_res = await scoring_executor.run(
+            recommendation_service.get_recommendation_by_profile,
+            track_ids=recommend_input.track_ids,
+            existed_ids=recommend_input.existed_ids,
+            profile=recommend_input.profile,
+            top_k=recommend_input.top_k,
+        )
+        custom_logger.info(
+            "[recommendation] Recommend music succesful with %s liked tracks", len(recommend_input.track_ids)
+        )
+        return {"recommend_ids": recommend_res}
+
+    except ValueError as e:
+        error_object: BaseErrorMessage = e.args[0]
+        return BaseResponse.error_response(
+            message_code=error_object.message_code,
+            message=error_object.message,
+            status_code=error_object.status_code,
+        )
+    except Exception as e:
+        custom_logger.exception(e)
+        return BaseResponse.error_response(message=f"An error occurred: {e}")
+
+
+@router.post("/vectors", include_in_schema=True)
+async def get_vectors(vectors_input: RecommendVectorsInputSchema):
+    """Get track vectors."""
+    try:
+        vectors, checksum = recommendation_service.get_vectors(track_ids=vectors_input.track_ids)
+        return {"vectors": vectors, "checksum": checksum}
+
+    except ValueError as e:
+        error_object: BaseErrorMessage = e.args[0]
+        return BaseResponse.error_response(
+            message_code=error_object.message_code,
+            message=error_object.message,
+            status_code=error_object.status_code,
+        )
+    except Exception as e:
+        custom_logger.exception(e)
+        return BaseResponse.error_response(message=f"An error occurred: {e}")
+
+
+@router.post("/vector", include_in_schema=True)
+async def recommend_vector(recommend_input: RecommendVectorInputSchema):
+    """Recommend for a taste vector."""
+    try:
+        recommend_res = await scoring_executor.run(
+            recommendation_service.get_recommendation_by_vector,
+            vector=recommend_input.vector,
+            existed_ids=recommend_input.existed_ids,
+            top_k=recommend_input.top_k,
+            checksum=recommend_input.checksum,
+        )
+        custom_logger.info("[recommendation] Recommend music succesful with a taste vector")
+        return {"recommend_ids": recommend_res}
+
+    except ValueError as e:
+        error_object: BaseErrorMessage = e.args[0]
+        return BaseResponse.error_response(
+            message_code=error_object.message_code,
+            message=error_object.message,
+            status_code=error_object.status_code,
+        )
+    except Exception as e:
+        custom_logger.exception(e)
+        return BaseResponse.error_response(message=f"An error occurred: {e}")
@@ -3,6 +3,7 @@
 
 from typing import List, Optional
 
+from core.config import MAX_TOP_K
 from pydantic import BaseModel, Field
 
 
@@ -11,3 +12,62 @@ class RecommendInputSchema(BaseModel):
 
     track_id: str = Field(..., description="Unique identifier of track.")
     existed_ids: Optional[List[str]] = Field(..., description="List existed ids.")
+    image_weight: Optional[float] = Field(None, ge=0, description="Weight of the image similarity.")
+    metadata_weight: Optional[float] = Field(None, ge=0, description="Weight of the metadata similarity.")
+    collaborative_weight: Optional[float] = Field(None, ge=0, description="Weight of the collaborative similarity.")
+    genres: Optional[List[str]] = Field(None, description="Only recommend tracks of any of these genres.")
+    tags: Optional[List[str]] = Field(None, description="Only recommend tracks with any of these tags.")
+    diversity: Optional[float] = Field(
+        None, ge=0, le=1, description="Trade score for diversity, from 0 (score only) to 1."
+    )
+
+
+class RecommendBatchInputSchema(BaseModel):
+    """Recommendation batch input schema."""
+
+    anchors: List[RecommendInputSchema] = Field(..., description="List anchor tracks with their existed ids.")
+
+
+class RecommendUserInputSchema(BaseModel):
+    """Recommendation user input schema."""
+
+    track_ids: List[str] = Field(..., description="List liked track ids, most recent first.")
+    existed_ids: Optional[List[str]] = Field(None, description="List existed ids.")
+    profile: Optional[str] = Field(None, description="Profile mode: mean, recency or kmeans.")
+    top_k: Optional[int] = Field(None, ge=1, le=MAX_TOP_K, description="Number of recommendations.")
+
+
+class RecommendVectorsInputSchema(BaseModel):
+    """Recommendation vectors input schema."""
+
+    track_ids: List[str] = Field(..., description="List track ids.")
+
+
+class RecommendVectorInputSchema(BaseModel):
+    """Recommendation vector input schema."""
+
+    vector: List[float] = Field(..., description="Taste vector, a sum or mean of track vectors.")
+    existed_ids: Optional[List[str]] = Field(None, description="List existed ids.")
+    top_k: Optional[int] = Field(None, ge=1, le=MAX_TOP_K, description="Number of recommendations.")
+    checksum: Optional[str] = Field(None, description="Checksum of the embeddings the track vectors came from.")
+
+
+class IndexTrackSchema(BaseModel):
+    """Index track schema."""
+
+    track_id: str = Field(..., description="Unique identifier of track.")
+    spotify_id: str = Field(..., description="Spotify id of track, used as its label in the index.")
+    image_embedding: List[float] = Field(..., description="Spectrogram image embedding of track.")
+    metadata_embedding: List[float] = Field(..., description="Metadata embedding of track.")
+
+
+class IndexAddInputSchema(BaseModel):
+    """Index add input schema."""
+
+    tracks: List[IndexTrackSchema] = Field(..., description="List tracks to add to the index.")
+
+
+class IndexRemoveInputSchema(BaseModel):
+    """Index remove input schema."""
+
+    track_ids: List[str] = Field(..., description="List track ids to remove from the index.")
@@ -1,68 +1,330 @@
 # pylint: disable=E0401
 """Recommendation service."""
 
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
-from core.config import TOP_K, embedd_metadata, embeded_images, labels, map_track_ids
+from api.errors.error_message import (
+    DiversityError,
+    EmbeddingDimensionError,
+    HybridWeightsError,
+    ProfileModeError,
+    StaleTasteVectorError,
+    TrackFilterError,
+    TrackNotIndexedError,
+)
+from api.helpers.engine import HybridWeights, SearchOptions, build_fused_matrix
+from api.helpers.profile import PROFILE_MODES, build_profile, normalize_queries
+from api.helpers.result_cache import ResultCache, hash_ids
+from api.helpers.settings import snapshot_settings
+from api.helpers.snapshot import EngineSnapshot, SnapshotRegistry
+from api.schemas.recommend import IndexTrackSchema, RecommendInputSchema
+from core.config import (
+    BATCH_SIZE,
+    PROFILE_MODE,
+    PROFILE_NUM_CLUSTERS,
+    PROFILE_RECENCY_DECAY,
+    RESULT_CACHE_REDIS_URL,
+    RESULT_CACHE_SIZE,
+    RESULT_CACHE_TTL,
+    TOP_K,
+    USER_TOP_K,
+)
 
 
 class RecommendationService:
     """Recommendation service."""
 
     def __init__(self):
-        pass
+        self.registry = SnapshotRegistry(snapshot_settings)
+        self.result_cache = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL, RESULT_CACHE_REDIS_URL)
+
+    @property
+    def engine(self):
+        """Engine of the current snapshot."""
+        return self.registry.current.engine
+
+    def get_weights(self, anchor: RecommendInputSchema) -> Optional[HybridWeights]:
+        """Get the weights requested for an anchor, None keeps the configured ones."""
+        requested = (anchor.image_weight, anchor.metadata_weight, anchor.collaborative_weight)
+        if all(weight is None for weight in requested):
+            return None
+        weights = HybridWeights(
+            *(default if weight is None else weight for weight, default in zip(requested, self.engine.default_weights))
+        )
+        if min(weights) < 0 or sum(weights) <= 0:
+            raise ValueError(HybridWeightsError)
+        return weights
+
+    def get_diversity(self, anchor: RecommendInputSchema) -> Optional[float]:
+        """Get the diversity requested for an anchor, None keeps the configured one."""
+        if anchor.diversity is not None and not 0 <= anchor.diversity <= 1:
+            raise ValueError(DiversityError)
+        return anchor.diversity
 
     @staticmethod
-    def get_recommendation(track_id: str, existed_ids: List[str] = None) -> List[str]:
-        """Get recommendation."""
-        prediction_anchor_1, prediction_anchor_2 = [], []
-        prediction_songs = []
-        predictions_metadata = []
-        predictions_label = []
-        distance_array = []
-        list_recommend_ids = []
-        recommendations = 0
-
-        # Calculate the latent feature vectors for all the songs.
-        for idx, label in enumerate(labels):
-            if label == map_track_ids[track_id]:
-                prediction_anchor_1 = embeded_images[idx]
-                prediction_anchor_2 = embedd_metadata[label]
-            else:
-                predictions_label.append(label)
-                prediction_songs.append(embeded_images[idx])
-                predictions_metadata.append(embedd_metadata[label])
-        prediction_anchor_2 = np.array(prediction_anchor_2)
-        predictions_metadata = np.array(predictions_metadata)
-
-        # Count is used for averaging the latent feature vectors.
-        for idx, prediction_song in enumerate(prediction_songs):
-            # Cosine Similarity - Computes a similarity score of all songs with respect
-            # to the anchor song.
-            distance_1 = np.sum(prediction_anchor_1 * prediction_song) / (
-                np.sqrt(np.sum(prediction_anchor_1**2)) * np.sqrt(np.sum(prediction_song**2))
-            )
-            distance_2 = np.sum(prediction_anchor_2 * predictions_metadata[idx]) / (
-                np.sqrt(np.sum(prediction_anchor_2**2)) * np.sqrt(np.sum(predictions_metadata[idx] ** 2))
+    def get_candidates(
+        snapshot: EngineSnapshot, genres: List[str] = None, tags: List[str] = None
+    ) -> Optional[np.ndarray]:
+        """Get the rows matching the genre and tag filters, None when no filter is given."""
+        if not genres and not tags:
+            return None
+        track_filter = snapshot.artifacts.track_filter
+        if track_filter is None:
+            raise ValueError(TrackFilterError)
+        return track_filter.get_rows(genres, tags)
+
+    @staticmethod
+    def get_anchor(snapshot: EngineSnapshot, track_id: str) -> Optional[Tuple[str, int]]:
+        """Get the label and current row of an anchor track, None when it is not in the index or was removed."""
+        anchor_label = snapshot.track_id_map.get_spotify_id(track_id)
+        anchor_row = None if anchor_label is None else snapshot.get_row(anchor_label)
+        if anchor_row is None:
+            return None
+        return anchor_label, anchor_row
+
+    # Every option of a request is part of its key.
+    @staticmethod
+    def get_cache_key(  # pylint: disable=R0913,R0917
+        fingerprint: str,
+        track_id: str,
+        existed_ids: List[str] = None,
+        weights: HybridWeights = None,
+        diversity: float = None,
+        genres: List[str] = None,
+        tags: List[str] = None,
+    ) -> tuple:
+        """Get the result cache key of a recommendation request."""
+        filters = tuple(
+            tuple(sorted({name.strip().lower() for name in names})) if names else None for names in (genres, tags)
+        )
+        return (fingerprint, track_id, hash_ids(existed_ids), TOP_K, weights, diversity, filters)
+
+    # The options of a request, as the route and the batch fallback pass them.
+    def get_recommendation(  # pylint: disable=R0913,R0917
+        self,
+        track_id: str,
+        existed_ids: List[str] = None,
+        weights: HybridWeights = None,
+        genres: List[str] = None,
+        tags: List[str] = None,
+        diversity: float = None,
+    ) -> List[str]:
+        """Get recommendation, served from the result cache when it was computed recently."""
+        snapshot = self.registry.current
+        cache_key = self.get_cache_key(snapshot.fingerprint, track_id, existed_ids, weights, diversity, genres, tags)
+        recommend_ids = self.result_cache.get(cache_key)
+        if recommend_ids is not None:
+            return recommend_ids
+
+        anchor = self.get_anchor(snapshot, track_id)
+        if anchor is None:
+            raise ValueError(TrackNotIndexedError)
+        anchor_label, anchor_row = anchor
+        candidates = self.get_candidates(snapshot, genres, tags)
+
+        # Cosine Similarity - Computes a similarity score of all songs with respect
+        # to the anchor song, the anchor itself is never recommended.
+        excluded = snapshot.engine.get_exclusion_mask([anchor_label, *(existed_ids or [])])
+        options = SearchOptions(weights, diversity, candidates)
+        recommend_ids = snapshot.engine.search(anchor_row, TOP_K, excluded, options)
+        self.result_cache.set(cache_key, recommend_ids)
+        return recommend_ids
+
+    def get_recommendation_batch(self, anchors: List[RecommendInputSchema]) -> Dict[str, List[str]]:
+        """Get recommendation for many anchors at once, cached anchors are not scored again.
+
+        Anchors that are not in the index are left out of the result.
+        """
+        snapshot = self.registry.current
+        recommendations, cache_keys = {}, {}
+        indexed = {anchor.track_id: self.get_anchor(snapshot, anchor.track_id) for anchor in anchors}
+        anchors = [anchor for anchor in anchors if indexed[anchor.track_id] is not None]
+        for anchor in anchors:
+            cache_key = self.get_cache_key(
+                snapshot.fingerprint,
+                anchor.track_id,
+                anchor.existed_ids,
+                self.get_weights(anchor),
+                self.get_diversity(anchor),
+                anchor.genres,
+                anchor.tags,
             )
-            distance_array.append(distance_1 * 0.6 + distance_2 * 0.4)
+            recommend_ids = self.result_cache.get(cache_key)
+            if recommend_ids is None:
+                # A track id asked twice with other options is answered once, as before, and not cached.
+                cache_keys[anchor.track_id] = cache_key if anchor.track_id not in cache_keys else None
+            else:
+                recommendations[anchor.track_id] = recommend_ids
+        anchors = [anchor for anchor in anchors if anchor.track_id in cache_keys]
+
+        for start in range(0, len(anchors), BATCH_SIZE):
+            batch = anchors[start : start + BATCH_SIZE]
+            anchor_labels = [indexed[anchor.track_id][0] for anchor in batch]
+            anchor_rows = [indexed[anchor.track_id][1] for anchor in batch]
+
+            excluded = [
+                snapshot.engine.get_exclusion_mask([anchor_label, *(anchor.existed_ids or [])])
+                for anchor, anchor_label in zip(batch, anchor_labels)
+            ]
+            # One matrix product scores every anchor of the batch requesting the same weights
+            # and diversity, filtered anchors only score their candidate rows.
+            groups = {}
+            for idx, anchor in enumerate(batch):
+                options = SearchOptions(
+                    self.get_weights(anchor),
+                    self.get_diversity(anchor),
+                    self.get_candidates(snapshot, anchor.genres, anchor.tags),
+                )
+                if options.candidates is not None:
+                    recommendations[anchor.track_id] = snapshot.engine.search(
+                        anchor_rows[idx], TOP_K, excluded[idx], options
+                    )
+                    continue
+                groups.setdefault(options, []).append(idx)
+            for options, idxs in groups.items():
+                results = snapshot.engine.search_batch(
+                    [anchor_rows[idx] for idx in idxs],
+                    TOP_K,
+                    [excluded[idx] for idx in idxs],
+                    options,
+                )
+                for idx, recommend_ids in zip(idxs, results):
+                    recommendations[batch[idx].track_id] = recommend_ids
+        for track_id, cache_key in cache_keys.items():
+            if cache_key is not None:
+                self.result_cache.set(cache_key, recommendations[track_id])
+        return recommendations
+
+    def get_recommendation_each(self, anchors: List[RecommendInputSchema]) -> List[object]:
+        """Get recommendation for every anchor in order, in batches, an anchor that fails gets its error."""
+        # A batch answers a track id once, so repeated track ids go to later batches.
+        batches: List[Dict[str, int]] = []
+        for idx, anchor in enumerate(anchors):
+            batch = next((batch for batch in batches if anchor.track_id not in batch), None)
+            if batch is None:
+                batch = {}
+                batches.append(batch)
+            batch[anchor.track_id] = idx
+
+        results = [None] * len(anchors)
+        for batch in batches:
+            try:
+                recommendations = self.get_recommendation_batch([anchors[idx] for idx in batch.values()])
+                for track_id, idx in batch.items():
+                    results[idx] = recommendations.get(track_id, ValueError(TrackNotIndexedError))
+            except Exception:
+                # One failing anchor fails the batch, score its anchors one by one to isolate it.
+                for idx in batch.values():
+                    anchor = anchors[idx]
+                    try:
+                        results[idx] = self.get_recommendation(
+                            anchor.track_id,
+                            anchor.existed_ids,
+                            self.get_weights(anchor),
+                            anchor.genres,
+                            anchor.tags,
+                            self.get_diversity(anchor),
+                        )
+                    except Exception as e:
+                        results[idx] = e
+        return results
+
+    def get_recommendation_by_profile(
+        self,
+        track_ids: List[str],
+        existed_ids: List[str] = None,
+        profile: str = None,
+        top_k: int = None,
+    ) -> List[str]:
+        """Get recommendation for a taste profile of many anchors, the anchors are never recommended."""
+        profile = profile or PROFILE_MODE
+        if profile not in PROFILE_MODES:
+            raise ValueError(ProfileModeError)
+
+        snapshot = self.registry.current
+        anchor_labels = snapshot.track_id_map.to_spotify_ids(track_ids)
+        # The last row of a label is its current one, replaced rows are tombstoned.
+        anchor_rows = [snapshot.engine.get_rows([anchor_label]) for anchor_label in anchor_labels]
+        anchor_rows = [rows[-1] for rows in anchor_rows if len(rows)]
+        if not anchor_rows:
+            return []
+
+        queries = build_profile(
+            snapshot.engine,
+            anchor_rows,
+            mode=profile,
+            recency_decay=PROFILE_RECENCY_DECAY,
+            num_clusters=PROFILE_NUM_CLUSTERS,
+        )
+        excluded = snapshot.engine.get_exclusion_mask([*anchor_labels, *(existed_ids or [])])
+        return snapshot.engine.search_profile(queries, top_k or USER_TOP_K, excluded)
+
+    def get_vectors(self, track_ids: List[str]) -> Tuple[Dict[str, List[float]], str]:
+        """Get the query vector of every known track and the checksum of the embeddings they come from.
+
+        Sums of the vectors are taste vectors, they are only valid while the checksum stays the same.
+        """
+        snapshot = self.registry.current
+        vectors = {}
+        for track_id in track_ids:
+            rows = snapshot.engine.get_rows(snapshot.track_id_map.to_spotify_ids([track_id]))
+            if len(rows):
+                vectors[track_id] = snapshot.engine.get_query(rows[-1]).tolist()
+        return vectors, snapshot.engine.store.checksum
+
+    def get_recommendation_by_vector(
+        self,
+        vector: List[float],
+        existed_ids: List[str] = None,
+        top_k: int = None,
+        checksum: str = None,
+    ) -> List[str]:
+        """Get recommendation for a taste vector, rejected when built from embeddings of another checksum."""
+        engine = self.registry.current.engine
+        if len(vector) != engine.store.embedding_matrix.shape[1]:
+            raise ValueError(EmbeddingDimensionError)
+        if checksum is not None and checksum != engine.store.checksum:
+            raise ValueError(StaleTasteVectorError)
+        queries = normalize_queries(engine, [vector])
+        excluded = engine.get_exclusion_mask(existed_ids or [])
+        return engine.search_profile(queries, top_k or USER_TOP_K, excluded)
+
+    def get_version(self) -> int:
+        """Get version of the current artifacts."""
+        return self.registry.current.version
 
-        distance_array = np.array(distance_array)
+    def reload(self) -> int:
+        """Reload artifacts from disk."""
+        version = self.registry.reload()
+        self.result_cache.clear()
+        return version
 
-        while recommendations < TOP_K:
-            index = np.argmax(distance_array)
-            if (
-                predictions_label[index] != map_track_ids[track_id]
-                and predictions_label[index] not in list_recommend_ids
-                and predictions_label[index] not in existed_ids
-            ):
-                list_recommend_ids.append(predictions_label[index])
-                recommendations = recommendations + 1
+    def add_tracks(self, tracks: List[IndexTrackSchema]) -> int:
+        """Add tracks to the index, return the new version."""
+        embedding_store = self.registry.current.engine.store
+        embeded_images = np.array([track.image_embedding for track in tracks], dtype=np.float64)
+        metadata_matrix = np.array([track.metadata_embedding for track in tracks], dtype=np.float64)
+        image_dim = embedding_store.image_dim
+        metadata_dim = embedding_store.embedding_matrix.shape[1] - image_dim
+        if embeded_images.shape[1:] != (image_dim,) or metadata_matrix.shape[1:] != (metadata_dim,):
+            raise ValueError(EmbeddingDimensionError)
 
-            distance_array[index] = -np.inf
+        embedding_rows = build_fused_matrix(
+            embeded_images,
+            metadata_matrix,
+            embedding_store.image_weight,
+            embedding_store.metadata_weight,
+        )
+        return self.registry.add_tracks(
+            [track.track_id for track in tracks],
+            [track.spotify_id for track in tracks],
+            embedding_rows,
+        )
 
-        return list_recommend_ids
+    def remove_tracks(self, track_ids: List[str]) -> int:
+        """Remove tracks from the index, return the new version."""
+        return self.registry.remove_tracks(track_ids)
 
 
 recommendation_service = RecommendationService()
@@ -3,11 +3,9 @@
 
 from __future__ import annotations
 
-import json
 import logging
 import sys
 
-import numpy as np
 from core.logging import InterceptHandler
 from dotenv import load_dotenv
 from loguru import logger
@@ -45,12 +43,79 @@ for logger_name in LOGGERS:
 logger.configure(handlers=[{"sink": sys.stderr, "level": LOGGING_LEVEL}])
 
 TOP_K = 5
+IMAGE_WEIGHT = 0.6
+METADATA_WEIGHT = 0.4
+# User recommendations rank every track against a taste profile of the liked tracks:
+# "mean", "recency" (weights decay by PROFILE_RECENCY_DECAY per newer like) or
+# "kmeans" (up to PROFILE_NUM_CLUSTERS centroids, a track scores its best match).
+USER_TOP_K: int = config("USER_TOP_K", cast=int, default=20)
+# Largest top_k a request may ask for.
+MAX_TOP_K: int = config("MAX_TOP_K", cast=int, default=1000)
+PROFILE_MODE: str = config("PROFILE_MODE", default="recency")
+PROFILE_RECENCY_DECAY: float = config("PROFILE_RECENCY_DECAY", cast=float, default=0.9)
+PROFILE_NUM_CLUSTERS: int = config("PROFILE_NUM_CLUSTERS", cast=int, default=3)
+# Maximal marginal relevance re-ranking: DIVERSITY trades score (0) for dissimilarity to the
+# tracks already picked (1), among the best DIVERSITY_POOL_SIZE tracks.
+DIVERSITY: float = config("DIVERSITY", cast=float, default=0.0)
+DIVERSITY_POOL_SIZE: int = config("DIVERSITY_POOL_SIZE", cast=int, default=200)
+# LRU cache of recommendations, entries expire after RESULT_CACHE_TTL seconds and a size of 0
+# disables it. Results are also shared between workers in Redis when RESULT_CACHE_REDIS_URL is set.
+RESULT_CACHE_SIZE: int = config("RESULT_CACHE_SIZE", cast=int, default=10000)
+RESULT_CACHE_TTL: float = config("RESULT_CACHE_TTL", cast=float, default=300)
+RESULT_CACHE_REDIS_URL: str = config("RESULT_CACHE_REDIS_URL", default="")
+# Scoring runs in a pool of SCORING_WORKERS threads, up to SCORING_QUEUE_SIZE more requests
+# wait for a thread and further ones are rejected with a 503 until the queue drains.
+SCORING_WORKERS: int = config("SCORING_WORKERS", cast=int, default=4)
+SCORING_QUEUE_SIZE: int = config("SCORING_QUEUE_SIZE", cast=int, default=64)
+# Opt-in micro-batching: single recommendation requests arriving within MICRO_BATCH_WAIT_MS of
+# each other are scored together, up to MICRO_BATCH_SIZE per matrix product.
+MICRO_BATCHING: bool = config("MICRO_BATCHING", cast=bool, default=False)
+MICRO_BATCH_SIZE: int = config("MICRO_BATCH_SIZE", cast=int, default=32)
+MICRO_BATCH_WAIT_MS: float = config("MICRO_BATCH_WAIT_MS", cast=float, default=2.0)
+# Maximum number of anchors scored by one matrix product in batch requests.
+BATCH_SIZE: int = config("BATCH_SIZE", cast=int, default=256)
 
-print("Read config")
-embeded_images = np.load("./data/embeded_images.npy")
-labels = np.load("./data/labels.npy")
-with open("./data/embedd_metadata.json", "r", encoding="utf-8") as f:
-    embedd_metadata = json.load(f)
+# Raw artifacts, and the binary embedding store converted offline by ``data/convert_embeddings.py``.
+IMAGES_PATH: str = config("IMAGES_PATH", default="./data/embeded_images.npy")
+LABELS_PATH: str = config("LABELS_PATH", default="./data/labels.npy")
+METADATA_PATH: str = config("METADATA_PATH", default="./data/embedd_metadata.json")
+MAP_TRACK_IDS_PATH: str = config("MAP_TRACK_IDS_PATH", default="./data/map_track_ids.json")
+EMBEDDING_STORE_PATH: str = config("EMBEDDING_STORE_PATH", default="./data/embeddings")
 
-with open("./data/map_track_ids.json", "r", encoding="utf-8") as f:
-    map_track_ids = json.load(f)
+# Approximate nearest neighbour index, built offline by ``data/build_ann_index.py``.
+# ANN_NUM_PROBE is the recall/latency knob, 0 always runs an exact scan.
+ANN_INDEX_PATH: str = config("ANN_INDEX_PATH", default="./data/ann_index.npz")
+ANN_NUM_LISTS: int = config("ANN_NUM_LISTS", cast=int, default=64)
+ANN_NUM_PROBE: int = config("ANN_NUM_PROBE", cast=int, default=0)
+
+# Quantised first-pass scoring: "none", "int8" or "float16". The best
+# QUANTIZATION_RERANK_SIZE rows are re-ranked against the full precision matrix.
+QUANTIZATION: str = config("QUANTIZATION", default="none")
+QUANTIZATION_RERANK_SIZE: int = config("QUANTIZATION_RERANK_SIZE", cast=int, default=256)
+
+# Precomputed neighbours of every track, built offline by ``data/build_knn_table.py``.
+KNN_TABLE_PATH: str = config("KNN_TABLE_PATH", default="./data/knn_table.npy")
+KNN_TABLE_SIZE: int = config("KNN_TABLE_SIZE", cast=int, default=50)
+
+# Track catalog, genre and tag filters are built from it on load. The title group of
+# every track is built from it offline by ``data/build_title_groups.py``, tracks
+# sharing a title are recommended at most once.
+TRACKS_PATH: str = config("TRACKS_PATH", default="./data/tracks_rows.csv")
+TITLE_GROUPS_PATH: str = config("TITLE_GROUPS_PATH", default="./data/title_groups.npy")
+
+# Item-item similarity mined from likes, built offline by ``backend/data/build_item_similarity.py``.
+# COLLABORATIVE_WEIGHT blends it into the content scores: 0 is content only, 1 collaborative only.
+ITEM_SIMILARITY_PATH: str = config("ITEM_SIMILARITY_PATH", default="./data/item_similarity.npz")
+COLLABORATIVE_WEIGHT: float = config("COLLABORATIVE_WEIGHT", cast=float, default=0.0)
+
+# Tracks added and removed through the index API are kept as a delta next to the
+# store. Compaction folds them in once tombstoned or appended rows pass
+# COMPACTION_THRESHOLD of the rows.
+DELTA_PATH: str = config("DELTA_PATH", default="./data/delta")
+COMPACTION_THRESHOLD: float = config("COMPACTION_THRESHOLD", cast=float, default=0.1)
+
+# Every worker checks the artifacts on disk every RELOAD_POLL_INTERVAL seconds (0 disables it) and
+# swaps in the reloads, compactions and index updates made by the other workers. A reload bumps the
+# counter in RELOAD_SIGNAL_PATH.
+RELOAD_SIGNAL_PATH: str = config("RELOAD_SIGNAL_PATH", default="./data/reload_signal")
+RELOAD_POLL_INTERVAL: float = config("RELOAD_POLL_INTERVAL", cast=float, default=5.0)
@@ -0,0 +1,26 @@
+# pylint: disable=E0401
+"""Build the approximate nearest neighbour index."""
+
+import os
+import sys
+
+code_root = os.path.abspath(os.path.join(__file__, "../.."))
+print(f"sys_root = {code_root}")
+if code_root not in sys.path:
+    sys.path.append(code_root)
+
+from api.helpers.ann import IVFIndex
+from api.helpers.settings import snapshot_settings
+from api.helpers.snapshot import load_embedding_store
+from core.config import ANN_INDEX_PATH, ANN_NUM_LISTS
+
+
+def build_ann_index():
+    """Build ANN index."""
+    ann_index = IVFIndex.train(load_embedding_store(snapshot_settings).embedding_matrix, num_lists=ANN_NUM_LISTS)
+    ann_index.save(ANN_INDEX_PATH)
+    print(f"Saved {ann_index.num_lists} lists for {ann_index.num_rows} rows to {ANN_INDEX_PATH}")
+
+
+if __name__ == "__main__":
+    build_ann_index()
@@ -0,0 +1,28 @@
+# pylint: disable=E0401
+"""Build the precomputed k-nearest neighbour table."""
+
+import os
+import sys
+
+code_root = os.path.abspath(os.path.join(__file__, "../.."))
+print(f"sys_root = {code_root}")
+if code_root not in sys.path:
+    sys.path.append(code_root)
+
+from api.helpers.knn import build_knn_table
+from api.helpers.settings import snapshot_settings
+from api.helpers.snapshot import load_embedding_store
+from api.helpers.store import save_array
+from core.config import BATCH_SIZE, KNN_TABLE_PATH, KNN_TABLE_SIZE
+
+
+def build_table():
+    """Build KNN table."""
+    # The table only holds rows of the store, rows added through the index API are scored live.
+    knn_table = build_knn_table(load_embedding_store(snapshot_settings), KNN_TABLE_SIZE, batch_size=BATCH_SIZE)
+    save_array(KNN_TABLE_PATH, knn_table)
+    print(f"Saved {knn_table.shape[1]} neighbours for {knn_table.shape[0]} rows to {KNN_TABLE_PATH}")
+
+
+if __name__ == "__main__":
+    build_table()
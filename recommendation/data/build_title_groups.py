@@ -0,0 +1,28 @@
+# pylint: disable=E0401
+"""Build the title group of every track."""
+
+import os
+import sys
+
+code_root = os.path.abspath(os.path.join(__file__, "../.."))
+print(f"sys_root = {code_root}")
+if code_root not in sys.path:
+    sys.path.append(code_root)
+
+from api.helpers.ranking import group_titles, read_titles
+from api.helpers.settings import snapshot_settings
+from api.helpers.snapshot import load_embedding_store
+from api.helpers.store import save_array
+from core.config import TITLE_GROUPS_PATH, TRACKS_PATH
+
+
+def build_title_groups():
+    """Build title groups."""
+    labels = load_embedding_store(snapshot_settings).labels
+    title_groups = group_titles(labels, read_titles(TRACKS_PATH))
+    save_array(TITLE_GROUPS_PATH, title_groups)
+    print(f"Saved {title_groups.max() + 1} title groups for {len(labels)} rows to {TITLE_GROUPS_PATH}")
+
+
+if __name__ == "__main__":
+    build_title_groups()
@@ -0,0 +1,31 @@
+# pylint: disable=E0401
+"""Convert raw embeddings to the binary embedding store."""
+
+import os
+import sys
+
+code_root = os.path.abspath(os.path.join(__file__, "../.."))
+print(f"sys_root = {code_root}")
+if code_root not in sys.path:
+    sys.path.append(code_root)
+
+from api.helpers.store import EmbeddingStore
+from core.config import (
+    EMBEDDING_STORE_PATH,
+    IMAGE_WEIGHT,
+    IMAGES_PATH,
+    LABELS_PATH,
+    METADATA_PATH,
+    METADATA_WEIGHT,
+)
+
+
+def convert_embeddings():
+    """Convert embeddings."""
+    embedding_store = EmbeddingStore.from_raw(IMAGES_PATH, LABELS_PATH, METADATA_PATH, IMAGE_WEIGHT, METADATA_WEIGHT)
+    embedding_store.save(EMBEDDING_STORE_PATH)
+    print(f"Saved {len(embedding_store.labels)} embeddings to {EMBEDDING_STORE_PATH}")
+
+
+if __name__ == "__main__":
+    convert_embeddings()
@@ -0,0 +1,60 @@
+# pylint: disable=E0401
+"""Report recall of quantised search against exact search."""
+
+import os
+import sys
+
+code_root = os.path.abspath(os.path.join(__file__, "../.."))
+print(f"sys_root = {code_root}")
+if code_root not in sys.path:
+    sys.path.append(code_root)
+
+import time
+
+import numpy as np
+from api.helpers.engine import SimilarityEngine
+from api.helpers.quantize import QUANTIZATION_MODES, QuantizedMatrix, QuantizedSearch
+from api.helpers.settings import snapshot_settings
+from api.helpers.snapshot import load_embedding_store
+from api.helpers.store import EmbeddingStore
+from core.config import QUANTIZATION_RERANK_SIZE, TOP_K
+
+
+def get_engine(embedding_store: EmbeddingStore, quantized_matrix: QuantizedMatrix = None) -> SimilarityEngine:
+    """Get engine over the embedding store."""
+    indexes = [QuantizedSearch(quantized_matrix, QUANTIZATION_RERANK_SIZE)] if quantized_matrix is not None else []
+    return SimilarityEngine(embedding_store, indexes)
+
+
+def run_searches(engine: SimilarityEngine, anchor_rows: np.ndarray):
+    """Run one search per anchor row, return results and mean latency in ms."""
+    start = time.perf_counter()
+    results = []
+    for row in anchor_rows:
+        excluded = np.zeros(engine.num_rows, dtype=bool)
+        excluded[row] = True
+        results.append(engine.search(row, TOP_K, excluded))
+    return results, (time.perf_counter() - start) / len(anchor_rows) * 1000
+
+
+def quantization_report(num_anchors: int = 500, seed: int = 0):
+    """Quantization report."""
+    embedding_store = load_embedding_store(snapshot_settings)
+    rng = np.random.default_rng(seed)
+    anchor_rows = rng.choice(len(embedding_store.labels), min(num_anchors, len(embedding_store.labels)), replace=False)
+    exact_results, exact_latency = run_searches(get_engine(embedding_store), anchor_rows)
+    print(f"exact: {embedding_store.embedding_matrix.nbytes / 2**20:.1f} MiB, {exact_latency:.3f} ms/query")
+
+    for mode in QUANTIZATION_MODES:
+        quantized_matrix = QuantizedMatrix.from_matrix(embedding_store.embedding_matrix, mode)
+        results, latency = run_searches(get_engine(embedding_store, quantized_matrix), anchor_rows)
+        hits = sum(len(set(result) & set(exact)) for result, exact in zip(results, exact_results))
+        recall = hits / sum(len(exact) for exact in exact_results)
+        print(
+            f"{mode}: {quantized_matrix.nbytes / 2**20:.1f} MiB, {latency:.3f} ms/query, "
+            f"recall@{TOP_K} = {recall:.4f} (rerank size {QUANTIZATION_RERANK_SIZE})"
+        )
+
+
+if __name__ == "__main__":
+    quantization_report()
@@ -1,11 +1,15 @@
 # pylint: disable=E0401
 """Application for recommendation service."""
 
+import asyncio
+from contextlib import asynccontextmanager
+
 import uvicorn
 from api.errors.http_error import http_error_handler
 from api.errors.validation_error import http422_error_handler
+from api.routes.admin_route import watch_artifacts
 from api.routes.api import app as api_router
-from core.config import API_PREFIX, DEBUG, PROJECT_NAME, VERSION
+from core.config import API_PREFIX, DEBUG, PROJECT_NAME, RELOAD_POLL_INTERVAL, VERSION
 from core.constant import APP_HOST, APP_PORT
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
@@ -19,7 +23,16 @@ from starlette.responses import HTMLResponse
 
 def get_application() -> FastAPI:
     """Get app."""
-    application = FastAPI(title=PROJECT_NAME, debug=DEBUG, version=VERSION, docs_url=None)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        """Follow the artifacts of the other workers while the application runs."""
+        watcher = asyncio.create_task(watch_artifacts(RELOAD_POLL_INTERVAL)) if RELOAD_POLL_INTERVAL > 0 else None
+        yield
+        if watcher is not None:
+            watcher.cancel()
+
+    application = FastAPI(lifespan=lifespan, title=PROJECT_NAME, debug=DEBUG, version=VERSION, docs_url=None)
     application.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
@@ -0,0 +1,52 @@
+# pylint: disable=E0401
+"""Item-item similarity mined from likes."""
+
+import numpy as np
+from api.helpers.collaborative import ItemSimilarity
+
+
+def test_from_likes_matches_dense_cosine():
+    """Every item keeps its best neighbours by cosine of the users who liked it, ties broken by item order."""
+    rng = np.random.default_rng(0)
+    labels = np.asarray([f"track{idx:02d}" for idx in range(40)])
+    user_ids, item_labels = rng.integers(0, 30, 400), labels[rng.integers(0, 40, 400)]
+    item_similarity = ItemSimilarity.from_likes(user_ids, item_labels, num_neighbours=5)
+
+    items, item_index = np.unique(item_labels, return_inverse=True)
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    likes = np.zeros((len(users), len(items)))
+    likes[user_index, item_index] = 1
+    co_counts = likes.T @ likes
+    counts = np.diag(co_counts).copy()
+    similarities = co_counts / np.sqrt(np.outer(counts, counts))
+    np.fill_diagonal(similarities, -np.inf)
+
+    assert list(item_similarity.labels) == list(items)
+    for item in range(len(items)):
+        start, end = item_similarity.indptr[item], item_similarity.indptr[item + 1]
+        expected = np.lexsort((np.arange(len(items)), -similarities[item]))
+        expected = expected[similarities[item][expected] > 0][:5]
+        assert list(item_similarity.indices[start:end]) == list(expected)
+        np.testing.assert_allclose(item_similarity.data[start:end], similarities[item][expected], rtol=1e-6)
+
+
+def test_repeated_likes_count_once():
+    """A user liking an item twice weighs as one like."""
+    item_similarity = ItemSimilarity.from_likes(
+        np.asarray([1, 1, 1, 2]), np.asarray(["a", "a", "b", "b"]), num_neighbours=5
+    )
+    assert list(item_similarity.labels) == ["a", "b"]
+    np.testing.assert_allclose(item_similarity.data, [1 / np.sqrt(2), 1 / np.sqrt(2)], rtol=1e-6)
+
+
+def test_score_maps_items_to_rows():
+    """Scores land on the embedding rows of the neighbours, items without rows are skipped."""
+    item_similarity = ItemSimilarity.from_likes(
+        np.asarray([1, 1, 1, 2, 2]), np.asarray(["a", "b", "c", "a", "b"]), num_neighbours=5
+    )
+    sorted_labels = np.asarray(["a", "b", "z"])
+    item_similarity.align(sorted_labels, np.asarray([2, 0, 1]))
+    scores = item_similarity.score("a", num_rows=3)
+    assert scores[0] == np.float32(1.0)
+    assert scores[1] == 0 and scores[2] == 0
+    assert not item_similarity.score("unknown", num_rows=3).any()
@@ -0,0 +1,225 @@
+# pylint: disable=E0401
+"""Equivalence of the engine search paths with the baseline cosine ranking."""
+
+from typing import List
+
+import numpy as np
+import pytest
+from api.helpers.ann import AnnSearch, IVFIndex
+from api.helpers.collaborative import ItemSimilarity
+from api.helpers.engine import SearchOptions, SimilarityEngine, build_fused_matrix
+from api.helpers.knn import KnnSearch, build_knn_table, update_knn_table
+from api.helpers.quantize import QuantizedMatrix, QuantizedSearch
+from api.helpers.scoring import HybridScorer, HybridWeights
+from api.helpers.store import EmbeddingStore
+
+IMAGE_WEIGHT, METADATA_WEIGHT = 0.6, 0.4
+TOP_K = 5
+
+
+def cosine(anchor: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """Cosine similarity of every vector to the anchor."""
+    return vectors @ anchor / (np.linalg.norm(anchor) * np.linalg.norm(vectors, axis=1))
+
+
+def baseline_ranking(
+    tracks, anchor: int, existed_ids: List[str], k: int = TOP_K, weights=(IMAGE_WEIGHT, METADATA_WEIGHT)
+) -> List[str]:
+    """Rank every other track by the weighted cosine of both modalities, as the original service did."""
+    embeded_images, metadata_matrix, labels = tracks
+    scores = weights[0] * cosine(embeded_images[anchor], embeded_images) + weights[1] * cosine(
+        metadata_matrix[anchor], metadata_matrix
+    )
+    # np.argmax picks the first of tied rows, as a stable sort does.
+    recommend_ids = []
+    for row in np.argsort(-scores, kind="stable"):
+        if row != anchor and labels[row] not in existed_ids and labels[row] not in recommend_ids:
+            recommend_ids.append(labels[row])
+        if len(recommend_ids) == k:
+            break
+    return recommend_ids
+
+
+@pytest.fixture(name="tracks")
+def fixture_tracks():
+    """Random image and metadata embeddings of 400 tracks."""
+    rng = np.random.default_rng(0)
+    labels = np.asarray([f"track{idx:03d}" for idx in range(400)])
+    return rng.normal(size=(400, 32)), rng.normal(size=(400, 12)), labels
+
+
+@pytest.fixture(name="store")
+def fixture_store(tracks):
+    """Embedding store of the tracks."""
+    embeded_images, metadata_matrix, labels = tracks
+    embedding_matrix = build_fused_matrix(embeded_images, metadata_matrix, IMAGE_WEIGHT, METADATA_WEIGHT)
+    return EmbeddingStore(embedding_matrix, labels, embeded_images.shape[1], IMAGE_WEIGHT, METADATA_WEIGHT)
+
+
+def get_cases(labels: np.ndarray):
+    """Anchor rows with their existed ids, with and without exclusions."""
+    rng = np.random.default_rng(1)
+    for anchor in rng.choice(len(labels), 20, replace=False):
+        yield anchor, []
+        yield anchor, list(rng.choice(labels, 30, replace=False))
+
+
+def assert_matches_baseline(engine: SimilarityEngine, tracks):
+    """Assert single and batched searches rank as the baseline."""
+    labels = tracks[2]
+    cases = list(get_cases(labels))
+    excluded = [engine.get_exclusion_mask([labels[anchor], *existed_ids]) for anchor, existed_ids in cases]
+    batch = engine.search_batch([anchor for anchor, _ in cases], TOP_K, excluded)
+    for (anchor, existed_ids), row_excluded, batch_ids in zip(cases, excluded, batch):
+        expected = baseline_ranking(tracks, anchor, existed_ids)
+        assert engine.search(anchor, TOP_K, row_excluded) == expected
+        assert batch_ids == expected
+
+
+def test_fused_search_matches_baseline(store, tracks):
+    """The exact scan of the fused matrix ranks as the baseline."""
+    assert_matches_baseline(SimilarityEngine(store), tracks)
+
+
+def test_knn_search_matches_baseline(store, tracks):
+    """The KNN table ranks as the baseline, falling back to a scan when exclusions exhaust it."""
+    knn_table = build_knn_table(store, num_neighbours=10)
+    assert knn_table.shape == (len(store.labels), 10)
+    assert_matches_baseline(SimilarityEngine(store, [KnnSearch(knn_table)]), tracks)
+
+
+def test_knn_table_update_matches_rebuild(store):
+    """Compacting the table of surviving and appended rows gives the table rebuilt from scratch."""
+    knn_table = build_knn_table(store, num_neighbours=10)
+    base_alive = np.ones(len(store.labels), dtype=bool)
+    base_alive[[3, 50, 120]] = False
+    embedding_matrix = np.vstack([store.embedding_matrix[base_alive], store.embedding_matrix[:2] * 0.9])
+    labels = np.concatenate([store.labels[base_alive], ["new0", "new1"]])
+    compacted = EmbeddingStore(embedding_matrix, labels, store.image_dim, IMAGE_WEIGHT, METADATA_WEIGHT)
+    expected = build_knn_table(compacted, num_neighbours=10)
+    assert np.array_equal(update_knn_table(compacted, knn_table, base_alive), expected)
+
+    # A table holding rows past the store, as built from an engine with appended rows, is rebuilt.
+    knn_table[0, 0] = len(store.labels)
+    assert np.array_equal(update_knn_table(compacted, knn_table, base_alive), expected)
+
+
+@pytest.mark.parametrize(
+    "options", [None, SearchOptions(weights=HybridWeights(0.2, 0.8)), SearchOptions(diversity=0.5)]
+)
+def test_batch_matches_single_searches(store, tracks, options):
+    """A batch answers every anchor as its own search, whether the KNN table or the shared scan ranks it."""
+    labels = tracks[2]
+    cases = list(get_cases(labels))
+    rows = [anchor for anchor, _ in cases]
+    mask_engine = SimilarityEngine(store)
+    excluded = [mask_engine.get_exclusion_mask([labels[anchor], *existed_ids]) for anchor, existed_ids in cases]
+    for engine in (SimilarityEngine(store), SimilarityEngine(store, [KnnSearch(build_knn_table(store, 10))])):
+        expected = [engine.search(row, TOP_K, row_excluded, options) for row, row_excluded in zip(rows, excluded)]
+        assert engine.search_batch(rows, TOP_K, excluded, options) == expected
+
+
+def test_ann_recall_grows_with_probes(store, tracks):
+    """Probing more lists finds more of the exact results, probing every list finds all of them."""
+    labels = tracks[2]
+    ann_index = IVFIndex.train(store.embedding_matrix, num_lists=16)
+    assert np.array_equal(np.sort(ann_index.list_rows), np.arange(len(labels)))
+    exact = SimilarityEngine(store)
+    recalls = []
+    for num_probe in (1, 4, 16):
+        engine, hits, total = SimilarityEngine(store, [AnnSearch(ann_index, num_probe)]), 0, 0
+        for anchor, existed_ids in get_cases(labels):
+            excluded = exact.get_exclusion_mask([labels[anchor], *existed_ids])
+            expected = exact.search(anchor, TOP_K, excluded)
+            hits += len(set(engine.search(anchor, TOP_K, excluded)) & set(expected))
+            total += len(expected)
+        recalls.append(hits / total)
+    assert recalls == sorted(recalls) and recalls[0] < 1 and recalls[-1] == 1
+
+    # Appended rows are not in the lists, they are scored on every search.
+    engine = SimilarityEngine(store, [AnnSearch(ann_index, 1)])
+    engine = engine.append(engine.get_vectors([0]), np.asarray(["copy"]))
+    assert engine.search(0, TOP_K, engine.get_exclusion_mask([labels[0]]))[0] == "copy"
+
+
+def test_int8_search_matches_baseline(store, tracks):
+    """The int8 first pass re-ranked at full precision ranks as the baseline."""
+    quantized_matrix = QuantizedMatrix.from_matrix(store.embedding_matrix, "int8")
+    assert quantized_matrix.codes.dtype == np.int8
+    assert_matches_baseline(SimilarityEngine(store, [QuantizedSearch(quantized_matrix, rerank_size=50)]), tracks)
+
+
+def test_quantized_matrix_decodes_close_to_the_matrix(store):
+    """int8 codes decode within half a step of every value, float16 keeps the values at half precision."""
+    quantized_matrix = QuantizedMatrix.from_matrix(store.embedding_matrix, "int8", chunk_size=64)
+    decoded = quantized_matrix.codes * quantized_matrix.scales
+    assert np.all(np.abs(decoded - store.embedding_matrix) <= quantized_matrix.scales / 2 + 1e-7)
+    assert quantized_matrix.nbytes * 4 == store.embedding_matrix.nbytes
+
+    quantized_matrix = QuantizedMatrix.from_matrix(store.embedding_matrix, "float16")
+    assert quantized_matrix.codes.dtype == np.float16
+    query = store.embedding_matrix[0]
+    np.testing.assert_allclose(quantized_matrix.score(query), store.embedding_matrix @ query, atol=1e-2)
+    with pytest.raises(ValueError):
+        QuantizedMatrix.from_matrix(store.embedding_matrix, "int4")
+
+
+@pytest.mark.parametrize("mode", ["int8", "float16"])
+def test_quantized_search_reranks_at_full_precision(store, tracks, mode):
+    """Results are ranked by their exact scores, a re-rank smaller than k still re-scores k rows."""
+    labels = tracks[2]
+    quantized_matrix = QuantizedMatrix.from_matrix(store.embedding_matrix, mode)
+    engine = SimilarityEngine(store, [QuantizedSearch(quantized_matrix, rerank_size=1)])
+    exact = SimilarityEngine(store)
+    for anchor, existed_ids in get_cases(labels):
+        excluded = engine.get_exclusion_mask([labels[anchor], *existed_ids])
+        recommend_ids = engine.search(anchor, TOP_K, excluded)
+        scores = exact.scan(exact.get_query(anchor))[engine.get_rows(recommend_ids)]
+        assert len(recommend_ids) == TOP_K and not set(recommend_ids) & {labels[anchor], *existed_ids}
+        assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_float16_search_matches_baseline(store, tracks):
+    """The float16 first pass re-ranked at full precision ranks as the baseline."""
+    quantized_matrix = QuantizedMatrix.from_matrix(store.embedding_matrix, "float16")
+    assert_matches_baseline(SimilarityEngine(store, [QuantizedSearch(quantized_matrix, rerank_size=50)]), tracks)
+
+
+@pytest.mark.parametrize("weights", [(1.0, 0.0), (0.2, 0.8), (IMAGE_WEIGHT, METADATA_WEIGHT)])
+def test_requested_weights_rank_as_the_baseline(store, tracks, weights):
+    """Weights of a request rank as the baseline blending both cosines with them, the matrix is not rebuilt."""
+    labels = tracks[2]
+    engine = SimilarityEngine(store, [KnnSearch(build_knn_table(store, num_neighbours=10))])
+    options = SearchOptions(weights=HybridWeights(*weights))
+    for anchor, existed_ids in get_cases(labels):
+        excluded = engine.get_exclusion_mask([labels[anchor], *existed_ids])
+        expected = baseline_ranking(tracks, anchor, existed_ids, weights=weights)
+        assert engine.search(anchor, TOP_K, excluded, options) == expected
+
+
+def test_collaborative_weight_blends_in_likes(store, tracks):
+    """The collaborative weight adds the similarity of the likes to the content scores."""
+    labels = tracks[2]
+    item_similarity = ItemSimilarity.from_likes(np.asarray([1, 1, 2, 2]), labels[[0, 7, 0, 9]], num_neighbours=5)
+    item_similarity.align(store.sorted_labels, store.sorted_rows)
+    engine = SimilarityEngine(store, scorer=HybridScorer(item_similarity))
+    excluded = engine.get_exclusion_mask([labels[0]])
+    assert engine.search(0, 2, excluded, SearchOptions(weights=HybridWeights(0.0, 0.0, 1.0))) == [labels[7], labels[9]]
+    # Without a collaborative weight the likes do not change the ranking.
+    options = SearchOptions(weights=HybridWeights(IMAGE_WEIGHT, METADATA_WEIGHT, 0.0))
+    assert engine.search(0, TOP_K, excluded, options) == baseline_ranking(tracks, 0, [])
+
+
+def test_appended_rows_are_searched(store, tracks):
+    """Appended rows are ranked with the base rows and removed rows are never returned."""
+    _, _, labels = tracks
+    engine = SimilarityEngine(store)
+    anchor = 0
+    excluded = engine.get_exclusion_mask([labels[anchor]])
+    best = engine.search(anchor, TOP_K, excluded)[0]
+
+    engine = engine.append(engine.get_vectors([anchor]), np.asarray(["copy"]))
+    assert engine.search(anchor, TOP_K, engine.get_exclusion_mask([labels[anchor]]))[0] == "copy"
+    engine = engine.remove(["copy", best])
+    recommend_ids = engine.search(anchor, TOP_K, engine.get_exclusion_mask([labels[anchor]]))
+    assert "copy" not in recommend_ids and best not in recommend_ids
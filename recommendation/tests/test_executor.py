@@ -0,0 +1,56 @@
+# pylint: disable=E0401
+"""Bounded thread pool of the scoring."""
+
+import asyncio
+import threading
+
+import pytest
+from api.errors.error_message import ScoringBusyError
+from api.helpers.executor import ScoringExecutor
+
+
+def test_calls_past_the_queue_are_rejected():
+    """Calls beyond the workers and the queue get a 503 at once, the others finish once the pool frees up."""
+    executor, release = ScoringExecutor(max_workers=1, max_queue=1), threading.Event()
+
+    def score(value):
+        release.wait(5)
+        return value, threading.current_thread().name
+
+    async def main():
+        first = asyncio.ensure_future(executor.run(score, 1))
+        second = asyncio.ensure_future(executor.run(score, value=2))
+        await asyncio.sleep(0)
+        with pytest.raises(ValueError) as error:
+            await executor.run(score, 3)
+        assert error.value.args[0] is ScoringBusyError and ScoringBusyError.status_code == 503
+        assert executor.pending == 2
+        release.set()
+        results = await asyncio.gather(first, second)
+        return results, await executor.run(score, 4)
+
+    results, last = asyncio.run(main())
+    assert [value for value, _ in results] == [1, 2] and last[0] == 4
+    assert all(name.startswith("scoring") for _, name in [*results, last])
+    assert executor.pending == 0 and executor.rejected == 1
+
+
+def test_cancelled_callers_keep_their_slot_until_the_thread_is_done():
+    """A cancelled caller does not stop its thread, the slot is freed when the thread finishes."""
+    executor, release = ScoringExecutor(max_workers=1, max_queue=0), threading.Event()
+
+    async def main():
+        call = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        with pytest.raises(ValueError):
+            await executor.run(release.wait, 5)
+        release.set()
+        while executor.pending:
+            await asyncio.sleep(0.001)
+        return await executor.run(lambda: "done")
+
+    assert asyncio.run(main()) == "done"
+    assert executor.rejected == 1
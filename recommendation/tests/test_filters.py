@@ -0,0 +1,73 @@
+# pylint: disable=E0401
+"""Genre and tag filters over the embedding rows."""
+
+import csv
+
+import numpy as np
+import pytest
+from api.helpers.engine import SearchOptions, SimilarityEngine, build_fused_matrix
+from api.helpers.filters import TrackFilter, extract_tags
+from api.helpers.store import EmbeddingStore
+
+GENRES = ("Rock", "Pop", "Jazz", "")
+
+
+@pytest.fixture(name="store")
+def fixture_store():
+    """Embedding store of 60 tracks in shuffled label order."""
+    rng = np.random.default_rng(0)
+    labels = np.asarray([f"track{idx:02d}" for idx in rng.permutation(60)])
+    embedding_matrix = build_fused_matrix(rng.normal(size=(60, 8)), rng.normal(size=(60, 4)), 0.6, 0.4)
+    return EmbeddingStore(embedding_matrix, labels, 8, 0.6, 0.4)
+
+
+@pytest.fixture(name="track_filter")
+def fixture_track_filter(store, tmp_path):
+    """Filter of a catalog giving track ``i`` the genre ``GENRES[i % 4]`` and the tag ``even`` or ``odd``."""
+    path = tmp_path / "tracks.csv"
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["id", "genre", "tags"])
+        writer.writeheader()
+        for idx in range(62):
+            tags = f"{'even' if idx % 2 == 0 else 'odd'}: 100, all: 50"
+            writer.writerow({"id": f"track{idx:02d}", "genre": GENRES[idx % 4], "tags": tags})
+    return TrackFilter.from_catalog(str(path), store.sorted_labels, store.sorted_rows)
+
+
+def get_labels(store: EmbeddingStore, rows: np.ndarray):
+    """Get the set of labels of some rows."""
+    return set(store.labels[rows])
+
+
+def test_extract_tags():
+    """Tags are the lower case names before the weights."""
+    assert extract_tags("Rock: 100, Indie Pop: 80") == ["rock", "indie pop"]
+    assert not extract_tags("")
+
+
+def test_rows_match_genres_and_tags(store, track_filter):
+    """Rows of any of the genres with any of the tags, catalog rows without embeddings or genre are skipped."""
+    expected = {f"track{idx:02d}" for idx in range(60) if idx % 4 == 0}
+    rows = track_filter.get_rows(genres=[" ROCK "])
+    assert list(rows) == sorted(rows) and get_labels(store, rows) == expected
+    assert set(track_filter.genre_rows) == {"rock", "pop", "jazz"}
+
+    rows = track_filter.get_rows(genres=["rock", "pop"], tags=["odd"])
+    assert get_labels(store, rows) == {f"track{idx:02d}" for idx in range(60) if idx % 4 == 1}
+    assert get_labels(store, track_filter.get_rows(tags=["Even", "odd"])) == set(store.labels)
+    assert len(track_filter.get_rows()) == 60
+    assert len(track_filter.get_rows(genres=["metal"])) == 0 and len(track_filter.get_rows(tags=["metal"])) == 0
+
+
+def test_filtered_search_ranks_the_candidates(store, track_filter):
+    """A filtered search returns the best candidates in the order of the unfiltered scores."""
+    engine = SimilarityEngine(store)
+    candidates = track_filter.get_rows(genres=["jazz"], tags=["all"])
+    for anchor in range(0, 60, 7):
+        excluded = engine.get_exclusion_mask([store.labels[anchor]])
+        recommend_ids = engine.search(anchor, 5, excluded, SearchOptions(candidates=candidates))
+
+        scores = np.where(excluded, -np.inf, engine.scan(engine.get_query(anchor)))[candidates]
+        order = candidates[np.argsort(-scores, kind="stable")]
+        expected = [label for label in store.labels[order] if label != store.labels[anchor]][:5]
+        assert recommend_ids == expected
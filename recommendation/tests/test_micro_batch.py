@@ -0,0 +1,76 @@
+# pylint: disable=E0401
+"""Micro-batching of concurrent single requests."""
+
+import asyncio
+
+import pytest
+from api.helpers.micro_batch import MicroBatcher
+
+
+async def run_inline(func, items):
+    """Run a batch on the event loop."""
+    return func(items)
+
+
+def test_full_batches_are_flushed_at_once():
+    """A batch reaching max_batch_size is computed by one call without waiting for the timer."""
+    batches = []
+
+    def double(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, run_inline, max_batch_size=3, max_wait=60)
+
+    async def main():
+        return await asyncio.wait_for(asyncio.gather(*(batcher.submit(item) for item in range(6))), timeout=5)
+
+    assert asyncio.run(main()) == [0, 2, 4, 6, 8, 10]
+    assert batches == [[0, 1, 2], [3, 4, 5]]
+    assert batcher.get_stats()["batch_sizes"] == {3: 2} and batcher.get_stats()["mean_batch_size"] == 3
+
+
+def test_partial_batches_are_flushed_after_the_wait():
+    """Items of a batch that does not fill up are computed together once max_wait passes."""
+    batcher = MicroBatcher(lambda items: [len(items)] * len(items), run_inline, max_batch_size=10, max_wait=0.01)
+
+    async def main():
+        first = await asyncio.gather(batcher.submit("a"), batcher.submit("b"))
+        return first, await batcher.submit("c")
+
+    assert asyncio.run(main()) == ([2, 2], 1)
+    stats = batcher.get_stats()
+    assert stats["batches"] == 2 and stats["requests"] == 3
+
+
+def test_errors_reach_their_callers():
+    """An item failing in a batch fails its caller only, a failing batch fails every caller."""
+
+    def check(items):
+        return [ValueError(item) if item < 0 else item for item in items]
+
+    async def fail(func, items):
+        raise RuntimeError("pool down")
+
+    async def main(runner):
+        batcher = MicroBatcher(check, runner, max_batch_size=3, max_wait=0.01)
+        return await asyncio.gather(*(batcher.submit(item) for item in (1, -1, 2)), return_exceptions=True)
+
+    results = asyncio.run(main(run_inline))
+    assert results[0] == 1 and isinstance(results[1], ValueError) and results[2] == 2
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(main(fail)))
+
+
+def test_cancelled_callers_do_not_fail_the_batch():
+    """A caller cancelled while its batch runs is skipped, the others get their results."""
+    batcher = MicroBatcher(list, run_inline, max_batch_size=2, max_wait=0.01)
+
+    async def main():
+        first = asyncio.ensure_future(batcher.submit("a"))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await batcher.submit("b")
+
+    assert asyncio.run(main()) == "b"
@@ -0,0 +1,65 @@
+# pylint: disable=E0401
+"""Re-ranking by maximal marginal relevance."""
+
+import numpy as np
+import pytest
+from api.helpers.engine import SearchOptions, SimilarityEngine, build_fused_matrix
+from api.helpers.ranking import Ranker
+from api.helpers.store import EmbeddingStore
+
+NUM_CLUSTERS, CLUSTER_SIZE = 6, 5
+
+
+@pytest.fixture(name="store")
+def fixture_store():
+    """Embedding store of clusters of near duplicate tracks, the first row is the anchor."""
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(NUM_CLUSTERS, 12))
+    rows = np.repeat(centers, CLUSTER_SIZE, axis=0) + rng.normal(scale=0.01, size=(NUM_CLUSTERS * CLUSTER_SIZE, 12))
+    rows = np.vstack([centers.mean(axis=0, keepdims=True) + rng.normal(scale=0.1, size=(1, 12)), rows])
+    labels = np.asarray([f"track{idx:02d}" for idx in range(len(rows))])
+    embedding_matrix = build_fused_matrix(rows[:, :8], rows[:, 8:], 0.6, 0.4)
+    return EmbeddingStore(embedding_matrix, labels, 8, 0.6, 0.4)
+
+
+def get_cluster(label: str) -> int:
+    """Get the cluster of a label."""
+    return (int(label[5:]) - 1) // CLUSTER_SIZE
+
+
+def reference_mmr(engine: SimilarityEngine, scores: np.ndarray, k: int, diversity: float, pool_size: int):
+    """Greedy maximal marginal relevance, one pick at a time."""
+    pool = list(np.argsort(-scores, kind="stable")[:pool_size])
+    pool = [row for row in pool if np.isfinite(scores[row])]
+    picks = []
+    while pool and len(picks) < k:
+
+        def marginal(row):
+            similarity = max((float(engine.get_query(row) @ engine.get_vectors(pick)) for pick in picks), default=0.0)
+            return (1 - diversity) * scores[row] - diversity * similarity
+
+        best = max(pool, key=marginal)
+        picks.append(best)
+        pool.remove(best)
+    return list(engine.get_labels(np.asarray(picks)))
+
+
+def test_diversity_spreads_the_results(store):
+    """Without diversity near duplicates fill the results, with it every result comes from another cluster."""
+    engine = SimilarityEngine(store)
+    excluded = engine.get_exclusion_mask([store.labels[0]])
+    recommend_ids = engine.search(0, 4, excluded)
+    assert len({get_cluster(label) for label in recommend_ids}) < 4
+    assert engine.search(0, 4, excluded, SearchOptions(diversity=0.0)) == recommend_ids
+
+    recommend_ids = engine.search(0, 4, excluded, SearchOptions(diversity=0.5))
+    assert len({get_cluster(label) for label in recommend_ids}) == 4
+
+
+@pytest.mark.parametrize("diversity", [0.2, 0.5, 0.9])
+def test_picks_follow_the_marginal_relevance(store, diversity):
+    """Every pick maximises the relevance traded against the similarity to the closest pick."""
+    engine = SimilarityEngine(store, ranker=Ranker(diversity=diversity, diversity_pool_size=12))
+    excluded = engine.get_exclusion_mask([store.labels[0]])
+    scores = np.where(excluded, -np.inf, engine.scan(engine.get_query(0)))
+    assert engine.search(0, 6, excluded) == reference_mmr(engine, scores, 6, diversity, 12)
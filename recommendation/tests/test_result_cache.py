@@ -0,0 +1,121 @@
+# pylint: disable=E0401
+"""LRU and TTL eviction of the result cache, and its shared Redis tier."""
+
+from types import SimpleNamespace
+
+import pytest
+from api.helpers import result_cache as result_cache_module
+from api.helpers.result_cache import ResultCache, hash_ids
+
+
+class FakeRedis:
+    """In-memory Redis holding strings, expiry is recorded but not simulated."""
+
+    def __init__(self):
+        self.data, self.expiries = {}, {}
+
+    def get(self, key):
+        """Get a string."""
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        """Set a string."""
+        self.data[key], self.expiries[key] = value.encode(), ex
+
+
+class RedisError(Exception):
+    """Error of the fake Redis."""
+
+
+class FailingRedis:
+    """Redis failing every command."""
+
+    def get(self, key):
+        """Fail."""
+        raise RedisError(key)
+
+    def set(self, key, value, ex=None):
+        """Fail."""
+        raise RedisError(key)
+
+
+@pytest.fixture(name="clock")
+def fixture_clock(monkeypatch):
+    """Clock of the cache, moved by hand."""
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(result_cache_module, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_least_recently_used_entries_are_evicted():
+    """Past max_size the least recently used entry goes first, reads count as uses."""
+    cache = ResultCache(max_size=2, ttl=60)
+    cache.set("a", ["1"])
+    cache.set("b", ["2"])
+    assert cache.get("a") == ["1"]
+    cache.set("c", ["3"])
+    assert cache.get("b") is None
+    assert cache.get("a") == ["1"] and cache.get("c") == ["3"]
+    assert cache.get_stats()["size"] == 2
+
+
+def test_entries_expire_after_the_ttl(clock):
+    """An entry is served until its TTL passes, then it is dropped."""
+    cache = ResultCache(max_size=10, ttl=5)
+    cache.set("a", ["1"])
+    clock.now = 4.9
+    assert cache.get("a") == ["1"]
+    clock.now = 5.0
+    assert cache.get("a") is None
+    stats = cache.get_stats()
+    assert stats["size"] == 0 and stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.5
+
+
+def test_cached_results_are_copies():
+    """Changing a result after caching or reading it does not change the cached one."""
+    cache = ResultCache(max_size=10, ttl=60)
+    value = ["1", "2"]
+    cache.set("a", value)
+    value.append("3")
+    cache.get("a").append("4")
+    assert cache.get("a") == ["1", "2"]
+
+
+def test_size_zero_disables_the_cache():
+    """With a size of 0 nothing is cached or counted."""
+    cache = ResultCache(max_size=0, ttl=60)
+    cache.set("a", ["1"])
+    assert cache.get("a") is None and cache.get_stats()["misses"] == 0
+
+
+def test_local_misses_are_read_from_redis(clock):
+    """Results are shared through Redis with the TTL, a worker missing locally reads them and keeps them."""
+    redis_client = FakeRedis()
+    first, second = ResultCache(max_size=10, ttl=30), ResultCache(max_size=10, ttl=30)
+    first.redis_client = second.redis_client = redis_client
+    key = ("fingerprint", "track", hash_ids(["b", "a"]))
+    first.set(key, ["1", "2"])
+    assert redis_client.expiries == {ResultCache.get_redis_key(key): 30}
+
+    assert second.get(key) == ["1", "2"]
+    redis_client.data.clear()
+    assert second.get(key) == ["1", "2"]
+    assert second.get_stats()["redis_hits"] == 1 and second.get_stats()["hits"] == 1
+    clock.now = 30
+    assert second.get(key) is None
+
+
+def test_redis_errors_fall_back_to_computing(monkeypatch):
+    """A failing Redis is a miss, and results are still cached locally."""
+    monkeypatch.setattr(result_cache_module, "redis", SimpleNamespace(RedisError=RedisError))
+    cache = ResultCache(max_size=10, ttl=60)
+    cache.redis_client = FailingRedis()
+    assert cache.get("a") is None
+    cache.set("a", ["1"])
+    assert cache.get("a") == ["1"]
+
+
+def test_hash_ids_ignores_order_and_repeats():
+    """Exclusion sets with the same ids share a key."""
+    assert hash_ids(["a", "b", "a"]) == hash_ids(["b", "a"]) != hash_ids(["a"])
+    assert hash_ids(None) == hash_ids([])
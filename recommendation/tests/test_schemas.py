@@ -0,0 +1,32 @@
+# pylint: disable=E0401
+"""Bounds of the request options."""
+
+import pytest
+from api.schemas.recommend import RecommendInputSchema, RecommendUserInputSchema, RecommendVectorInputSchema
+from core.config import MAX_TOP_K
+from pydantic import ValidationError
+
+
+@pytest.mark.parametrize("top_k", [0, -3, MAX_TOP_K + 1])
+def test_top_k_out_of_bounds_is_rejected(top_k):
+    """top_k is between 1 and MAX_TOP_K."""
+    with pytest.raises(ValidationError):
+        RecommendUserInputSchema(track_ids=["track"], top_k=top_k)
+    with pytest.raises(ValidationError):
+        RecommendVectorInputSchema(vector=[1.0], top_k=top_k)
+
+
+@pytest.mark.parametrize(
+    "options", [{"diversity": -0.1}, {"diversity": 1.5}, {"image_weight": -1.0}, {"collaborative_weight": -0.5}]
+)
+def test_options_out_of_bounds_are_rejected(options):
+    """Diversity is between 0 and 1 and weights are not negative."""
+    with pytest.raises(ValidationError):
+        RecommendInputSchema(track_id="track", existed_ids=[], **options)
+
+
+def test_options_in_bounds_are_kept():
+    """Bounds are inclusive."""
+    recommend_input = RecommendInputSchema(track_id="track", existed_ids=[], diversity=1, metadata_weight=0)
+    assert recommend_input.diversity == 1 and recommend_input.metadata_weight == 0
+    assert RecommendUserInputSchema(track_ids=["track"], top_k=MAX_TOP_K).top_k == MAX_TOP_K
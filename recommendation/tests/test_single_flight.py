@@ -0,0 +1,80 @@
+# pylint: disable=E0401
+"""Coalescing of identical concurrent calls."""
+
+import asyncio
+
+import pytest
+from api.helpers.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    """Callers of a key in flight await its result instead of running it again."""
+    single_flight, calls = SingleFlight(), []
+
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def main():
+        results = await asyncio.gather(
+            *(single_flight.do("key", compute, 21) for _ in range(5)), single_flight.do("other", compute, 1)
+        )
+        return results, single_flight.in_flight
+
+    results, in_flight = asyncio.run(main())
+    assert results == [42] * 5 + [2]
+    assert calls == [21, 1]
+    assert single_flight.shared == 4
+    assert in_flight == 0
+
+
+def test_finished_calls_run_again():
+    """A key is only shared while its call runs."""
+    single_flight, calls = SingleFlight(), []
+
+    async def compute():
+        calls.append(None)
+        return len(calls)
+
+    async def main():
+        return [await single_flight.do("key", compute), await single_flight.do("key", compute)]
+
+    assert asyncio.run(main()) == [1, 2]
+    assert single_flight.shared == 0
+
+
+def test_errors_reach_every_caller():
+    """An error of the call is raised to every caller."""
+    single_flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    async def main():
+        return await asyncio.gather(*(single_flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert single_flight.in_flight == 0
+
+
+def test_cancelled_caller_does_not_cancel_the_call():
+    """A cancelled caller leaves the call running for the others."""
+    single_flight = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(single_flight.do("key", compute))
+        second = asyncio.ensure_future(single_flight.do("key", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
@@ -0,0 +1,161 @@
+# pylint: disable=E0401
+"""Delta of added and removed tracks, and its compaction."""
+
+import json
+import os
+
+import numpy as np
+import pytest
+from api.helpers import snapshot as snapshot_module
+from api.helpers.engine import build_fused_matrix
+from api.helpers.knn import build_knn_table
+from api.helpers.snapshot import EngineSnapshot, SnapshotRegistry, SnapshotSettings
+from api.helpers.store import DeltaStore, EmbeddingStore, save_array
+
+TOP_K = 5
+
+
+@pytest.fixture(name="settings")
+def fixture_settings(tmp_path):
+    """Settings of an embedding store of 200 tracks saved in a temporary folder."""
+    rng = np.random.default_rng(0)
+    labels = np.asarray([f"spotify{idx:03d}" for idx in range(200)])
+    embedding_matrix = build_fused_matrix(rng.normal(size=(200, 16)), rng.normal(size=(200, 8)), 0.6, 0.4)
+    settings = SnapshotSettings.from_data_path(str(tmp_path), compaction_threshold=1.0)
+    EmbeddingStore(embedding_matrix, labels, 16, 0.6, 0.4).save(settings.embedding_store_path)
+    with open(settings.map_track_ids_path, "w", encoding="utf-8") as f:
+        json.dump({f"track{idx:03d}": label for idx, label in enumerate(labels)}, f)
+    return settings
+
+
+def recommend(registry: SnapshotRegistry, track_id: str):
+    """Get the recommendations of a track from the current snapshot."""
+    snapshot = registry.current
+    label = snapshot.track_id_map.get_spotify_id(track_id)
+    row = snapshot.get_row(label)
+    return snapshot.engine.search(row, TOP_K, snapshot.engine.get_exclusion_mask([label]))
+
+
+def test_delta_is_saved_and_reloaded(settings):
+    """Added and removed tracks are saved in the delta and survive a reload."""
+    registry = SnapshotRegistry(settings)
+    engine = registry.current.engine
+    registry.add_tracks(["track-new"], ["spotify-new"], engine.get_vectors([0]))
+    registry.remove_tracks(["track001"])
+
+    delta = DeltaStore.load(settings.delta_path)
+    assert delta.num_base_rows == 200
+    assert list(delta.delta_labels) == ["spotify-new"]
+    assert list(delta.tombstone_rows) == [1]
+    assert delta.map_track_ids == {"track-new": "spotify-new"}
+
+    expected = recommend(registry, "track-new")
+    registry.reload()
+    assert registry.current.get_row("spotify001") is None
+    assert recommend(registry, "track-new") == expected
+
+
+def test_compaction_folds_the_delta(settings):
+    """Compaction writes a store without removed rows and with added ones, recommendations do not change."""
+    registry = SnapshotRegistry(settings)
+    engine = registry.current.engine
+    registry.add_tracks(["track-new"], ["spotify-new"], engine.get_vectors([0]))
+    # Replacing a track tombstones its old row.
+    registry.add_tracks(["track002"], ["spotify002"], engine.get_vectors([3]))
+    registry.remove_tracks(["track001"])
+    expected = {track_id: recommend(registry, track_id) for track_id in ("track000", "track002", "track-new")}
+
+    registry.compact()
+    snapshot = registry.current
+    assert not os.path.exists(settings.delta_path)
+    assert snapshot.engine.num_rows == snapshot.engine.num_base_rows == 200
+    assert snapshot.get_row("spotify001") is None
+    assert list(snapshot.engine.store.labels[-2:]) == ["spotify-new", "spotify002"]
+    assert {track_id: recommend(registry, track_id) for track_id in expected} == expected
+
+    stored = EmbeddingStore.load(settings.embedding_store_path)
+    assert len(stored.labels) == 200 and "spotify001" not in stored.labels
+    with open(settings.map_track_ids_path, encoding="utf-8") as f:
+        assert json.load(f)["track-new"] == "spotify-new"
+
+
+@pytest.mark.parametrize("failing", ["update_knn_table", "load"])
+def test_failed_compaction_keeps_the_delta(settings, monkeypatch, failing):
+    """A compaction failing while staging or after replacing the artifacts leaves the store and delta as they were."""
+    store = EmbeddingStore.load(settings.embedding_store_path)
+    save_array(settings.knn_table_path, build_knn_table(store, 10))
+    registry = SnapshotRegistry(settings)
+    engine = registry.current.engine
+    registry.add_tracks(["track-new"], ["spotify-new"], engine.get_vectors([0]))
+    registry.remove_tracks(["track001"])
+    knn_table = np.load(settings.knn_table_path)
+
+    def fail(*args, **kwargs):
+        raise IndexError("failed")
+
+    if failing == "load":
+        monkeypatch.setattr(EngineSnapshot, "load", fail)
+    else:
+        monkeypatch.setattr(snapshot_module, failing, fail)
+    registry.compact()
+    monkeypatch.undo()
+
+    assert EmbeddingStore.load(settings.embedding_store_path).checksum == store.checksum
+    assert np.array_equal(np.load(settings.knn_table_path), knn_table)
+    assert DeltaStore.load(settings.delta_path).num_base_rows == 200
+    assert sorted(os.listdir(os.path.dirname(settings.delta_path))) == [
+        "delta",
+        "delta.lock",
+        "embeddings",
+        "knn_table.npy",
+        "map_track_ids.json",
+    ]
+
+    # Updates after the failure are still saved against the store on disk.
+    registry.remove_tracks(["track002"])
+    registry.reload()
+    assert registry.current.get_row("spotify001") is None and registry.current.get_row("spotify002") is None
+    assert registry.current.get_row("spotify-new") == 200
+
+
+def test_workers_merge_their_updates(settings):
+    """Workers sharing the delta keep the updates of each other, and follow a compaction made by another one."""
+    first, second = SnapshotRegistry(settings), SnapshotRegistry(settings)
+    vector = first.current.engine.get_vectors([0])
+    first.remove_tracks(["track001"])
+    second.remove_tracks(["track002"])
+    first.add_tracks(["track-a"], ["spotify-a"], vector)
+    second.add_tracks(["track-b"], ["spotify-b"], vector)
+
+    delta = DeltaStore.load(settings.delta_path)
+    assert list(delta.tombstone_rows) == [1, 2]
+    assert list(delta.delta_labels) == ["spotify-a", "spotify-b"]
+    assert delta.map_track_ids == {"track-a": "spotify-a", "track-b": "spotify-b"}
+    first.reload()
+    assert first.current.fingerprint == second.current.fingerprint
+
+    # The compacted store has as many rows as before, the other worker notices it changed.
+    first.compact()
+    second.remove_tracks(["track003"])
+    assert second.current.engine.store.checksum == first.current.engine.store.checksum
+    assert second.current.get_row("spotify003") is None
+    assert second.current.get_row("spotify-a") < second.current.engine.num_base_rows == 200
+    assert list(DeltaStore.load(settings.delta_path).tombstone_rows) == [1]
+    first.reload()
+    assert first.current.fingerprint == second.current.fingerprint
+
+
+def test_workers_follow_reloads_and_updates(settings):
+    """Updates and reloads made by one worker are swapped in by the others when they sync."""
+    first, second = SnapshotRegistry(settings), SnapshotRegistry(settings)
+    assert not second.sync()
+    first.remove_tracks(["track001"])
+    assert second.sync() and second.current.get_row("spotify001") is None
+    assert second.current.fingerprint == first.current.fingerprint
+
+    store = EmbeddingStore.load(settings.embedding_store_path, mmap_mode=None)
+    EmbeddingStore(store.embedding_matrix[:150], store.labels[:150], 16, 0.6, 0.4).save(settings.embedding_store_path)
+    first.reload()
+    assert second.sync() and second.current.engine.num_base_rows == 150
+    assert second.current.fingerprint == first.current.fingerprint
+    assert not second.sync()